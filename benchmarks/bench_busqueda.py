@@ -0,0 +1,108 @@
+"""
+Benchmark del índice de búsqueda de servicio_productos
+
+Indexa N productos sintéticos con nombres y descripciones en español y mide
+la latencia (p50/p99) de consultas típicas de caja: prefijos a medio
+escribir, varias palabras, SKUs y erratas.
+
+Uso: PYTHONPATH=shared python benchmarks/bench_busqueda.py [productos]
+"""
+
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from bson import ObjectId
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+sys.path[:0] = [os.path.join(RAIZ, "shared"), os.path.join(RAIZ, "microservicios", "servicio_productos", "app")]
+
+from busqueda import IndiceBusqueda
+
+SUSTANTIVOS = (
+    "café leche arroz azúcar aceite harina galletas jabón champú detergente atún pasta "
+    "yogur queso mantequilla pan cereal chocolate té agua refresco cerveza vino jugo "
+    "salsa mayonesa mostaza sal pimienta frijoles lentejas garbanzos avena miel mermelada "
+    "camiseta pantalón chaqueta zapatillas calcetines gorra bufanda vestido falda camisa "
+    "televisor teléfono cargador auriculares altavoz ratón teclado monitor portátil cable "
+    "sartén olla cuchillo plato vaso taza toalla sábana almohada lámpara escoba fregona "
+    "balón raqueta bicicleta pesas esterilla guantes casco mochila botella cuaderno bolígrafo"
+).split()
+ADJETIVOS = (
+    "molido soluble entero desnatado integral blanco negro rojo azul verde grande pequeño "
+    "familiar ecológico natural clásico premium light original extra suave fuerte picante "
+    "dulce salado tostado inalámbrico recargable portátil térmico antiadherente"
+).split()
+MARCAS = [f"marca{n}" for n in range(60)] + "Nestlé Pascual Hacendado Gallo Colacao Dove Philips Bosch".split()
+TAMANOS = "250g 500g 1kg 2kg 330ml 1l 1.5l 2l talla-s talla-m talla-l pack-6".split()
+RELLENO = "producto de calidad con garantía para el uso diario en el hogar y la oficina".split()
+
+def generar_documento(i: int, aleatorio: random.Random) -> dict:
+    sustantivo, adjetivo = aleatorio.choice(SUSTANTIVOS), aleatorio.choice(ADJETIVOS)
+    marca, tamano = aleatorio.choice(MARCAS), aleatorio.choice(TAMANOS)
+    descripcion = " ".join(aleatorio.sample(RELLENO + SUSTANTIVOS + ADJETIVOS, 40))
+    return {
+        "_id": ObjectId(),
+        "nombre": f"{sustantivo.capitalize()} {adjetivo} {marca} {tamano}",
+        "descripcion": descripcion,
+        "sku": f"SKU-{i:07d}",
+        "categoria": "alimentos",
+    }
+
+CONSULTAS = [
+    "caf", "cafe mol", "café molido nes", "lech", "leche desn", "arroz integ", "azucar",
+    "camiseta azul", "zapatill", "auricu inalam", "sarten antiadh", "SKU-0001234",
+    "0004567", "choclate", "detergnte", "telfono", "galletas marca1", "a", "te", "agua 1.5",
+]
+
+def construir(documentos: list) -> IndiceBusqueda:
+    indice = IndiceBusqueda()
+    for documento in documentos:
+        indice.indexar(documento)
+    indice.preparar()
+    return indice
+
+def main():
+    aleatorio = random.Random(42)
+    documentos = [generar_documento(i, aleatorio) for i in range(PRODUCTOS)]
+
+    # La memoria se mide en una construcción aparte: tracemalloc multiplica
+    # el tiempo de construcción y distorsiona las primeras consultas
+    tracemalloc.start()
+    indice = construir(documentos)
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del indice
+
+    inicio = time.perf_counter()
+    indice = construir(documentos)
+    construccion = time.perf_counter() - inicio
+    # Igual que CatalogoResidente.cargar
+    gc.freeze()
+
+    latencias = {consulta: [] for consulta in CONSULTAS}
+    for _ in range(50):
+        for consulta in CONSULTAS:
+            inicio = time.perf_counter()
+            indice.buscar(consulta, 10)
+            latencias[consulta].append(time.perf_counter() - inicio)
+
+    todas = sorted(t for tiempos in latencias.values() for t in tiempos)
+    p50 = todas[len(todas) // 2]
+    p99 = todas[int(len(todas) * 0.99)]
+    print(f"Índice de búsqueda: {PRODUCTOS} productos, {indice.informe()}")
+    print(f"  construcción : {construccion:8.2f} s")
+    print(f"  memoria      : {memoria / 1_048_576:8.1f} MB")
+    print(f"  p50          : {p50 * 1000:8.3f} ms")
+    print(f"  p99          : {p99 * 1000:8.3f} ms")
+    for consulta, tiempos in latencias.items():
+        tiempos.sort()
+        resultados = indice.buscar(consulta, 3)
+        print(f"    {consulta!r:24} p99 {tiempos[int(len(tiempos) * 0.99)] * 1000:7.3f} ms  {len(resultados)} resultados")
+
+if __name__ == "__main__":
+    main()
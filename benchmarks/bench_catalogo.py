@@ -0,0 +1,80 @@
+"""
+Benchmark del catálogo residente de servicio_productos
+
+Carga N productos en CatalogoResidente e informa el tiempo de carga, la
+huella de memoria por 100k SKUs y el coste de obtener_producto servido desde
+memoria frente a validar y serializar el documento en cada petición.
+La lectura de Mongo se sustituye por los documentos ya decodificados, así que
+la carga medida es solo la construcción del catálogo.
+
+Uso: PYTHONPATH=shared python benchmarks/bench_catalogo.py [productos]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+sys.path[:0] = [os.path.join(RAIZ, "shared"), os.path.join(RAIZ, "microservicios", "servicio_productos", "app")]
+
+from comun.serializacion import AdaptadorRespuesta
+from catalogo import CatalogoResidente
+from modelos import Producto
+
+CATEGORIAS = ["electronica", "ropa", "alimentos", "hogar", "deportes"]
+
+def generar_documentos(cantidad: int) -> List[dict]:
+    base = datetime(2024, 1, 1, 10, 30, 15, 123000)
+    return [
+        {
+            "_id": ObjectId(),
+            "nombre": f"Producto {i}",
+            "descripcion": "Descripción de prueba con acentos y eñes " * 10,
+            "precio": 10.5 + i,
+            "categoria": CATEGORIAS[i % len(CATEGORIAS)],
+            "sku": f"SKU-{i:06d}",
+            "stock": i % 50,
+            "stock_minimo": 5,
+            "fecha_creacion": base,
+            "fecha_actualizacion": base + timedelta(seconds=i),
+            "activo": True,
+        }
+        for i in range(cantidad)
+    ]
+
+def medir(funcion, argumentos: list) -> float:
+    inicio = time.perf_counter()
+    for argumento in argumentos:
+        funcion(argumento)
+    return (time.perf_counter() - inicio) / len(argumentos)
+
+async def principal():
+    documentos = generar_documentos(PRODUCTOS)
+    adaptador = AdaptadorRespuesta(Producto)
+
+    catalogo = CatalogoResidente(None, adaptador)
+    catalogo._leer = lambda filtro: documentos
+    inicio = time.perf_counter()
+    await catalogo.cargar()
+    carga = time.perf_counter() - inicio
+    informe = catalogo.informe()
+
+    por_id = {doc["_id"]: doc for doc in documentos}
+    ids = [str(doc["_id"]) for doc in documentos[:20_000]]
+    t_memoria = medir(catalogo.obtener, ids)
+    t_serializar = medir(lambda producto_id: adaptador.serializar(por_id[ObjectId(producto_id)]), ids)
+
+    print(f"Catálogo residente: {informe['productos']} productos (carga {carga:.2f} s)")
+    print(f"  memoria total    : {informe['memoria_bytes'] / 1_048_576:8.2f} MB")
+    print(f"  por 100k SKUs    : {informe['memoria_mb_por_100k']:8.2f} MB")
+    print(f"  obtener (memoria): {t_memoria * 1_000_000:8.2f} µs")
+    print(f"  validar+serializar: {t_serializar * 1_000_000:7.2f} µs (sin contar la lectura de Mongo)")
+
+if __name__ == "__main__":
+    asyncio.run(principal())
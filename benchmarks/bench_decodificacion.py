@@ -0,0 +1,109 @@
+"""
+Benchmark de decodificación BSON para listados y reportes
+
+Simula los lotes que devuelve MongoDB (documentos BSON concatenados) y mide
+el coste de decodificarlos en el cliente con cada estrategia de lectura:
+documento completo a dict, documento proyectado a dict y RawBSONDocument.
+
+Uso: python benchmarks/bench_decodificacion.py [documentos]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+DOCUMENTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+OPCIONES_RAW = CodecOptions(document_class=RawBSONDocument)
+
+CAMPOS_INVENTARIO = ("_id", "nombre", "sku", "precio", "stock", "stock_minimo")
+CAMPOS_VENTA = ("_id", "total", "fecha_creacion")
+CAMPOS_ITEM = ("producto_id", "nombre", "cantidad", "subtotal")
+
+def producto(i: int) -> dict:
+    ahora = datetime(2024, 1, 1)
+    return {
+        "_id": ObjectId(),
+        "nombre": f"Producto {i}",
+        "descripcion": "Descripción extensa del producto " * 14,
+        "precio": 10.5 + i,
+        "categoria": "alimentos",
+        "sku": f"SKU-{i:06d}",
+        "stock": i % 50,
+        "stock_minimo": 5,
+        "fecha_creacion": ahora,
+        "fecha_actualizacion": ahora,
+        "activo": True,
+    }
+
+def venta(i: int) -> dict:
+    items = [
+        {"producto_id": str(ObjectId()), "nombre": f"Producto {j}", "cantidad": 2, "precio_unitario": 3.5, "subtotal": 7.0}
+        for j in range(8)
+    ]
+    return {
+        "_id": ObjectId(),
+        "cliente": f"Cliente {i}",
+        "items": items,
+        "total": 56.0,
+        "fecha_creacion": datetime(2024, 1, 1) + timedelta(minutes=i),
+        "vendedor": "Sistema",
+        "estado": "completada",
+    }
+
+def proyectar(documento: dict, campos, campos_item=None) -> dict:
+    resultado = {campo: documento[campo] for campo in campos}
+    if campos_item:
+        resultado["items"] = [{campo: item[campo] for campo in campos_item} for item in documento["items"]]
+    return resultado
+
+def lote(documentos) -> bytes:
+    return b"".join(bson.encode(documento) for documento in documentos)
+
+def medir(funcion, repeticiones: int = 5) -> float:
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1000
+
+def leer_raw_inventario(datos: bytes):
+    for documento in bson.decode_all(datos, OPCIONES_RAW):
+        documento["precio"] * documento["stock"]
+
+def leer_raw_ventas(datos: bytes):
+    for documento in bson.decode_all(datos, OPCIONES_RAW):
+        for item in documento["items"]:
+            item["cantidad"]
+
+if __name__ == "__main__":
+    productos = [producto(i) for i in range(DOCUMENTOS)]
+    ventas = [venta(i) for i in range(DOCUMENTOS)]
+
+    casos = {
+        "productos (listado / reporte inventario)": (
+            lote(productos),
+            lote(proyectar(p, CAMPOS_INVENTARIO) for p in productos),
+            leer_raw_inventario,
+        ),
+        "ventas (reporte de ventas)": (
+            lote(ventas),
+            lote(proyectar(v, CAMPOS_VENTA, CAMPOS_ITEM) for v in ventas),
+            leer_raw_ventas,
+        ),
+    }
+
+    print(f"{DOCUMENTOS} documentos por colección")
+    for nombre, (completo, proyectado, leer_raw) in casos.items():
+        t_completo = medir(lambda: bson.decode_all(completo))
+        t_proyectado = medir(lambda: bson.decode_all(proyectado))
+        t_raw = medir(lambda: leer_raw(completo))
+        print(f"{nombre}")
+        print(f"  completo a dict   : {t_completo:8.2f} ms  ({len(completo) / 1024:8.0f} KiB)")
+        print(f"  proyectado a dict : {t_proyectado:8.2f} ms  ({len(proyectado) / 1024:8.0f} KiB)")
+        print(f"  RawBSONDocument   : {t_raw:8.2f} ms")
@@ -0,0 +1,89 @@
+"""
+Benchmark de serialización de respuestas de listado
+
+Compara el camino anterior (copia del documento + Producto(**doc) +
+revalidación de response_model en FastAPI) con AdaptadorRespuesta,
+y comprueba que el JSON producido es idéntico.
+
+Uso: PYTHONPATH=shared python benchmarks/bench_serializacion.py [servicio] [items]
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICIO = sys.argv[1] if len(sys.argv) > 1 else "servicio_productos"
+ITEMS = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+sys.path[:0] = [os.path.join(RAIZ, "shared"), os.path.join(RAIZ, "microservicios", SERVICIO, "app")]
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from comun.serializacion import AdaptadorRespuesta
+from modelos import Producto
+
+def generar_documentos(cantidad: int) -> List[dict]:
+    base = datetime(2024, 1, 1, 10, 30, 15, 123000)
+    return [
+        {
+            "_id": ObjectId(),
+            "nombre": f"Producto {i}",
+            "descripcion": "Descripción de prueba con acentos y eñes " * 10,
+            "precio": 10.5 + i,
+            "categoria": "alimentos",
+            "sku": f"SKU-{i:06d}",
+            "stock": i % 50,
+            "stock_minimo": 5,
+            "fecha_creacion": base,
+            "fecha_actualizacion": base + timedelta(minutes=i),
+            "activo": True,
+        }
+        for i in range(cantidad)
+    ]
+
+def _adaptar_producto(producto_db: dict) -> dict:
+    producto_adaptado = producto_db.copy()
+    producto_adaptado["id"] = str(producto_adaptado["_id"])
+    del producto_adaptado["_id"]
+    return producto_adaptado
+
+campo_respuesta = create_response_field(name="Response_listar", type_=List[Producto])
+adaptador = AdaptadorRespuesta(List[Producto])
+
+async def camino_anterior(documentos: List[dict]) -> bytes:
+    productos = [Producto(**_adaptar_producto(doc)) for doc in documentos]
+    contenido = await serialize_response(field=campo_respuesta, response_content=productos, is_coroutine=True)
+    return JSONResponse(contenido).body
+
+async def camino_nuevo(documentos: List[dict]) -> bytes:
+    return adaptador.respuesta(documentos).body
+
+async def medir(camino, documentos: List[dict], repeticiones: int = 200) -> float:
+    mejor = float("inf")
+    for _ in range(5):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            await camino(documentos)
+        mejor = min(mejor, (time.perf_counter() - inicio) / repeticiones)
+    return mejor
+
+async def principal():
+    documentos = generar_documentos(ITEMS)
+    assert await camino_anterior(documentos) == await camino_nuevo(documentos), "La salida JSON difiere"
+
+    t_anterior = await medir(camino_anterior, documentos)
+    t_nuevo = await medir(camino_nuevo, documentos)
+
+    print(f"{SERVICIO}: {ITEMS} productos por página, salida idéntica")
+    print(f"  camino anterior : {t_anterior * 1000:8.3f} ms")
+    print(f"  adaptador       : {t_nuevo * 1000:8.3f} ms")
+    print(f"  aceleración     : {t_anterior / t_nuevo:8.2f}x")
+
+if __name__ == "__main__":
+    asyncio.run(principal())
@@ -5,15 +5,22 @@ Proporciona una interfaz unificada para todos los microservicios
 
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import HTTPBearer
 import httpx
 import logging
 from datetime import datetime
 from typing import Optional
+from comun.arranque import CalentadorArranque
+from comun.perfilador import registrar_perfilador
+from comun.registro import configurar_logging, registrar_metricas_logging
+from comun.sondas import ProbadorSalud, registrar_sondas
 
-logging.basicConfig(level=logging.INFO)
+configurar_logging("api_gateway")
 logger = logging.getLogger(__name__)
+# Logger de alto volumen (una línea por petición), muestreable con LOG_MUESTREO
+logger_proxy = logging.getLogger("proxy")
 
 # PATRON MVC - Controller principal
 app = FastAPI(
@@ -21,6 +28,8 @@ app = FastAPI(
     description="Gateway unificado para microservicios POS Core",
     version="1.0.0"
 )
+registrar_metricas_logging(app)
+registrar_perfilador(app)
 
 # Configuración CORS
 app.add_middleware(
@@ -34,6 +43,20 @@ app.add_middleware(
 # PATRON STRATEGY: Esquema de autenticación
 security = HTTPBearer()
 
+# Sondas de salud del propio gateway (sin dependencias de datos)
+probador_salud = ProbadorSalud("API Gateway")
+
+# Calentamiento de arranque: la readiness no pasa a listo hasta completarlo
+calentador = CalentadorArranque("API Gateway")
+calentador.agregar_fase("openapi", app.openapi)
+registrar_sondas(app, probador_salud, calentador)
+
+# Conexión y envío acotados; la lectura no, para retransmitir exportaciones largas
+TIMEOUT_PROXY = httpx.Timeout(30.0, read=None)
+# Cabeceras de la conexión con el microservicio que no se reenvían al cliente
+# (el cuerpo se retransmite tal cual, así que content-encoding sí se mantiene)
+CABECERAS_CONEXION = ("content-length", "transfer-encoding", "connection", "keep-alive")
+
 # PATRON SINGLETON: Configuración centralizada de servicios
 SERVICIOS = {
     "auth": "http://servicio_autenticacion:8001",
@@ -157,48 +180,68 @@ async def proxy_request(
     headers["x-user-id"] = usuario.get("id", "unknown")
     headers["x-user-email"] = usuario.get("email", "unknown")
     
-    logger.info(f"Proxying {request.method} {servicio}/{path} para usuario {usuario.get('email')}")
+    logger_proxy.info("Proxying %s %s/%s para usuario %s", request.method, servicio, path, usuario.get("email"))
     
-    # PATRON PROXY: Reenviar request al microservicio
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.request(
+    # PATRON PROXY: Reenviar request al microservicio. La respuesta se
+    # retransmite tal cual y por trozos: las exportaciones NDJSON/CSV no son
+    # JSON y pueden durar minutos, así que la lectura no tiene tiempo límite
+    client = httpx.AsyncClient(timeout=TIMEOUT_PROXY)
+    try:
+        response = await client.send(
+            client.build_request(
                 method=request.method,
                 url=url_destino,
                 headers=headers,
                 params=dict(request.query_params),
-                content=await request.body(),
-                timeout=30.0  # Timeout para evitar bloqueos
-            )
-            
-            # PATRON ADAPTER: Adaptar respuesta
-            if response.status_code >= 400:
-                logger.warning(f"Error {response.status_code} from {servicio}: {response.text}")
-            
-            return JSONResponse(
-                content=response.json() if response.content else {},
-                status_code=response.status_code,
-                headers=dict(response.headers)
-            )
-            
-        except httpx.ConnectError:
-            logger.error(f"No se pudo conectar con el servicio: {servicio}")
-            raise HTTPException(
-                status_code=503, 
-                detail=f"Servicio {servicio} no disponible temporalmente"
-            )
-        except httpx.TimeoutException:
-            logger.error(f"Timeout al conectar con: {servicio}")
-            raise HTTPException(
-                status_code=504,
-                detail=f"Timeout del servicio {servicio}"
-            )
-        except Exception as e:
-            logger.error(f"Error interno comunicando con {servicio}: {e}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Error interno del servidor: {str(e)}"
-            )
+                content=await request.body()
+            ),
+            stream=True
+        )
+    except httpx.ConnectError:
+        await client.aclose()
+        logger.error(f"No se pudo conectar con el servicio: {servicio}")
+        raise HTTPException(
+            status_code=503, 
+            detail=f"Servicio {servicio} no disponible temporalmente"
+        )
+    except httpx.TimeoutException:
+        await client.aclose()
+        logger.error(f"Timeout al conectar con: {servicio}")
+        raise HTTPException(
+            status_code=504,
+            detail=f"Timeout del servicio {servicio}"
+        )
+    except Exception as e:
+        await client.aclose()
+        logger.error(f"Error interno comunicando con {servicio}: {e}")
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+    
+    # PATRON ADAPTER: Adaptar respuesta (sin las cabeceras de la conexión con el servicio)
+    headers_respuesta = {
+        clave: valor for clave, valor in response.headers.items()
+        if clave.lower() not in CABECERAS_CONEXION
+    }
+    if response.status_code >= 400:
+        # Los errores son cortos: se leen enteros para registrarlos
+        contenido = await response.aread()
+        await response.aclose()
+        await client.aclose()
+        logger.warning("Error %s from %s: %s", response.status_code, servicio, contenido[:1000])
+        return Response(content=contenido, status_code=response.status_code, headers=headers_respuesta)
+    
+    async def cerrar():
+        await response.aclose()
+        await client.aclose()
+    
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=headers_respuesta,
+        background=BackgroundTask(cerrar)
+    )
 
 # Rutas públicas (sin autenticación)
 @app.post("/api/auth/login")
@@ -247,5 +290,5 @@ async def proxy_request_publico(servicio: str, path: str, request: Request):
             raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from comun.lanzador import ejecutar
+    ejecutar("main:app")
\ No newline at end of file
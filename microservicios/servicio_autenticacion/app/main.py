@@ -4,16 +4,20 @@ Servicio de Autenticación - PATRON MVC + GOF
 
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.security import HTTPBearer
-from pymongo import MongoClient
 from bson import ObjectId
 from datetime import datetime
 from configuracion import configuration
+from comun.arranque import CalentadorArranque
+from comun.mongo import obtener_cliente, precalentar_pool
+from comun.perfilador import registrar_perfilador
+from comun.registro import configurar_logging, registrar_metricas_logging
+from comun.sondas import ProbadorSalud, registrar_sondas, verificacion_mongo
 from modelos import UsuarioCrear, Usuario, LoginRequest, TokenResponse
 from seguridad import obtener_password_hash, verificar_password, crear_token_acceso, verificar_token_acceso
 from repositorio import UsuarioRepository
 import logging
 
-logging.basicConfig(level=logging.INFO)
+configurar_logging("autenticacion")
 logger = logging.getLogger(__name__)
 
 # PATRON MVC - Controller principal
@@ -22,15 +26,31 @@ app = FastAPI(
     description="Microservicio para gestión de usuarios y autenticación",
     version="1.0.0"
 )
+registrar_metricas_logging(app)
+registrar_perfilador(app)
 
 # PATRON STRATEGY: Esquema de autenticación Bearer
 security = HTTPBearer()
 
 # PATRON DEPENDENCY INJECTION: Factory para base de datos
 def get_database():
-    client = MongoClient(configuration.MONGODB_URL)
+    client = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
     return client[configuration.BASE_DATOS]
 
+# Sondas de salud: verificación en segundo plano sobre el cliente compartido
+cliente_mongo = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
+probador_salud = ProbadorSalud("Autenticación", configuration.SONDA_INTERVALO)
+probador_salud.agregar_verificacion("mongodb", verificacion_mongo(cliente_mongo))
+
+# Calentamiento de arranque: la readiness no pasa a listo hasta completarlo
+calentador = CalentadorArranque("Autenticación")
+calentador.agregar_fase(
+    "mongodb_pool",
+    lambda: precalentar_pool(cliente_mongo, configuration.MONGODB_CONEXIONES_INICIALES)
+)
+calentador.agregar_fase("openapi", app.openapi)
+registrar_sondas(app, probador_salud, calentador)
+
 def get_usuario_repository():
     db = get_database()
     return UsuarioRepository(db)
@@ -139,5 +159,5 @@ async def obtener_usuario_actual(credentials: HTTPBearer = Depends(security), re
     )
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from comun.lanzador import ejecutar
+    ejecutar("main:app")
\ No newline at end of file
@@ -15,5 +15,6 @@ class Configuration:
     
     def _initialize(self):
         self.REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+        self.SONDA_INTERVALO = float(os.getenv("SONDA_INTERVALO", "10"))
 
 configuration = Configuration()
\ No newline at end of file
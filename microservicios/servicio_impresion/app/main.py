@@ -8,8 +8,12 @@ import logging
 from configuracion import configuration
 from modelos import TicketRequest, ReporteRequest, ImpresionResponse
 from servicios import ServicioImpresion
+from comun.arranque import CalentadorArranque
+from comun.perfilador import registrar_perfilador
+from comun.registro import configurar_logging, registrar_metricas_logging
+from comun.sondas import ProbadorSalud, registrar_sondas, verificacion_redis
 
-logging.basicConfig(level=logging.INFO)
+configurar_logging("impresion")
 logger = logging.getLogger(__name__)
 
 # PATRON MVC - Controller principal
@@ -18,10 +22,22 @@ app = FastAPI(
     description="Microservicio para gestión de impresión de tickets y reportes",
     version="1.0.0"
 )
+registrar_metricas_logging(app)
+registrar_perfilador(app)
 
 # PATRON SINGLETON: Servicio de impresión global
 servicio_impresion = ServicioImpresion()
 
+# Sondas de salud: verificación en segundo plano sobre el cliente Redis compartido
+probador_salud = ProbadorSalud("Impresión", configuration.SONDA_INTERVALO)
+probador_salud.agregar_verificacion("redis", verificacion_redis(servicio_impresion.redis_client))
+
+# Calentamiento de arranque: la readiness no pasa a listo hasta completarlo
+calentador = CalentadorArranque("Impresión")
+calentador.agregar_fase("redis_pool", servicio_impresion.redis_client.ping)
+calentador.agregar_fase("openapi", app.openapi)
+registrar_sondas(app, probador_salud, calentador)
+
 @app.get("/")
 async def raiz():
     return {
@@ -105,5 +121,5 @@ async def estado_impresion():
         raise HTTPException(status_code=500, detail=f"Error al obtener estado: {str(e)}")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from comun.lanzador import ejecutar
+    ejecutar("main:app")
\ No newline at end of file
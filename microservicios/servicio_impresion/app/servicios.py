@@ -5,9 +5,14 @@ Servicios de impresión - PATRON COMMAND para trabajos de impresión
 import redis
 import json
 import asyncio
+import logging
 from datetime import datetime
 from configuracion import configuration
 
+logger = logging.getLogger(__name__)
+# Salida simulada de la impresora
+logger_impresora = logging.getLogger("impresora")
+
 class ServicioImpresion:
     """PATRON COMMAND: Maneja comandos de impresión en cola"""
     
@@ -45,39 +50,48 @@ class ServicioImpresion:
             self.redis_client.lrem("cola_impresion", 1, json.dumps(trabajo))
             
         except Exception as e:
-            print(f"Error en impresión: {e}")
+            logger.error("Error en impresión: %s", e)
             trabajo["estado"] = "error"
             trabajo["error"] = str(e)
     
     async def _imprimir_ticket(self, datos: dict):
         """STRATEGY: Imprimir ticket de venta"""
-        print("=" * 40)
-        print("          TICKET DE VENTA")
-        print("=" * 40)
-        print(f"Cliente: {datos.get('cliente', 'N/A')}")
-        print(f"Fecha: {datos.get('fecha', 'N/A')}")
-        print(f"Vendedor: {datos.get('vendedor', 'N/A')}")
-        print("-" * 40)
+        lineas = [
+            "=" * 40,
+            "          TICKET DE VENTA",
+            "=" * 40,
+            f"Cliente: {datos.get('cliente', 'N/A')}",
+            f"Fecha: {datos.get('fecha', 'N/A')}",
+            f"Vendedor: {datos.get('vendedor', 'N/A')}",
+            "-" * 40,
+        ]
         
         for producto in datos.get('productos', []):
-            print(f"{producto['nombre'][:20]:20} {producto['cantidad']:3} x ${producto['precio_unitario']:6.2f} = ${producto['subtotal']:7.2f}")
+            lineas.append(f"{producto['nombre'][:20]:20} {producto['cantidad']:3} x ${producto['precio_unitario']:6.2f} = ${producto['subtotal']:7.2f}")
         
-        print("-" * 40)
-        print(f"TOTAL: ${datos.get('total', 0):.2f}")
-        print("=" * 40)
-        print("     ¡Gracias por su compra!")
-        print("=" * 40)
+        lineas += [
+            "-" * 40,
+            f"TOTAL: ${datos.get('total', 0):.2f}",
+            "=" * 40,
+            "     ¡Gracias por su compra!",
+            "=" * 40,
+        ]
+        # Un único registro por ticket, escrito por el hilo de logging
+        logger_impresora.info("\n%s", "\n".join(lineas))
     
     async def _imprimir_reporte(self, datos: dict):
         """STRATEGY: Imprimir reporte"""
-        print("=" * 50)
-        print(f"       REPORTE: {datos.get('tipo', 'N/A').upper()}")
-        print("=" * 50)
-        print(f"Periodo: {datos.get('fecha_inicio', 'N/A')} a {datos.get('fecha_fin', 'N/A')}")
-        print("-" * 50)
+        lineas = [
+            "=" * 50,
+            f"       REPORTE: {datos.get('tipo', 'N/A').upper()}",
+            "=" * 50,
+            f"Periodo: {datos.get('fecha_inicio', 'N/A')} a {datos.get('fecha_fin', 'N/A')}",
+            "-" * 50,
+        ]
         
         # Aquí se imprimirían los datos específicos del reporte
         for key, value in datos.get('datos', {}).items():
-            print(f"{key}: {value}")
+            lineas.append(f"{key}: {value}")
         
-        print("=" * 50)
\ No newline at end of file
+        lineas.append("=" * 50)
+        logger_impresora.info("\n%s", "\n".join(lineas))
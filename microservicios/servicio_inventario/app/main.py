@@ -3,18 +3,40 @@ Servicio de Inventario - POS Core
 ARQUITECTURA MVC + PATRONES GOF
 """
 
-from fastapi import FastAPI, HTTPException, status, Depends
-from pymongo import MongoClient
+from fastapi import FastAPI, HTTPException, status, Depends, Header, Request
 from bson import ObjectId
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import logging
+from pydantic import ValidationError
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, ExecutionTimeout
 from configuracion import configuration
-from modelos import Producto, ProductoCrear, ProductoActualizar
+from comun.admin import con_worker, ruta_admin
+from comun.arranque import CalentadorArranque
+from comun.campos import seleccion_campos
+from comun.etag import VersionColeccion, coincide, condicion_if_match, etag_coleccion, etag_documento, no_modificado
+from comun.facetas import CAMPOS_FACETA, FacetasProductos
+from comun.exportacion import respuesta_exportacion, validar_formato
+from comun.lotes import ejecutar_lote, error_validacion, filas_csv, leer_filas, resumen_lote
+from comun.mongo import obtener_cliente, precalentar_pool, proyeccion_modelo
+from comun.paginacion import codificar_cursor, decodificar_cursor, id_de_cursor
+from comun.perfilador import registrar_perfilador
+from comun.registro import configurar_logging, registrar_metricas_logging
+from comun.serializacion import AdaptadorRespuesta
+from comun.sku import crear_indice_sku
+from comun.sondas import ProbadorSalud, registrar_sondas, verificacion_mongo
+from comun.stock_bajo import MigracionBajoStock, bajo_stock, con_bajo_stock, crear_indice_bajo_stock
+from modelos import (
+    DecrementoStock, EstadoRecuento, EstadoReserva, LineaRecuento, Producto,
+    ProductoCrear, ProductoActualizar, Recuento, Reserva, ReservaCrear, StockActualizado
+)
 from observador import sujeto_stock
+from recuento import ProcesadorRecuentos, RecuentoRepository
+from reservas import BarredorReservas, ReservaRepository
 
 # Configuración de logging
-logging.basicConfig(level=logging.INFO)
+configurar_logging("inventario")
 logger = logging.getLogger(__name__)
 
 # PATRON MVC - Controller: FastAPI app como controlador principal
@@ -23,59 +45,223 @@ app = FastAPI(
     description="Microservicio para gestión de productos e inventario",
     version="1.0.0"
 )
+registrar_metricas_logging(app)
+registrar_perfilador(app)
+
+# PATRON ADAPTER: Serializadores precompilados para las respuestas
+adaptador_producto = AdaptadorRespuesta(Producto)
+adaptador_lista_productos = AdaptadorRespuesta(List[Producto])
+adaptador_stock = AdaptadorRespuesta(StockActualizado)
+adaptador_reserva = AdaptadorRespuesta(Reserva)
+adaptador_recuento = AdaptadorRespuesta(Recuento)
+adaptador_linea_recuento = AdaptadorRespuesta(LineaRecuento)
 
 # PATRON DEPENDENCY INJECTION: Factory para base de datos
 def get_database():
-    """PATRON FACTORY METHOD: Crea conexión a MongoDB"""
-    try:
-        client = MongoClient(configuration.MONGODB_URL)
-        database = client[configuration.BASE_DATOS]
-        collection = database[configuration.COLECCION_PRODUCTOS]
-        client.admin.command('ping')
-        logger.info("Conexión a MongoDB establecida correctamente")
-        return collection
-    except Exception as e:
-        logger.error(f"Error conectando a MongoDB: {e}")
-        raise
+    """PATRON FACTORY METHOD: Obtiene la colección desde el cliente compartido"""
+    client = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
+    database = client[configuration.BASE_DATOS]
+    return database[configuration.COLECCION_PRODUCTOS]
+
+# Proyección de lectura: solo se decodifican los campos del modelo Producto
+# (y la versión, de la que sale la ETag)
+PROYECCION_PRODUCTO = (
+    {**proyeccion_modelo(Producto), "version": 1} if configuration.MONGODB_LECTURA_PROYECTADA else None
+)
+# Campos que la lógica de negocio necesita aunque no se pidan con fields=
+CAMPOS_OBLIGATORIOS = ("activo", "version")
+
+# Tiempo máximo para un conteo filtrado; si se supera no se informa total
+CONTEO_MAX_MS = 200
+LIMITE_STOCK_BAJO_MAX = 500
+# Lo que devuelve un movimiento de stock, más lo que usan los observadores
+PROYECCION_STOCK = {"stock": 1, "stock_minimo": 1, "reservado": 1, "nombre": 1, "sku": 1, "activo": 1}
+
+# Sondas de salud: verificación en segundo plano sobre el cliente compartido
+cliente_mongo = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
+probador_salud = ProbadorSalud("Inventario", configuration.SONDA_INTERVALO)
+probador_salud.agregar_verificacion("mongodb", verificacion_mongo(cliente_mongo))
+
+# Calentamiento de arranque: la readiness no pasa a listo hasta completarlo
+calentador = CalentadorArranque("Inventario")
+calentador.agregar_fase(
+    "mongodb_pool",
+    lambda: precalentar_pool(cliente_mongo, configuration.MONGODB_CONEXIONES_INICIALES)
+)
+calentador.agregar_fase("openapi", app.openapi)
+registrar_sondas(app, probador_salud, calentador)
 
 # PATRON REPOSITORY: Abstracción del acceso a datos
 class ProductoRepository:
     """Repository Pattern: Abstrae las operaciones de base de datos"""
     
-    def __init__(self, database):
+    def __init__(self, database, proyeccion: dict = None):
         self.collection = database
+        self.proyeccion = proyeccion
+        # Cada escritura incrementa la `version` del documento y la de la colección
+        self.versiones = VersionColeccion(self.collection)
+        # y las facetas por categoría que sirve servicio_productos
+        self.facetas = FacetasProductos(self.collection)
+    
+    async def version_coleccion(self) -> int:
+        return self.versiones.actual()
     
     async def crear_producto(self, producto_data: dict) -> str:
+        producto_data["version"] = 1
+        producto_data["bajo_stock"] = bajo_stock(producto_data)
         result = self.collection.insert_one(producto_data)
+        self.facetas.registrar(None, producto_data)
+        self.versiones.incrementar()
         return str(result.inserted_id)
     
-    async def obtener_producto_por_id(self, producto_id: str) -> Optional[dict]:
+    async def obtener_producto_por_id(self, producto_id: str, proyeccion: dict = None) -> Optional[dict]:
         if not ObjectId.is_valid(producto_id):
             return None
-        return self.collection.find_one({"_id": ObjectId(producto_id)})
+        return self.collection.find_one({"_id": ObjectId(producto_id)}, proyeccion or self.proyeccion)
     
-    async def listar_productos(self, filtro: dict, skip: int = 0, limit: int = 10) -> List[dict]:
-        cursor = self.collection.find(filtro).skip(skip).limit(limit)
+    async def listar_productos(
+        self,
+        filtro: dict,
+        skip: int = 0,
+        limit: int = 10,
+        despues_de: ObjectId = None,
+        proyeccion: dict = None
+    ) -> List[dict]:
+        """Lista en orden de _id; con despues_de pagina por keyset en vez de skip"""
+        if despues_de is not None:
+            filtro = {**filtro, "_id": {"$gt": despues_de}}
+        cursor = self.collection.find(filtro, proyeccion or self.proyeccion).sort("_id", ASCENDING).skip(skip).limit(limit)
         return list(cursor)
     
+    async def contar_estimado(self, filtro: dict) -> Optional[int]:
+        """
+        Conteo acotado por el índice (activo, categoria, _id); sin categoría
+        también, porque los metadatos de la colección cuentan los eliminados
+        """
+        try:
+            return self.collection.count_documents(filtro, maxTimeMS=CONTEO_MAX_MS)
+        except ExecutionTimeout:
+            return None
+    
+    @staticmethod
+    def _actualizacion_carga(datos: dict, ahora: datetime) -> List[dict]:
+        """
+        Una fila de carga sobre un SKU existente no toca el stock salvo que lo
+        traiga, ni reactiva un producto eliminado: stock y activo solo se
+        fijan al crear
+        """
+        al_crear: Dict[str, Any] = {"stock": 0, "activo": True, "fecha_creacion": ahora}
+        cambios = {**datos, "fecha_actualizacion": ahora}
+        if "stock" in cambios:
+            del al_crear["stock"]
+        return con_bajo_stock({"$set": cambios, "$setOnInsert": al_crear, "$inc": {"version": 1}})
+    
+    async def upsert_por_sku(self, productos: List[Tuple[int, dict]], ordenado: bool) -> Dict[int, Dict[str, Any]]:
+        """Crea o actualiza por SKU con bulk_write; recibe pares (fila, datos)"""
+        ahora = datetime.now()
+        operaciones = [
+            (fila, UpdateOne({"sku": datos["sku"]}, self._actualizacion_carga(datos, ahora), upsert=True))
+            for fila, datos in productos
+        ]
+        antes = self.facetas.antes_por_sku([datos["sku"] for _, datos in productos])
+        resultados = ejecutar_lote(self.collection, operaciones, ordenado, configuration.BULK_TAMANO_LOTE)
+        self.facetas.registrar_carga(productos, antes, resultados)
+        self.versiones.incrementar()
+        return resultados
+    
+    async def con_stock_bajo_por_sku(self, skus: List[str]) -> List[dict]:
+        return list(self.collection.find({"sku": {"$in": skus}, "bajo_stock": True}, PROYECCION_STOCK))
+    
+    def cursor_exportacion(self, filtro: dict, proyeccion: dict = None):
+        """Cursor perezoso para exportaciones: no lee nada hasta que se itera"""
+        return (
+            self.collection.find(filtro, proyeccion or self.proyeccion)
+            .sort("_id", ASCENDING)
+            .batch_size(configuration.EXPORT_TAMANO_LOTE)
+        )
+    
+    async def crear_indices(self):
+        """Índice que cubre el filtro de listado y el orden por _id del keyset"""
+        self.collection.create_index([("activo", ASCENDING), ("categoria", ASCENDING), ("_id", ASCENDING)])
+        # Las cargas masivas hacen upsert por SKU: el mismo índice único que servicio_productos
+        crear_indice_sku(self.collection)
+        crear_indice_bajo_stock(self.collection)
+    
     async def actualizar_producto(self, producto_id: str, datos_actualizacion: dict) -> bool:
         if not ObjectId.is_valid(producto_id):
             return False
         datos_actualizacion["fecha_actualizacion"] = datetime.now()
-        result = self.collection.update_one(
+        # El documento anterior (solo lo que cuenta para las facetas) en el mismo viaje
+        antes = self.collection.find_one_and_update(
             {"_id": ObjectId(producto_id)},
-            {"$set": datos_actualizacion}
+            con_bajo_stock({"$set": datos_actualizacion, "$inc": {"version": 1}}),
+            projection=CAMPOS_FACETA
         )
-        return result.modified_count > 0
+        if antes is None:
+            return False
+        self.facetas.registrar(antes, {**antes, **datos_actualizacion})
+        self.versiones.incrementar()
+        return True
+    
+    async def actualizar_condicional(self, producto_id: str, datos_actualizacion: dict, condicion: dict) -> Optional[dict]:
+        """
+        Concurrencia optimista: actualiza solo si la versión sigue siendo la
+        esperada (If-Match) y devuelve el documento nuevo en el mismo viaje.
+        Se lee el anterior (lo necesitan las facetas) y el nuevo se compone
+        aplicándole el mismo $set e $inc
+        """
+        if not ObjectId.is_valid(producto_id):
+            return None
+        datos_actualizacion["fecha_actualizacion"] = datetime.now()
+        antes = self.collection.find_one_and_update(
+            {"_id": ObjectId(producto_id), "activo": True, **condicion},
+            con_bajo_stock({"$set": datos_actualizacion, "$inc": {"version": 1}}),
+            projection={**self.proyeccion, **CAMPOS_FACETA} if self.proyeccion else None
+        )
+        if antes is None:
+            return None
+        producto = {**antes, **datos_actualizacion, "version": antes.get("version", 0) + 1}
+        self.facetas.registrar(antes, producto)
+        self.versiones.incrementar()
+        return producto
+    
+    async def decrementar_stock(self, producto_id: str, cantidad: int) -> Optional[dict]:
+        """
+        Descuento atómico en un solo viaje: la condición sobre el disponible
+        (stock - reservado) y el $inc se evalúan juntos en el servidor, así
+        dos ventas simultáneas no pueden pisarse ni consumir unidades
+        reservadas. Devuelve el documento ya descontado o None
+        """
+        if not ObjectId.is_valid(producto_id):
+            return None
+        producto = self.collection.find_one_and_update(
+            {
+                "_id": ObjectId(producto_id),
+                "activo": True,
+                "$expr": {"$gte": [{"$subtract": ["$stock", {"$ifNull": ["$reservado", 0]}]}, cantidad]},
+            },
+            con_bajo_stock({"$inc": {"stock": -cantidad, "version": 1}, "$set": {"fecha_actualizacion": datetime.now()}}),
+            projection=PROYECCION_STOCK,
+            return_document=ReturnDocument.AFTER
+        )
+        if producto is not None:
+            self.versiones.incrementar()
+        return producto
     
     async def eliminar_producto(self, producto_id: str) -> bool:
         if not ObjectId.is_valid(producto_id):
             return False
-        result = self.collection.update_one(
-            {"_id": ObjectId(producto_id)},
-            {"$set": {"activo": False, "fecha_actualizacion": datetime.now()}}
+        # Solo un producto activo: repetir la baja no vuelve a escribir ni sube versiones
+        antes = self.collection.find_one_and_update(
+            {"_id": ObjectId(producto_id), "activo": True},
+            con_bajo_stock({"$set": {"activo": False, "fecha_actualizacion": datetime.now()}, "$inc": {"version": 1}}),
+            projection=CAMPOS_FACETA
         )
-        return result.modified_count > 0
+        if antes is None:
+            return False
+        self.facetas.registrar(antes, None)
+        self.versiones.incrementar()
+        return True
 
 # PATTERN SERVICE LAYER: Lógica de negocio
 class InventarioService:
@@ -99,17 +285,29 @@ class InventarioService:
         producto_data["fecha_actualizacion"] = datetime.now()
         producto_data["activo"] = True
         
+        try:
+            producto_id = await self.repository.crear_producto(producto_data)
+        except DuplicateKeyError:
+            # Otra petición creó el mismo SKU entre la comprobación y la inserción
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ya existe un producto con este SKU"
+            )
+        
         # PATRON OBSERVER: Notificar si el stock está bajo
         if producto_data["stock"] < producto_data["stock_minimo"]:
             sujeto_stock.notificar_stock_bajo(producto_data)
         
-        producto_id = await self.repository.crear_producto(producto_data)
         producto_creado = await self.repository.obtener_producto_por_id(producto_id)
         
-        return self._adaptar_producto(producto_creado)
+        return producto_creado
     
-    async def obtener_producto(self, producto_id: str) -> dict:
-        producto = await self.repository.obtener_producto_por_id(producto_id)
+    async def etag_listado(self, campos: Optional[Tuple[str, ...]] = None) -> str:
+        """ETag de los listados: versión de la colección leída antes de la consulta"""
+        return etag_coleccion(await self.repository.version_coleccion(), campos)
+    
+    async def obtener_producto(self, producto_id: str, proyeccion: Optional[dict] = None) -> dict:
+        producto = await self.repository.obtener_producto_por_id(producto_id, proyeccion)
         if not producto:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -120,16 +318,122 @@ class InventarioService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Producto no disponible"
             )
-        return self._adaptar_producto(producto)
+        return producto
     
-    async def listar_productos(self, categoria: Optional[str] = None, skip: int = 0, limit: int = 10) -> List[dict]:
+    def _filtro_listado(self, categoria: Optional[str]) -> dict:
         filtro = {"activo": True}
         if categoria:
             filtro["categoria"] = categoria
-        productos = await self.repository.listar_productos(filtro, skip, limit)
-        return [self._adaptar_producto(prod) for prod in productos]
+        return filtro
+    
+    def _despues_de(self, cursor: Optional[str]) -> Optional[ObjectId]:
+        if not cursor:
+            return None
+        try:
+            return id_de_cursor(decodificar_cursor(cursor))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor inválido"
+            )
+    
+    async def listar_productos(
+        self,
+        categoria: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        proyeccion: Optional[dict] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        productos = await self.repository.listar_productos(
+            self._filtro_listado(categoria), skip, limit, self._despues_de(cursor), proyeccion
+        )
+        siguiente_cursor = None
+        if productos and len(productos) == limit:
+            siguiente_cursor = codificar_cursor({"id": productos[-1]["_id"]})
+        return productos, siguiente_cursor
+    
+    async def listar_stock_bajo(
+        self,
+        categoria: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        proyeccion: Optional[dict] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Productos activos bajo su stock mínimo, paginados por _id: solo se
+        leen las entradas del índice parcial de bajo_stock, no el catálogo
+        """
+        limit = max(1, min(limit, LIMITE_STOCK_BAJO_MAX))
+        filtro: Dict[str, Any] = {"bajo_stock": True}
+        if categoria:
+            filtro["categoria"] = categoria
+        productos = await self.repository.listar_productos(filtro, 0, limit, self._despues_de(cursor), proyeccion)
+        siguiente_cursor = None
+        if len(productos) == limit:
+            siguiente_cursor = codificar_cursor({"id": productos[-1]["_id"]})
+        return productos, siguiente_cursor
+    
+    def cursor_exportacion(
+        self,
+        categoria: Optional[str] = None,
+        actualizado_desde: Optional[datetime] = None,
+        proyeccion: Optional[dict] = None
+    ):
+        """PATRON ITERATOR: Cursor con todos los productos activos que cumplen el filtro"""
+        filtro = self._filtro_listado(categoria)
+        if actualizado_desde is not None:
+            filtro["fecha_actualizacion"] = {"$gte": actualizado_desde}
+        return self.repository.cursor_exportacion(filtro, proyeccion)
+    
+    async def contar_productos(self, categoria: Optional[str] = None) -> Optional[int]:
+        return await self.repository.contar_estimado(self._filtro_listado(categoria))
+    
+    async def carga_masiva(self, filas: List[Any], ordenado: bool = False) -> Dict[str, Any]:
+        """
+        PATRON COMMAND: Crea o actualiza productos por SKU en lote
+        Las filas inválidas se informan sin enviarse a la base de datos
+        """
+        resultados: Dict[int, Dict[str, Any]] = {}
+        claves: Dict[int, Any] = {}
+        validos = []
+        for fila, datos in enumerate(filas):
+            if isinstance(datos, dict):
+                claves[fila] = datos.get("sku")
+            try:
+                producto = ProductoCrear.model_validate(datos)
+            except ValidationError as e:
+                resultados[fila] = {"estado": "error", "error": error_validacion(e)}
+                continue
+            producto_data = producto.dict()
+            stock_inicial = producto_data.pop("stock_inicial")
+            # Sin stock_inicial en la fila, un SKU existente conserva su stock
+            if "stock_inicial" in producto.model_fields_set:
+                producto_data["stock"] = stock_inicial
+            validos.append((fila, producto_data))
+        
+        if validos:
+            resultados.update(await self.repository.upsert_por_sku(validos, ordenado))
+        
+        # PATRON OBSERVER: una sola notificación con todos los productos escritos con stock bajo
+        # (la fila puede no traer el stock: cuenta el que quedó en la base de datos)
+        escritos = [
+            datos["sku"] for fila, datos in validos if resultados[fila]["estado"] in ("creado", "actualizado")
+        ]
+        if escritos:
+            sujeto_stock.notificar_stock_bajo_lote(await self.repository.con_stock_bajo_por_sku(escritos))
+        return resumen_lote(resultados, claves)
     
-    async def actualizar_producto(self, producto_id: str, producto_actualizar: ProductoActualizar) -> dict:
+    async def actualizar_producto(
+        self,
+        producto_id: str,
+        producto_actualizar: ProductoActualizar,
+        if_match: Optional[str] = None
+    ) -> dict:
+        """Actualiza producto existente; con If-Match solo si no cambió desde que se leyó"""
+        condicion = condicion_if_match(if_match)
+        if condicion is not None:
+            return await self._actualizar_condicional(producto_id, producto_actualizar, condicion)
         producto = await self.repository.obtener_producto_por_id(producto_id)
         if not producto:
             raise HTTPException(
@@ -154,7 +458,55 @@ class InventarioService:
             )
         
         producto_actualizado = await self.repository.obtener_producto_por_id(producto_id)
-        return self._adaptar_producto(producto_actualizado)
+        return producto_actualizado
+    
+    async def _actualizar_condicional(
+        self,
+        producto_id: str,
+        producto_actualizar: ProductoActualizar,
+        condicion: dict
+    ) -> dict:
+        """
+        PATRON OPTIMISTIC LOCK: la versión esperada va en el filtro de la
+        escritura; solo si no casa se lee el documento para distinguir 404 de 412
+        """
+        datos_actualizacion = {k: v for k, v in producto_actualizar.dict().items() if v is not None}
+        producto_actualizado = await self.repository.actualizar_condicional(producto_id, datos_actualizacion, condicion)
+        if producto_actualizado is None:
+            actual = await self.repository.obtener_producto_por_id(producto_id)
+            if not actual or not actual.get("activo", True):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Producto no encontrado"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="El producto cambió desde que se leyó",
+                headers={"ETag": etag_documento(actual.get("version"))}
+            )
+        
+        # PATRON OBSERVER: con el documento ya escrito, sin lectura previa
+        if "stock" in datos_actualizacion and producto_actualizado["stock"] < producto_actualizado.get("stock_minimo", 5):
+            sujeto_stock.notificar_stock_bajo(producto_actualizado)
+        return producto_actualizado
+    
+    async def decrementar_stock(self, producto_id: str, cantidad: int) -> dict:
+        """Descuenta unidades vendidas; 409 si no hay stock suficiente"""
+        producto = await self.repository.decrementar_stock(producto_id, cantidad)
+        if producto is None:
+            # Solo en el camino de error se lee el producto para explicar el fallo
+            actual = await self.obtener_producto(producto_id, PROYECCION_STOCK)
+            disponible = actual.get("stock", 0) - actual.get("reservado", 0)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Stock insuficiente: disponible {disponible}, solicitado {cantidad}"
+            )
+        
+        # PATRON OBSERVER: solo al cruzar el umbral, no en cada venta por debajo de él
+        stock_anterior = producto["stock"] + cantidad
+        if producto["stock"] < producto["stock_minimo"] <= stock_anterior:
+            sujeto_stock.notificar_stock_bajo(producto)
+        return producto
     
     async def eliminar_producto(self, producto_id: str):
         producto = await self.repository.obtener_producto_por_id(producto_id)
@@ -169,23 +521,208 @@ class InventarioService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No se pudo eliminar el producto"
             )
+
+class ReservaService:
+    """Service Layer: Reservas de stock de un carrito completo"""
     
-    def _adaptar_producto(self, producto_db: dict) -> dict:
-        """PATRON ADAPTER: Convierte producto de BD a formato API"""
-        if not producto_db:
-            return None
-        producto_adaptado = producto_db.copy()
-        producto_adaptado["id"] = str(producto_adaptado["_id"])
-        del producto_adaptado["_id"]
-        return producto_adaptado
+    def __init__(self, repository: ReservaRepository):
+        self.repository = repository
+    
+    async def crear_reserva(self, reserva: ReservaCrear) -> dict:
+        """PATRON UNIT OF WORK: Retiene todas las líneas o ninguna; 409 con las que faltan"""
+        cantidades: Dict[ObjectId, int] = {}
+        for linea in reserva.lineas:
+            if not ObjectId.is_valid(linea.producto_id):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"producto_id inválido: {linea.producto_id}"
+                )
+            # Varias líneas del mismo producto se retienen como una sola
+            producto_id = ObjectId(linea.producto_id)
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + linea.cantidad
+        
+        ttl = min(reserva.ttl_segundos or configuration.RESERVA_TTL_SEGUNDOS, configuration.RESERVA_TTL_MAXIMO)
+        lineas = [{"producto_id": producto_id, "cantidad": cantidad} for producto_id, cantidad in cantidades.items()]
+        creada, faltantes = await self.repository.crear(lineas, ttl)
+        if creada is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"mensaje": "Stock insuficiente", "lineas": faltantes}
+            )
+        return creada
+    
+    async def obtener_reserva(self, reserva_id: str) -> dict:
+        reserva = await self.repository.obtener(reserva_id)
+        if not reserva:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Reserva no encontrada"
+            )
+        return reserva
+    
+    async def _cerrar(self, reserva_id: str, confirmar: bool) -> Tuple[dict, bool]:
+        """Devuelve la reserva y si la cerró esta llamada"""
+        reserva = await self.repository.cerrar(reserva_id, confirmar, "confirmada" if confirmar else "liberada")
+        if reserva is not None:
+            return reserva, True
+        # No estaba activa: repetir el mismo cierre no es un error (el llamante
+        # reintenta si perdió la respuesta); si no, se explica por qué
+        actual = await self.obtener_reserva(reserva_id)
+        repetidos = (
+            (EstadoReserva.CONFIRMADA, EstadoReserva.CONFIRMANDO) if confirmar
+            else (EstadoReserva.LIBERADA, EstadoReserva.LIBERANDO)
+        )
+        if actual["estado"] in repetidos:
+            return actual, False
+        detalle = f"La reserva está {actual['estado']}"
+        if actual["estado"] == EstadoReserva.ACTIVA:
+            detalle = "La reserva ha caducado"
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detalle)
+    
+    async def confirmar_reserva(self, reserva_id: str) -> dict:
+        """Descuenta del stock las unidades retenidas; idempotente"""
+        reserva, cerrada = await self._cerrar(reserva_id, confirmar=True)
+        if not cerrada:
+            return reserva
+        
+        # PATRON OBSERVER: una notificación con los productos que cruzaron el mínimo
+        cantidades = {linea["producto_id"]: linea["cantidad"] for linea in reserva["lineas"]}
+        productos = await self.repository.productos_de(list(cantidades), PROYECCION_STOCK)
+        sujeto_stock.notificar_stock_bajo_lote([
+            producto for producto in productos
+            if producto["stock"] < producto["stock_minimo"] <= producto["stock"] + cantidades[producto["_id"]]
+        ])
+        return reserva
+    
+    async def liberar_reserva(self, reserva_id: str) -> dict:
+        """Devuelve al disponible las unidades retenidas; idempotente"""
+        reserva, _ = await self._cerrar(reserva_id, confirmar=False)
+        return reserva
+
+class RecuentoService:
+    """Service Layer: Recuentos físicos y su conciliación con el stock"""
+    
+    def __init__(self, repository: RecuentoRepository, procesador: ProcesadorRecuentos):
+        self.repository = repository
+        self.procesador = procesador
+    
+    async def recibir_recuento(self, request: Request, referencia: Optional[str], aplicar: bool) -> dict:
+        """
+        PATRON COMMAND: Acumula el CSV por SKU según llega y lanza el análisis
+        La cabecera se valida antes de crear el recuento
+        """
+        lotes = filas_csv(request, configuration.RECUENTO_TAMANO_LOTE, ("sku", "cantidad"))
+        primero = await anext(lotes, None)
+        if primero is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El CSV no tiene filas"
+            )
+        recuento = await self.repository.crear(referencia, aplicar)
+        try:
+            await self.procesador.recibir(recuento, primero, lotes)
+        except HTTPException as e:
+            self.repository.cambiar_estado(recuento["_id"], EstadoRecuento.FALLIDO, error=e.detail)
+            raise
+        self.procesador.analizar(recuento)
+        return await self.obtener_recuento(str(recuento["_id"]))
+    
+    async def obtener_recuento(self, recuento_id: str) -> dict:
+        recuento = await self.repository.obtener(recuento_id)
+        if not recuento:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Recuento no encontrado"
+            )
+        return recuento
+    
+    async def cursor_diferencias(self, recuento_id: str, solo_diferencias: bool):
+        recuento = await self.obtener_recuento(recuento_id)
+        if not recuento.get("analisis_completo"):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"El recuento aún no está analizado (estado {recuento['estado']})"
+            )
+        return self.repository.cursor_lineas(recuento["_id"], solo_diferencias)
+    
+    async def aplicar_recuento(self, recuento_id: str) -> dict:
+        """Aplica las diferencias de un recuento analizado; reanuda un ajuste interrumpido"""
+        recuento = await self.obtener_recuento(recuento_id)
+        aplicando = await self.procesador.aplicar(recuento["_id"])
+        if aplicando is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"El recuento no se puede aplicar en estado {recuento['estado']}"
+            )
+        return aplicando
 
 # PATRON DEPENDENCY INJECTION
+def get_reserva_repository() -> ReservaRepository:
+    """PATRON FACTORY: Repositorio de reservas sobre la misma base de datos"""
+    client = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
+    return ReservaRepository(client[configuration.BASE_DATOS][configuration.COLECCION_RESERVAS], get_database())
+
+def get_reserva_service() -> ReservaService:
+    return ReservaService(get_reserva_repository())
+
+def get_recuento_repository() -> RecuentoRepository:
+    """PATRON FACTORY: Recuentos físicos sobre la misma base de datos"""
+    productos = get_database()
+    return RecuentoRepository(
+        productos.database[configuration.COLECCION_RECUENTOS],
+        productos.database[configuration.COLECCION_RECUENTO_LINEAS],
+        productos
+    )
+
+# Análisis y ajuste de recuentos en segundo plano, retomados al arrancar; los cruces de stock mínimo van al observador
+procesador_recuentos = ProcesadorRecuentos(
+    get_recuento_repository(),
+    configuration.RECUENTO_TAMANO_LOTE,
+    configuration.RECUENTO_ABANDONO,
+    sujeto_stock.notificar_stock_bajo_lote
+)
+app.add_event_handler("startup", procesador_recuentos.iniciar)
+app.add_event_handler("shutdown", procesador_recuentos.detener)
+
+def get_recuento_service() -> RecuentoService:
+    return RecuentoService(get_recuento_repository(), procesador_recuentos)
+
 def get_inventario_service() -> InventarioService:
     """Inyecta dependencias del servicio de inventario"""
     database = get_database()
-    repository = ProductoRepository(database)
+    repository = ProductoRepository(database, PROYECCION_PRODUCTO)
     return InventarioService(repository)
 
+calentador.agregar_fase("indices", ProductoRepository(get_database()).crear_indices)
+async def crear_indices_reservas():
+    await get_reserva_repository().crear_indices(configuration.RESERVAS_RETENCION_SEGUNDOS)
+
+calentador.agregar_fase("indices_reservas", crear_indices_reservas)
+calentador.agregar_fase("indices_recuentos", get_recuento_repository().crear_indices)
+
+# bajo_stock de productos anteriores al campo: migración única guardada por
+# una marca en `versiones`, la hace un solo worker
+migracion_bajo_stock = MigracionBajoStock(get_database())
+app.add_event_handler("startup", migracion_bajo_stock.iniciar)
+app.add_event_handler("shutdown", migracion_bajo_stock.detener)
+
+# Barredor de reservas caducadas: cada worker barre, la transición de estado evita dobles cierres
+barredor_reservas = BarredorReservas(get_reserva_repository(), configuration.RESERVAS_INTERVALO_BARRIDO)
+app.add_event_handler("startup", barredor_reservas.iniciar)
+app.add_event_handler("shutdown", barredor_reservas.detener)
+
+# PATRON OBSERVER: las notificaciones de stock salen de la petición a una cola propia
+despachador_notificaciones = sujeto_stock.usar_despachador(
+    capacidad=configuration.NOTIFICACIONES_CAPACIDAD,
+    politica=configuration.NOTIFICACIONES_POLITICA_DESBORDE,
+    trabajadores=configuration.NOTIFICACIONES_TRABAJADORES,
+    lote_maximo=configuration.NOTIFICACIONES_LOTE_MAXIMO,
+    espera_lote=configuration.NOTIFICACIONES_ESPERA_LOTE,
+    ventana_dedup=configuration.NOTIFICACIONES_VENTANA_DEDUP
+)
+app.add_event_handler("startup", despachador_notificaciones.iniciar)
+app.add_event_handler("shutdown", despachador_notificaciones.detener)
+
 # ENDPOINTS - PATRON MVC Controller
 @app.get("/")
 async def raiz():
@@ -198,13 +735,13 @@ async def raiz():
 
 @app.get("/health")
 async def salud():
-    try:
-        client = MongoClient(configuration.MONGODB_URL)
-        client.admin.command('ping')
+    mongodb = probador_salud.resultado("mongodb")
+    if mongodb is None:
+        base_datos_status = "Sin verificar"
+    elif mongodb["estado"] == "ok":
         base_datos_status = "Conectado"
-    except Exception as e:
-        base_datos_status = f"Error: {str(e)}"
-        logger.error(f"Health check falló: {e}")
+    else:
+        base_datos_status = f"Error: {mongodb['detalle']}"
 
     return {
         "estado": "Saludable",
@@ -221,7 +758,9 @@ async def crear_producto(
     """PATRON MVC - Controller: Endpoint para crear producto"""
     try:
         producto_creado = await inventario_service.crear_producto(producto)
-        return Producto(**producto_creado)
+        return adaptador_producto.respuesta(
+            producto_creado, status.HTTP_201_CREATED, {"ETag": etag_documento(producto_creado.get("version"))}
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -231,17 +770,64 @@ async def crear_producto(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
+@app.post("/api/v1/productos/bulk")
+async def carga_masiva_productos(
+    request: Request,
+    ordenado: bool = False,
+    inventario_service: InventarioService = Depends(get_inventario_service)
+):
+    """
+    PATRON MVC - Controller: Carga masiva de productos (upsert por SKU)
+    Acepta un array JSON o NDJSON (Content-Type: application/x-ndjson);
+    con ordenado=true la escritura se detiene en el primer error
+    """
+    filas = await leer_filas(request)
+    try:
+        return await inventario_service.carga_masiva(filas, ordenado)
+    except Exception as e:
+        logger.error("Error en carga masiva de productos: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
 @app.get("/api/v1/productos", response_model=List[Producto])
 async def listar_productos(
     categoria: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     inventario_service: InventarioService = Depends(get_inventario_service)
 ):
-    """PATRON MVC - Controller: Endpoint para listar productos"""
+    """
+    PATRON MVC - Controller: Endpoint para listar productos
+    Paginación por cursor: la cabecera X-Siguiente-Cursor trae el valor de
+    `cursor` para la página siguiente; `skip` se mantiene por compatibilidad
+    fields=id,nombre,precio limita los campos leídos de Mongo y devueltos
+    La ETag es la versión de la colección: If-None-Match responde 304 sin consultar
+    """
     try:
-        productos = await inventario_service.listar_productos(categoria, skip, limit)
-        return [Producto(**prod) for prod in productos]
+        seleccion = seleccion_campos(Producto, fields, CAMPOS_OBLIGATORIOS)
+        etag = await inventario_service.etag_listado(seleccion.campos if seleccion else None)
+        if coincide(if_none_match, etag):
+            return no_modificado(etag)
+        productos, siguiente_cursor = await inventario_service.listar_productos(
+            categoria, skip, limit, cursor, seleccion.proyeccion if seleccion else None
+        )
+        headers = {"ETag": etag}
+        if siguiente_cursor:
+            headers["X-Siguiente-Cursor"] = siguiente_cursor
+        if incluir_total:
+            total = await inventario_service.contar_productos(categoria)
+            if total is not None:
+                headers["X-Total-Estimado"] = str(total)
+        adaptador = seleccion.adaptador_lista if seleccion else adaptador_lista_productos
+        return adaptador.respuesta(productos, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listando productos: {e}")
         raise HTTPException(
@@ -249,15 +835,82 @@ async def listar_productos(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
+@app.get("/api/v1/productos/export")
+async def exportar_productos(
+    formato: str = "ndjson",
+    categoria: Optional[str] = None,
+    actualizado_desde: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    inventario_service: InventarioService = Depends(get_inventario_service)
+):
+    """
+    PATRON MVC - Controller: Exporta el catálogo activo completo en streaming
+    formato=ndjson|csv; actualizado_desde filtra por fecha_actualizacion
+    """
+    validar_formato(formato)
+    seleccion = seleccion_campos(Producto, fields)
+    cursor = inventario_service.cursor_exportacion(
+        categoria, actualizado_desde, seleccion.proyeccion if seleccion else None
+    )
+    return respuesta_exportacion(
+        cursor,
+        seleccion.adaptador if seleccion else adaptador_producto,
+        seleccion.campos if seleccion else tuple(Producto.model_fields),
+        formato,
+        configuration.EXPORT_TAMANO_LOTE,
+        "productos"
+    )
+
+@app.get("/api/v1/productos/stock-bajo", response_model=List[Producto])
+async def listar_stock_bajo(
+    categoria: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    inventario_service: InventarioService = Depends(get_inventario_service)
+):
+    """
+    PATRON MVC - Controller: Productos por debajo de su stock mínimo
+    Paginación por cursor con la cabecera X-Siguiente-Cursor, como el listado
+    """
+    try:
+        seleccion = seleccion_campos(Producto, fields, CAMPOS_OBLIGATORIOS)
+        productos, siguiente_cursor = await inventario_service.listar_stock_bajo(
+            categoria, limit, cursor, seleccion.proyeccion if seleccion else None
+        )
+        headers = {"X-Siguiente-Cursor": siguiente_cursor} if siguiente_cursor else None
+        adaptador = seleccion.adaptador_lista if seleccion else adaptador_lista_productos
+        return adaptador.respuesta(productos, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listando productos con stock bajo: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
 @app.get("/api/v1/productos/{producto_id}", response_model=Producto)
 async def obtener_producto(
     producto_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     inventario_service: InventarioService = Depends(get_inventario_service)
 ):
-    """PATRON MVC - Controller: Endpoint para obtener producto"""
+    """
+    PATRON MVC - Controller: Endpoint para obtener producto
+    ETag fuerte por versión del documento; If-None-Match responde 304 sin serializar
+    """
     try:
-        producto = await inventario_service.obtener_producto(producto_id)
-        return Producto(**producto)
+        seleccion = seleccion_campos(Producto, fields, CAMPOS_OBLIGATORIOS)
+        producto = await inventario_service.obtener_producto(
+            producto_id, seleccion.proyeccion if seleccion else None
+        )
+        etag = etag_documento(producto.get("version"), seleccion.campos if seleccion else None)
+        if coincide(if_none_match, etag):
+            return no_modificado(etag)
+        adaptador = seleccion.adaptador if seleccion else adaptador_producto
+        return adaptador.respuesta(producto, headers={"ETag": etag})
     except HTTPException:
         raise
     except Exception as e:
@@ -267,16 +920,183 @@ async def obtener_producto(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
+@app.post("/api/v1/productos/{producto_id}/stock/decrementar", response_model=StockActualizado)
+async def decrementar_stock(
+    producto_id: str,
+    decremento: DecrementoStock,
+    inventario_service: InventarioService = Depends(get_inventario_service)
+):
+    """
+    PATRON MVC - Controller: Descuento atómico de stock por venta
+    Devuelve el stock resultante; 409 si no alcanza y el stock no se toca
+    """
+    try:
+        producto = await inventario_service.decrementar_stock(producto_id, decremento.cantidad)
+        return adaptador_stock.respuesta(producto)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error decrementando stock: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.post("/api/v1/recuentos", response_model=Recuento, status_code=status.HTTP_202_ACCEPTED)
+async def recibir_recuento(
+    request: Request,
+    referencia: Optional[str] = None,
+    aplicar: bool = False,
+    recuento_service: RecuentoService = Depends(get_recuento_service)
+):
+    """
+    PATRON MVC - Controller: Recuento físico en CSV (columnas sku y cantidad)
+    El cuerpo se lee en streaming; responde al terminar de recibirlo y el
+    análisis sigue en segundo plano. aplicar=true ajusta el stock al acabar
+    """
+    try:
+        recuento = await recuento_service.recibir_recuento(request, referencia, aplicar)
+        return adaptador_recuento.respuesta(recuento, status.HTTP_202_ACCEPTED)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error recibiendo recuento: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.get("/api/v1/recuentos/{recuento_id}", response_model=Recuento)
+async def obtener_recuento(
+    recuento_id: str,
+    recuento_service: RecuentoService = Depends(get_recuento_service)
+):
+    """PATRON MVC - Controller: Estado, progreso y totales de un recuento"""
+    return adaptador_recuento.respuesta(await recuento_service.obtener_recuento(recuento_id))
+
+@app.get("/api/v1/recuentos/{recuento_id}/diferencias")
+async def diferencias_recuento(
+    recuento_id: str,
+    formato: str = "ndjson",
+    solo_diferencias: bool = True,
+    recuento_service: RecuentoService = Depends(get_recuento_service)
+):
+    """
+    PATRON MVC - Controller: Informe de conciliación en streaming
+    formato=ndjson|csv; solo_diferencias=false incluye los SKU que cuadran
+    """
+    validar_formato(formato)
+    cursor = await recuento_service.cursor_diferencias(recuento_id, solo_diferencias)
+    return respuesta_exportacion(
+        cursor,
+        adaptador_linea_recuento,
+        tuple(LineaRecuento.model_fields),
+        formato,
+        configuration.EXPORT_TAMANO_LOTE,
+        f"recuento_{recuento_id}"
+    )
+
+@app.post("/api/v1/recuentos/{recuento_id}/aplicar", response_model=Recuento, status_code=status.HTTP_202_ACCEPTED)
+async def aplicar_recuento(
+    recuento_id: str,
+    recuento_service: RecuentoService = Depends(get_recuento_service)
+):
+    """PATRON MVC - Controller: Ajusta el stock con las diferencias del recuento"""
+    try:
+        recuento = await recuento_service.aplicar_recuento(recuento_id)
+        return adaptador_recuento.respuesta(recuento, status.HTTP_202_ACCEPTED)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error aplicando recuento: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@ruta_admin(app, "/admin/notificaciones")
+async def informe_notificaciones():
+    """Profundidad de la cola, descartes, deduplicación y latencia de entrega (de este worker)"""
+    return con_worker(despachador_notificaciones.metricas())
+
+@app.post("/api/v1/reservas", response_model=Reserva, status_code=status.HTTP_201_CREATED)
+async def crear_reserva(
+    reserva: ReservaCrear,
+    reserva_service: ReservaService = Depends(get_reserva_service)
+):
+    """
+    PATRON MVC - Controller: Retiene el stock de todas las líneas de un carrito
+    Se cierra con /confirmar o /liberar; si no, caduca a los ttl_segundos
+    """
+    try:
+        return adaptador_reserva.respuesta(await reserva_service.crear_reserva(reserva), status.HTTP_201_CREATED)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creando reserva: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.get("/api/v1/reservas/{reserva_id}", response_model=Reserva)
+async def obtener_reserva(
+    reserva_id: str,
+    reserva_service: ReservaService = Depends(get_reserva_service)
+):
+    """PATRON MVC - Controller: Estado de una reserva"""
+    return adaptador_reserva.respuesta(await reserva_service.obtener_reserva(reserva_id))
+
+@app.post("/api/v1/reservas/{reserva_id}/confirmar", response_model=Reserva)
+async def confirmar_reserva(
+    reserva_id: str,
+    reserva_service: ReservaService = Depends(get_reserva_service)
+):
+    """PATRON MVC - Controller: Convierte la reserva en descuento de stock"""
+    try:
+        return adaptador_reserva.respuesta(await reserva_service.confirmar_reserva(reserva_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error confirmando reserva: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.post("/api/v1/reservas/{reserva_id}/liberar", response_model=Reserva)
+async def liberar_reserva(
+    reserva_id: str,
+    reserva_service: ReservaService = Depends(get_reserva_service)
+):
+    """PATRON MVC - Controller: Devuelve al disponible el stock retenido"""
+    try:
+        return adaptador_reserva.respuesta(await reserva_service.liberar_reserva(reserva_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error liberando reserva: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
 @app.put("/api/v1/productos/{producto_id}", response_model=Producto)
 async def actualizar_producto(
     producto_id: str,
     producto_actualizar: ProductoActualizar,
+    if_match: Optional[str] = Header(None),
     inventario_service: InventarioService = Depends(get_inventario_service)
 ):
-    """PATRON MVC - Controller: Endpoint para actualizar producto"""
+    """
+    PATRON MVC - Controller: Endpoint para actualizar producto
+    Con If-Match (ETag de una lectura previa) responde 412 si otro lo modificó antes
+    """
     try:
-        producto_actualizado = await inventario_service.actualizar_producto(producto_id, producto_actualizar)
-        return Producto(**producto_actualizado)
+        producto_actualizado = await inventario_service.actualizar_producto(producto_id, producto_actualizar, if_match)
+        return adaptador_producto.respuesta(
+            producto_actualizado, headers={"ETag": etag_documento(producto_actualizado.get("version"))}
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -305,5 +1125,5 @@ async def eliminar_producto(
         )
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from comun.lanzador import ejecutar
+    ejecutar("main:app")
\ No newline at end of file
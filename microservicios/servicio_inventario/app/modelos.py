@@ -3,10 +3,11 @@ Modelos Pydantic para el servicio de inventario
 PATRON MVC - Capa Model: Define la estructura de datos del dominio
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, AliasChoices, computed_field
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
+from comun.serializacion import IdMongo
 
 class CategoriaProducto(str, Enum):
     """PATRON STRATEGY: Categorías como estrategias de agrupación"""
@@ -40,9 +41,111 @@ class ProductoActualizar(BaseModel):
 
 class Producto(ProductoBase):
     """Modelo completo de producto - PATRON DOMAIN MODEL"""
-    id: str
+    id: IdMongo = Field(..., validation_alias=AliasChoices("id", "_id"))
     stock: int
     stock_minimo: int
     fecha_creacion: datetime
     fecha_actualizacion: datetime
-    activo: bool
\ No newline at end of file
+    activo: bool
+    reservado: int = 0
+    
+    @computed_field
+    @property
+    def disponible(self) -> int:
+        """Stock vendible: el que no está retenido por reservas abiertas"""
+        return self.stock - self.reservado
+
+class DecrementoStock(BaseModel):
+    """PATRON COMMAND: Unidades a descontar del stock (venta)"""
+    cantidad: int = Field(..., gt=0)
+
+class StockActualizado(BaseModel):
+    """Resultado de un movimiento de stock atómico"""
+    id: IdMongo = Field(..., validation_alias=AliasChoices("id", "_id"))
+    stock: int
+    stock_minimo: int
+    reservado: int = 0
+
+class EstadoReserva(str, Enum):
+    """PATRON STATE: Ciclo de vida de una reserva de stock"""
+    ACTIVA = "activa"
+    CONFIRMANDO = "confirmando"
+    LIBERANDO = "liberando"
+    CONFIRMADA = "confirmada"
+    LIBERADA = "liberada"
+
+class LineaReserva(BaseModel):
+    """Unidades de un producto retenidas por la reserva"""
+    producto_id: IdMongo
+    cantidad: int = Field(..., gt=0)
+
+class ReservaCrear(BaseModel):
+    """Carrito a reservar; sin ttl_segundos se usa el de configuración"""
+    lineas: List[LineaReserva] = Field(..., min_length=1, max_length=500)
+    ttl_segundos: Optional[int] = Field(None, gt=0)
+
+class Reserva(BaseModel):
+    """Reserva de stock - PATRON DOMAIN MODEL"""
+    id: IdMongo = Field(..., validation_alias=AliasChoices("id", "_id"))
+    lineas: List[LineaReserva]
+    estado: EstadoReserva
+    fecha_creacion: datetime
+    expira_en: datetime
+    fecha_cierre: Optional[datetime] = None
+    motivo: Optional[str] = None
+
+class EstadoRecuento(str, Enum):
+    """PATRON STATE: Ciclo de vida de un recuento físico"""
+    RECIBIENDO = "recibiendo"
+    ANALIZANDO = "analizando"
+    ANALIZADO = "analizado"
+    APLICANDO = "aplicando"
+    APLICADO = "aplicado"
+    FALLIDO = "fallido"
+
+class EstadoLineaRecuento(str, Enum):
+    """Resultado de cruzar un SKU contado con el stock del sistema"""
+    CONTADO = "contado"
+    CUADRA = "cuadra"
+    DIFERENCIA = "diferencia"
+    DESCONOCIDO = "desconocido"
+    AJUSTADA = "ajustada"
+
+class LineaRecuento(BaseModel):
+    """Fila del informe de diferencias (un SKU, aunque se contara en varias líneas del CSV)"""
+    sku: str
+    nombre: Optional[str] = None
+    contado: int
+    sistema: Optional[int] = None
+    diferencia: Optional[int] = None
+    valor_diferencia: Optional[float] = None
+    estado: EstadoLineaRecuento
+    producto_id: Optional[IdMongo] = None
+    linea: int
+
+class ErrorLineaRecuento(BaseModel):
+    linea: int
+    error: str
+
+class Recuento(BaseModel):
+    """Recuento físico y su progreso - PATRON DOMAIN MODEL"""
+    id: IdMongo = Field(..., validation_alias=AliasChoices("id", "_id"))
+    referencia: Optional[str] = None
+    estado: EstadoRecuento
+    aplicar: bool
+    lineas_leidas: int = 0
+    lineas_con_error: int = 0
+    skus: int = 0
+    analizados: int = 0
+    cuadran: int = 0
+    con_diferencia: int = 0
+    desconocidos: int = 0
+    unidades_faltantes: int = 0
+    unidades_sobrantes: int = 0
+    valor_diferencia: float = 0.0
+    ajustados: int = 0
+    errores: List[ErrorLineaRecuento] = []
+    error: Optional[str] = None
+    fecha_creacion: datetime
+    fecha_actualizacion: datetime
+    fecha_fin: Optional[datetime] = None
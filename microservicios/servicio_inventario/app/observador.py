@@ -4,10 +4,13 @@ PATRON GOF OBSERVER: Para notificaciones desacopladas
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import asyncio
 import logging
+import threading
+import time
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Observador(ABC):
@@ -20,14 +23,31 @@ class Observador(ABC):
     def actualizar(self, evento: str, datos: Dict[str, Any]):
         """Método abstracto para actualizar observadores"""
         pass
+    
+    def actualizar_lote(self, evento: str, lote: List[Dict[str, Any]]):
+        """Notificación agrupada; por defecto delega elemento a elemento"""
+        for datos in lote:
+            self.actualizar(evento, datos)
 
 class NotificadorEmail(Observador):
     """Observador concreto para notificaciones por email"""
     
     def actualizar(self, evento: str, datos: Dict[str, Any]):
         try:
-            logger.info(f"Notificación Email - Evento: {evento}")
-            logger.info(f"Producto: {datos.get('nombre')}, Stock: {datos.get('stock')}")
+            logger.info(
+                "Notificación Email - Evento: %s | Producto: %s, Stock: %s",
+                evento, datos.get("nombre"), datos.get("stock")
+            )
+        except Exception as e:
+            logger.error(f"Error en notificación email: {str(e)}")
+    
+    def actualizar_lote(self, evento: str, lote: List[Dict[str, Any]]):
+        """Un único email resumen para todo el lote"""
+        try:
+            logger.info(
+                "Notificación Email - Evento: %s | %s productos: %s",
+                evento, len(lote), ", ".join(str(datos.get("nombre")) for datos in lote)
+            )
         except Exception as e:
             logger.error(f"Error en notificación email: {str(e)}")
 
@@ -36,10 +56,200 @@ class NotificadorLog(Observador):
     
     def actualizar(self, evento: str, datos: Dict[str, Any]):
         try:
-            log_message = f"NOTIFICACION: {evento} | Producto: {datos.get('nombre')} | Stock: {datos.get('stock')}"
-            logger.warning(log_message)
+            logger.warning(
+                "NOTIFICACION: %s | Producto: %s | Stock: %s",
+                evento, datos.get("nombre"), datos.get("stock")
+            )
         except Exception as e:
             logger.error(f"Error en notificación de log: {str(e)}")
+    
+    def actualizar_lote(self, evento: str, lote: List[Dict[str, Any]]):
+        """Un único registro para todo el lote"""
+        try:
+            logger.warning(
+                "NOTIFICACION: %s | %s productos",
+                evento, len(lote),
+                extra={"productos": [{"sku": d.get("sku"), "stock": d.get("stock")} for d in lote]}
+            )
+        except Exception as e:
+            logger.error(f"Error en notificación de log: {str(e)}")
+
+POLITICAS_DESBORDE = ("descartar_antiguo", "descartar_nuevo")
+
+class DespachadorNotificaciones:
+    """
+    PATRON PRODUCER-CONSUMER: Entrega asíncrona y agrupada de notificaciones
+    La petición solo encola; trabajadores en segundo plano agrupan los
+    eventos y llaman a cada observador en un hilo, así un email o webhook
+    lento nunca cae en el camino de escritura.
+    - Cola acotada: al llenarse se descarta el evento más antiguo o el nuevo
+    - Mismo producto pendiente: se fusiona y se entrega solo el último dato
+    - Mismo producto ya notificado dentro de la ventana: se suprime
+    """
+    
+    def __init__(
+        self,
+        observadores: List[Observador],
+        capacidad: int = 10000,
+        politica: str = "descartar_antiguo",
+        trabajadores: int = 2,
+        lote_maximo: int = 100,
+        espera_lote: float = 0.5,
+        ventana_dedup: float = 300.0
+    ):
+        if politica not in POLITICAS_DESBORDE:
+            raise ValueError(f"Política de desborde no válida: {politica}")
+        # Referencia a la lista del sujeto: las altas y bajas posteriores se respetan
+        self.observadores = observadores
+        self.capacidad = capacidad
+        self.politica = politica
+        self.trabajadores = trabajadores
+        self.lote_maximo = lote_maximo
+        self.espera_lote = espera_lote
+        self.ventana_dedup = ventana_dedup
+        self._cola: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo: Optional[int] = None
+        self._tareas: List[asyncio.Task] = []
+        # Clave -> (evento, datos, instante de encolado) de lo que aún no se entregó
+        self._pendientes: Dict[Tuple[str, Any], Tuple[str, Dict[str, Any], float]] = {}
+        # Clave -> instante de la última notificación aceptada
+        self._notificados: Dict[Tuple[str, Any], float] = {}
+        self._latencias: Deque[float] = deque(maxlen=1000)
+        self.contadores = {
+            "encolados": 0, "entregados": 0, "fusionados": 0,
+            "suprimidos": 0, "descartados": 0, "errores": 0, "profundidad_maxima": 0,
+        }
+    
+    @property
+    def activo(self) -> bool:
+        return self._cola is not None
+    
+    @staticmethod
+    def _clave(evento: str, datos: Dict[str, Any]) -> Tuple[str, Any]:
+        return evento, datos.get("sku") or str(datos.get("_id"))
+    
+    def encolar(self, evento: str, datos: Dict[str, Any]):
+        """No bloquea nunca; desde otro hilo se reenvía al event loop"""
+        if threading.get_ident() != self._hilo:
+            self._loop.call_soon_threadsafe(self._encolar, evento, dict(datos))
+        else:
+            self._encolar(evento, dict(datos))
+    
+    def _encolar(self, evento: str, datos: Dict[str, Any]):
+        ahora = time.monotonic()
+        clave = self._clave(evento, datos)
+        if clave in self._pendientes:
+            self._pendientes[clave] = (evento, datos, self._pendientes[clave][2])
+            self.contadores["fusionados"] += 1
+            return
+        ultimo = self._notificados.get(clave)
+        if ultimo is not None and ahora - ultimo < self.ventana_dedup:
+            self.contadores["suprimidos"] += 1
+            return
+        if self._cola.full():
+            self.contadores["descartados"] += 1
+            if self.politica == "descartar_nuevo":
+                return
+            descartada = self._cola.get_nowait()
+            self._cola.task_done()
+            self._pendientes.pop(descartada, None)
+            # Nunca se entregó: no debe suprimir la siguiente del mismo producto
+            self._notificados.pop(descartada, None)
+        self._notificados[clave] = ahora
+        self._pendientes[clave] = (evento, datos, ahora)
+        self._cola.put_nowait(clave)
+        self.contadores["encolados"] += 1
+        self.contadores["profundidad_maxima"] = max(self.contadores["profundidad_maxima"], self._cola.qsize())
+    
+    async def _siguiente_lote(self) -> List[Tuple[str, Any]]:
+        """Espera un evento y agrupa los que lleguen hasta llenar el lote o agotar la espera"""
+        claves = [await self._cola.get()]
+        limite = self._loop.time() + self.espera_lote
+        while len(claves) < self.lote_maximo:
+            restante = limite - self._loop.time()
+            if restante <= 0:
+                break
+            try:
+                claves.append(await asyncio.wait_for(self._cola.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        return claves
+    
+    async def _entregar_a(self, observador: Observador, evento: str, lote: List[Dict[str, Any]]):
+        try:
+            await asyncio.to_thread(observador.actualizar_lote, evento, lote)
+        except Exception as e:
+            self.contadores["errores"] += 1
+            logger.error(f"Error notificando observador {type(observador).__name__}: {str(e)}")
+    
+    async def _entregar(self, claves: List[Tuple[str, Any]]):
+        por_evento: Dict[str, List[Tuple[Dict[str, Any], float]]] = {}
+        for clave in claves:
+            pendiente = self._pendientes.pop(clave, None)
+            if pendiente is not None:
+                evento, datos, encolado = pendiente
+                por_evento.setdefault(evento, []).append((datos, encolado))
+        for evento, elementos in por_evento.items():
+            lote = [datos for datos, _ in elementos]
+            # Cada observador recibe el lote en paralelo: uno lento no retrasa a los demás
+            await asyncio.gather(*(self._entregar_a(o, evento, lote) for o in list(self.observadores)))
+            ahora = time.monotonic()
+            self._latencias.extend(ahora - encolado for _, encolado in elementos)
+            self.contadores["entregados"] += len(lote)
+    
+    def _purgar_notificados(self):
+        limite = time.monotonic() - self.ventana_dedup
+        if len(self._notificados) > self.capacidad:
+            self._notificados = {c: t for c, t in self._notificados.items() if t >= limite}
+    
+    async def _trabajador(self):
+        while True:
+            claves = await self._siguiente_lote()
+            try:
+                await self._entregar(claves)
+                self._purgar_notificados()
+            except Exception as e:
+                logger.error(f"Error despachando notificaciones: {str(e)}")
+            finally:
+                for _ in claves:
+                    self._cola.task_done()
+    
+    async def iniciar(self):
+        if self.activo:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._hilo = threading.get_ident()
+        self._cola = asyncio.Queue(maxsize=self.capacidad)
+        self._tareas = [asyncio.create_task(self._trabajador()) for _ in range(self.trabajadores)]
+    
+    async def detener(self, espera: float = 5.0):
+        """Intenta vaciar la cola antes de parar los trabajadores"""
+        if not self.activo:
+            return
+        try:
+            await asyncio.wait_for(self._cola.join(), espera)
+        except asyncio.TimeoutError:
+            logger.warning("Se detiene el despachador con %s notificaciones pendientes", self._cola.qsize())
+        for tarea in self._tareas:
+            tarea.cancel()
+        self._tareas = []
+        self._cola = None
+    
+    def metricas(self) -> Dict[str, Any]:
+        latencias = sorted(self._latencias)
+        
+        def percentil(p: float) -> Optional[float]:
+            return round(latencias[min(int(len(latencias) * p), len(latencias) - 1)] * 1000, 2) if latencias else None
+        
+        return {
+            "activo": self.activo,
+            "profundidad": self._cola.qsize() if self.activo else 0,
+            "capacidad": self.capacidad,
+            "politica_desborde": self.politica,
+            **self.contadores,
+            "latencia_entrega_ms": {"p50": percentil(0.5), "p99": percentil(0.99), "max": percentil(1.0)},
+        }
 
 class SujetoStock:
     """
@@ -49,6 +259,12 @@ class SujetoStock:
     
     def __init__(self):
         self._observadores: List[Observador] = []
+        self._despachador: Optional[DespachadorNotificaciones] = None
+    
+    def usar_despachador(self, **opciones) -> DespachadorNotificaciones:
+        """Entrega asíncrona mientras el despachador esté iniciado; antes y después, síncrona"""
+        self._despachador = DespachadorNotificaciones(self._observadores, **opciones)
+        return self._despachador
     
     def agregar_observador(self, observador: Observador):
         """Agrega un observador a la lista"""
@@ -65,15 +281,37 @@ class SujetoStock:
         Notifica a todos los observadores registrados
         PATRON ITERATOR: Itera sobre todos los observadores
         """
+        if self._despachador is not None and self._despachador.activo:
+            self._despachador.encolar(evento, datos)
+            return
         for observador in self._observadores:
             try:
                 observador.actualizar(evento, datos)
             except Exception as e:
                 logger.error(f"Error notificando observador: {str(e)}")
     
+    def notificar_observadores_lote(self, evento: str, lote: List[Dict[str, Any]]):
+        """Notifica un lote completo con una sola llamada por observador"""
+        if not lote:
+            return
+        if self._despachador is not None and self._despachador.activo:
+            # El despachador vuelve a agrupar, ya deduplicado por producto
+            for datos in lote:
+                self._despachador.encolar(evento, datos)
+            return
+        for observador in self._observadores:
+            try:
+                observador.actualizar_lote(evento, lote)
+            except Exception as e:
+                logger.error(f"Error notificando observador: {str(e)}")
+    
     def notificar_stock_bajo(self, producto: Dict[str, Any]):
         """Método específico para notificaciones de stock bajo"""
         self.notificar_observadores("stock_bajo", producto)
+    
+    def notificar_stock_bajo_lote(self, productos: List[Dict[str, Any]]):
+        """Stock bajo de una carga masiva: una notificación por lote, no por fila"""
+        self.notificar_observadores_lote("stock_bajo", productos)
 
 # Instancia global del sujeto - PATRON SINGLETON
 sujeto_stock = SujetoStock()
@@ -0,0 +1,373 @@
+"""
+Recuento físico de stock - PATRON PIPELINE
+El CSV del recuento se procesa en tres fases, todas por lotes y con la
+memoria acotada por el tamaño de lote:
+1. Recepción: cada lote de filas se acumula por SKU en recuento_lineas
+   (un SKU contado en varios pasillos suma sus cantidades)
+2. Análisis: las líneas se cruzan por lotes con el stock actual ($in por
+   SKU) y cada una queda con su diferencia; el recuento lleva los totales
+3. Ajuste: las diferencias se aplican con bulk_write como $inc, así las
+   ventas hechas entre el recuento y el ajuste no se pierden. Cada producto
+   ajustado queda marcado con el id del recuento: repetir un lote no ajusta dos veces
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from comun.etag import VersionColeccion
+from comun.stock_bajo import con_bajo_stock
+from modelos import EstadoLineaRecuento, EstadoRecuento
+
+logger = logging.getLogger(__name__)
+
+class RecuentoRepository:
+    """PATRON REPOSITORY: Recuentos, sus líneas y los ajustes sobre los productos"""
+
+    def __init__(self, recuentos, lineas, productos, tamano_muestra: int = 50):
+        self.recuentos = recuentos
+        self.lineas = lineas
+        self.productos = productos
+        self.tamano_muestra = tamano_muestra
+        self.versiones = VersionColeccion(productos)
+
+    async def crear(self, referencia: Optional[str], aplicar: bool) -> dict:
+        ahora = datetime.now()
+        recuento = {
+            "_id": ObjectId(),
+            "referencia": referencia,
+            "estado": EstadoRecuento.RECIBIENDO.value,
+            "aplicar": aplicar,
+            "errores": [],
+            "fecha_creacion": ahora,
+            "fecha_actualizacion": ahora,
+        }
+        self.recuentos.insert_one(recuento)
+        return recuento
+
+    async def obtener(self, recuento_id: str) -> Optional[dict]:
+        if not ObjectId.is_valid(recuento_id):
+            return None
+        return self.recuentos.find_one({"_id": ObjectId(recuento_id)})
+
+    def _avanzar(self, recuento_id: ObjectId, contadores: Dict[str, Any], cambios: Optional[Dict[str, Any]] = None, errores=()):
+        actualizacion: Dict[str, Any] = {
+            "$inc": {clave: valor for clave, valor in contadores.items() if valor},
+            "$set": {"fecha_actualizacion": datetime.now(), **(cambios or {})},
+        }
+        if errores:
+            actualizacion["$push"] = {"errores": {"$each": list(errores), "$slice": self.tamano_muestra}}
+        if not actualizacion["$inc"]:
+            del actualizacion["$inc"]
+        return self.recuentos.find_one_and_update(
+            {"_id": recuento_id}, actualizacion, return_document=ReturnDocument.AFTER
+        )
+
+    def cambiar_estado(self, recuento_id: ObjectId, estado: EstadoRecuento, **campos):
+        self._avanzar(recuento_id, {}, {"estado": estado.value, **campos})
+
+    # --- Fase 1: recepción ---
+
+    def registrar_conteos(self, recuento_id: ObjectId, filas: List[Tuple[int, Dict[str, str]]]):
+        """Valida un lote de filas del CSV y suma las cantidades por SKU"""
+        errores = []
+        cantidades: Dict[str, Tuple[int, int]] = {}
+        for linea, fila in filas:
+            sku = fila.get("sku", "")
+            texto = fila.get("cantidad", "")
+            try:
+                cantidad = int(texto)
+            except ValueError:
+                errores.append({"linea": linea, "error": f"Cantidad no válida: {texto!r}"})
+                continue
+            if not sku or cantidad < 0:
+                errores.append({"linea": linea, "error": "Falta el SKU" if not sku else "Cantidad negativa"})
+                continue
+            anterior, primera = cantidades.get(sku, (0, linea))
+            cantidades[sku] = (anterior + cantidad, primera)
+
+        nuevos = 0
+        if cantidades:
+            resultado = self.lineas.bulk_write([
+                UpdateOne(
+                    {"recuento_id": recuento_id, "sku": sku},
+                    {
+                        "$inc": {"contado": cantidad},
+                        "$setOnInsert": {"estado": EstadoLineaRecuento.CONTADO.value, "linea": primera},
+                    },
+                    upsert=True
+                )
+                for sku, (cantidad, primera) in cantidades.items()
+            ], ordered=False)
+            nuevos = resultado.upserted_count
+        self._avanzar(
+            recuento_id,
+            {"lineas_leidas": len(filas), "lineas_con_error": len(errores), "skus": nuevos},
+            errores=errores
+        )
+
+    # --- Fase 2: análisis ---
+
+    def analizar_lote(self, recuento: dict, tamano: int) -> bool:
+        """Cruza el siguiente lote de líneas con el stock actual; devuelve si terminó"""
+        recuento_id = recuento["_id"]
+        filtro: Dict[str, Any] = {"recuento_id": recuento_id}
+        if recuento.get("analizado_hasta") is not None:
+            filtro["_id"] = {"$gt": recuento["analizado_hasta"]}
+        lineas = list(self.lineas.find(filtro, {"sku": 1, "contado": 1}).sort("_id", ASCENDING).limit(tamano))
+        productos = {
+            producto["sku"]: producto
+            for producto in self.productos.find(
+                {"sku": {"$in": [linea["sku"] for linea in lineas]}},
+                {"sku": 1, "stock": 1, "precio": 1, "stock_minimo": 1, "nombre": 1, "activo": 1}
+            )
+        }
+        operaciones = []
+        contadores = {
+            "analizados": len(lineas), "cuadran": 0, "con_diferencia": 0, "desconocidos": 0,
+            "unidades_faltantes": 0, "unidades_sobrantes": 0, "valor_diferencia": 0.0,
+        }
+        for linea in lineas:
+            producto = productos.get(linea["sku"])
+            if producto is None or not producto.get("activo", False):
+                contadores["desconocidos"] += 1
+                cambios: Dict[str, Any] = {"estado": EstadoLineaRecuento.DESCONOCIDO.value}
+            else:
+                diferencia = linea["contado"] - producto.get("stock", 0)
+                valor = round(diferencia * producto.get("precio", 0), 2)
+                if diferencia:
+                    contadores["con_diferencia"] += 1
+                    contadores["unidades_faltantes" if diferencia < 0 else "unidades_sobrantes"] += abs(diferencia)
+                    contadores["valor_diferencia"] += valor
+                else:
+                    contadores["cuadran"] += 1
+                cambios = {
+                    "estado": (EstadoLineaRecuento.DIFERENCIA if diferencia else EstadoLineaRecuento.CUADRA).value,
+                    "producto_id": producto["_id"],
+                    "sistema": producto.get("stock", 0),
+                    "diferencia": diferencia,
+                    "valor_diferencia": valor,
+                    "stock_minimo": producto.get("stock_minimo", 0),
+                    "nombre": producto.get("nombre"),
+                }
+            operaciones.append(UpdateOne({"_id": linea["_id"]}, {"$set": cambios}))
+        if operaciones:
+            self.lineas.bulk_write(operaciones, ordered=False)
+        contadores["valor_diferencia"] = round(contadores["valor_diferencia"], 2)
+        terminado = len(lineas) < tamano
+        cambios_recuento: Dict[str, Any] = {}
+        if lineas:
+            cambios_recuento["analizado_hasta"] = lineas[-1]["_id"]
+        recuento.update(self._avanzar(recuento_id, contadores, cambios_recuento))
+        return terminado
+
+    # --- Fase 3: ajuste ---
+
+    def aplicar_lote(self, recuento: dict, tamano: int) -> Tuple[bool, List[dict]]:
+        """
+        Aplica el siguiente lote de diferencias como $inc sobre el stock.
+        Devuelve (terminado, productos que cruzaron su stock mínimo)
+        """
+        recuento_id = recuento["_id"]
+        lineas = list(
+            self.lineas.find({"recuento_id": recuento_id, "estado": EstadoLineaRecuento.DIFERENCIA.value})
+            .sort("_id", ASCENDING)
+            .limit(tamano)
+        )
+        ahora = datetime.now()
+        if lineas:
+            escritos = self.productos.bulk_write([
+                UpdateOne(
+                    {"_id": linea["producto_id"], "recuento_id": {"$ne": recuento_id}},
+                    con_bajo_stock({
+                        "$inc": {"stock": linea["diferencia"], "version": 1},
+                        "$set": {"fecha_actualizacion": ahora, "recuento_id": recuento_id},
+                    })
+                )
+                for linea in lineas
+            ], ordered=False).matched_count
+            if escritos:
+                self.versiones.incrementar()
+            # Las que no casaron ya estaban ajustadas (lote repetido tras una caída)
+            self.lineas.update_many(
+                {"_id": {"$in": [linea["_id"] for linea in lineas]}},
+                {"$set": {"estado": EstadoLineaRecuento.AJUSTADA.value, "fecha_ajuste": ahora}}
+            )
+        terminado = len(lineas) < tamano
+        cambios: Dict[str, Any] = {}
+        if terminado:
+            cambios = {"estado": EstadoRecuento.APLICADO.value, "fecha_fin": datetime.now()}
+        recuento.update(self._avanzar(recuento_id, {"ajustados": len(lineas)}, cambios))
+        stock_bajo = [
+            {"_id": linea["producto_id"], "sku": linea["sku"], "nombre": linea.get("nombre"),
+             "stock": linea["contado"], "stock_minimo": linea["stock_minimo"]}
+            for linea in lineas
+            if linea["contado"] < linea["stock_minimo"] <= linea["sistema"]
+        ]
+        return terminado, stock_bajo
+
+    def _analisis_reclamable(self, abandono: timedelta) -> Dict[str, Any]:
+        """Recibidos del todo y sin analizar: fallidos, o analizando sin avance reciente (su worker cayó)"""
+        return {
+            "recepcion_completa": True,
+            "analisis_completo": {"$ne": True},
+            "$or": [
+                {"estado": EstadoRecuento.FALLIDO.value},
+                {"estado": EstadoRecuento.ANALIZANDO.value, "fecha_actualizacion": {"$lt": datetime.now() - abandono}},
+            ],
+        }
+
+    def _ajuste_reclamable(self, abandono: timedelta) -> Dict[str, Any]:
+        """Analizados, fallidos tras el análisis o aplicando sin avance reciente"""
+        return {
+            "analisis_completo": True,
+            "$or": [
+                {"estado": {"$in": [EstadoRecuento.ANALIZADO.value, EstadoRecuento.FALLIDO.value]}},
+                {"estado": EstadoRecuento.APLICANDO.value, "fecha_actualizacion": {"$lt": datetime.now() - abandono}},
+            ],
+        }
+
+    def reclamar_analisis(self, recuento_id: ObjectId, abandono: timedelta) -> Optional[dict]:
+        """Vuelve a analizando un recuento interrumpido; sigue desde `analizado_hasta`"""
+        return self.recuentos.find_one_and_update(
+            {"_id": recuento_id, **self._analisis_reclamable(abandono)},
+            {"$set": {"estado": EstadoRecuento.ANALIZANDO.value, "fecha_actualizacion": datetime.now()}, "$unset": {"error": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def reclamar_ajuste(self, recuento_id: ObjectId, abandono: timedelta) -> Optional[dict]:
+        """Pasa a aplicando un recuento analizado, fallido tras el análisis o abandonado a medias"""
+        return self.recuentos.find_one_and_update(
+            {"_id": recuento_id, **self._ajuste_reclamable(abandono)},
+            {"$set": {"estado": EstadoRecuento.APLICANDO.value, "fecha_actualizacion": datetime.now()}, "$unset": {"error": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def reclamables(self, abandono: timedelta) -> Tuple[List[ObjectId], List[ObjectId]]:
+        """
+        Ids de los recuentos a retomar al arrancar: los que esperan análisis y
+        los que pidieron el ajuste al subirse y no lo terminaron
+        """
+        analisis = [r["_id"] for r in self.recuentos.find(self._analisis_reclamable(abandono), {"_id": 1})]
+        ajustes = [
+            r["_id"] for r in self.recuentos.find({"aplicar": True, **self._ajuste_reclamable(abandono)}, {"_id": 1})
+        ]
+        return analisis, ajustes
+
+    def cursor_lineas(self, recuento_id: ObjectId, solo_diferencias: bool):
+        """Informe de diferencias en streaming, en el orden de llegada de los SKU"""
+        filtro: Dict[str, Any] = {"recuento_id": recuento_id}
+        if solo_diferencias:
+            filtro["estado"] = {"$in": [
+                EstadoLineaRecuento.DIFERENCIA.value, EstadoLineaRecuento.AJUSTADA.value,
+                EstadoLineaRecuento.DESCONOCIDO.value,
+            ]}
+        return self.lineas.find(filtro).sort("_id", ASCENDING)
+
+    async def crear_indices(self):
+        self.lineas.create_index([("recuento_id", ASCENDING), ("sku", ASCENDING)], unique=True)
+        self.lineas.create_index([("recuento_id", ASCENDING), ("estado", ASCENDING), ("_id", ASCENDING)])
+
+class ProcesadorRecuentos:
+    """Ejecuta el análisis y el ajuste en segundo plano, un lote por hilo"""
+
+    def __init__(
+        self,
+        repositorio: RecuentoRepository,
+        tamano_lote: int,
+        abandono: float,
+        al_cruzar_minimo: Optional[Callable[[List[dict]], None]] = None
+    ):
+        self.repositorio = repositorio
+        self.tamano_lote = tamano_lote
+        self.abandono = timedelta(seconds=abandono)
+        self.al_cruzar_minimo = al_cruzar_minimo
+        self._tareas: Dict[ObjectId, asyncio.Task] = {}
+
+    async def recibir(self, recuento: dict, primero: List[Tuple[int, Dict[str, str]]], lotes):
+        """Fase 1 dentro de la petición: consume el CSV según llega, lote a lote"""
+        await asyncio.to_thread(self.repositorio.registrar_conteos, recuento["_id"], primero)
+        async for filas in lotes:
+            await asyncio.to_thread(self.repositorio.registrar_conteos, recuento["_id"], filas)
+
+    async def _analizar(self, recuento: dict):
+        terminado = False
+        while not terminado:
+            terminado = await asyncio.to_thread(self.repositorio.analizar_lote, recuento, self.tamano_lote)
+        await asyncio.to_thread(
+            self.repositorio.cambiar_estado, recuento["_id"], EstadoRecuento.ANALIZADO, analisis_completo=True
+        )
+        logger.info(
+            "Recuento %s analizado: %s SKU, %s con diferencia, %s desconocidos",
+            recuento["_id"], recuento.get("analizados", 0), recuento.get("con_diferencia", 0),
+            recuento.get("desconocidos", 0)
+        )
+
+    async def _aplicar(self, recuento: dict):
+        terminado = False
+        while not terminado:
+            terminado, stock_bajo = await asyncio.to_thread(self.repositorio.aplicar_lote, recuento, self.tamano_lote)
+            if stock_bajo and self.al_cruzar_minimo is not None:
+                self.al_cruzar_minimo(stock_bajo)
+        logger.info("Recuento %s aplicado: %s productos ajustados", recuento["_id"], recuento.get("ajustados", 0))
+
+    async def _ejecutar(self, recuento: dict, analizar: bool, aplicar: bool):
+        recuento_id = recuento["_id"]
+        try:
+            if analizar:
+                await self._analizar(recuento)
+            if aplicar:
+                if analizar:
+                    recuento = await asyncio.to_thread(self.repositorio.reclamar_ajuste, recuento_id, self.abandono)
+                if recuento is not None:
+                    await self._aplicar(recuento)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(
+                self.repositorio.cambiar_estado, recuento_id, EstadoRecuento.FALLIDO, error="Servicio detenido"
+            )
+            raise
+        except Exception as e:
+            logger.error("Error procesando el recuento %s: %s", recuento_id, e)
+            await asyncio.to_thread(self.repositorio.cambiar_estado, recuento_id, EstadoRecuento.FALLIDO, error=str(e))
+        finally:
+            self._tareas.pop(recuento_id, None)
+
+    def analizar(self, recuento: dict):
+        """Lanza el análisis (y el ajuste si el recuento lo pidió) tras la recepción"""
+        # Con la recepción completa el análisis se puede retomar si se interrumpe
+        self.repositorio.cambiar_estado(recuento["_id"], EstadoRecuento.ANALIZANDO, recepcion_completa=True)
+        self._tareas[recuento["_id"]] = asyncio.create_task(self._ejecutar(recuento, True, recuento["aplicar"]))
+
+    async def _reanudar_analisis(self, recuento_id: ObjectId) -> Optional[dict]:
+        if recuento_id in self._tareas:
+            return None
+        recuento = await asyncio.to_thread(self.repositorio.reclamar_analisis, recuento_id, self.abandono)
+        if recuento is not None:
+            self._tareas[recuento_id] = asyncio.create_task(self._ejecutar(recuento, True, recuento["aplicar"]))
+        return recuento
+
+    async def aplicar(self, recuento_id: ObjectId) -> Optional[dict]:
+        """Lanza el ajuste de un recuento ya analizado; None si no se puede reclamar"""
+        if recuento_id in self._tareas:
+            return None
+        recuento = await asyncio.to_thread(self.repositorio.reclamar_ajuste, recuento_id, self.abandono)
+        if recuento is not None:
+            self._tareas[recuento_id] = asyncio.create_task(self._ejecutar(recuento, False, True))
+        return recuento
+
+    async def iniciar(self):
+        """Retoma lo que un worker detenido o caído dejó a medias; de varios workers lo toma uno"""
+        analisis, ajustes = await asyncio.to_thread(self.repositorio.reclamables, self.abandono)
+        for recuento_id in analisis:
+            if await self._reanudar_analisis(recuento_id):
+                logger.info("Recuento %s: análisis retomado desde su punto de control", recuento_id)
+        for recuento_id in ajustes:
+            if await self.aplicar(recuento_id):
+                logger.info("Recuento %s: ajuste retomado", recuento_id)
+
+    async def detener(self):
+        for tarea in list(self._tareas.values()):
+            tarea.cancel()
+        self._tareas.clear()
@@ -0,0 +1,217 @@
+"""
+Reservas de stock con caducidad - PATRON UNIT OF WORK
+Una reserva retiene las unidades de todas las líneas de un carrito en un
+solo bulk_write sobre el contador `reservado` del producto; después se
+confirma (descuenta stock y reservado) o se libera. Cada producto guarda
+los ids de las reservas que lo retienen, así aplicar o deshacer una línea
+es idempotente y un reintento tras un fallo nunca descuenta dos veces
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from comun.etag import VersionColeccion
+from comun.stock_bajo import con_bajo_stock
+from modelos import EstadoReserva
+
+logger = logging.getLogger(__name__)
+
+# Una reserva a medio cerrar (proceso caído) se completa pasado este tiempo
+MARGEN_CIERRE = timedelta(seconds=60)
+
+class ReservaRepository:
+    """PATRON REPOSITORY: Reservas y sus contadores en los productos"""
+
+    def __init__(self, reservas, productos):
+        self.reservas = reservas
+        self.productos = productos
+        self.versiones = VersionColeccion(productos)
+
+    # --- Movimientos sobre los productos ---
+
+    def _retener(self, reserva_id: ObjectId, lineas: List[dict]) -> int:
+        """Suma cada línea a `reservado` si el disponible alcanza; devuelve cuántas se aplicaron"""
+        operaciones = [
+            UpdateOne(
+                {
+                    "_id": linea["producto_id"],
+                    "activo": True,
+                    "reservas_activas": {"$ne": reserva_id},
+                    "$expr": {"$gte": [
+                        {"$subtract": ["$stock", {"$ifNull": ["$reservado", 0]}]},
+                        linea["cantidad"]
+                    ]},
+                },
+                {"$inc": {"reservado": linea["cantidad"], "version": 1}, "$push": {"reservas_activas": reserva_id}}
+            )
+            for linea in lineas
+        ]
+        retenidas = self.productos.bulk_write(operaciones, ordered=False).matched_count
+        if retenidas:
+            self.versiones.incrementar()
+        return retenidas
+
+    def _soltar(self, reserva_id: ObjectId, lineas: List[dict], confirmar: bool):
+        """Deshace la retención de cada línea; al confirmar descuenta además el stock"""
+        operaciones = []
+        for linea in lineas:
+            incremento = {"reservado": -linea["cantidad"], "version": 1}
+            actualizacion: Dict[str, Any] = {"$pull": {"reservas_activas": reserva_id}}
+            actualizacion["$inc"] = incremento
+            if confirmar:
+                incremento["stock"] = -linea["cantidad"]
+                actualizacion["$set"] = {"fecha_actualizacion": datetime.now()}
+                # El stock baja: bajo_stock se recalcula en la misma escritura
+                actualizacion = con_bajo_stock(actualizacion)
+            operaciones.append(UpdateOne({"_id": linea["producto_id"], "reservas_activas": reserva_id}, actualizacion))
+        if operaciones and self.productos.bulk_write(operaciones, ordered=False).modified_count:
+            self.versiones.incrementar()
+
+    def _faltantes(self, lineas: List[dict]) -> List[Dict[str, Any]]:
+        """Líneas sin disponible suficiente, para explicar un rechazo"""
+        productos = {
+            p["_id"]: p for p in self.productos.find(
+                {"_id": {"$in": [linea["producto_id"] for linea in lineas]}},
+                {"stock": 1, "reservado": 1, "activo": 1}
+            )
+        }
+        faltantes = []
+        for linea in lineas:
+            producto = productos.get(linea["producto_id"])
+            disponible = 0
+            if producto is not None and producto.get("activo", False):
+                disponible = producto.get("stock", 0) - producto.get("reservado", 0)
+            if disponible < linea["cantidad"]:
+                faltantes.append({
+                    "producto_id": str(linea["producto_id"]),
+                    "solicitado": linea["cantidad"],
+                    "disponible": max(disponible, 0),
+                })
+        return faltantes
+
+    # --- Ciclo de vida ---
+
+    async def crear(self, lineas: List[dict], ttl: float) -> Tuple[Optional[dict], List[Dict[str, Any]]]:
+        """
+        Reserva todas las líneas o ninguna. Devuelve (reserva, []) o
+        (None, líneas que faltan). El documento se inserta antes de tocar
+        los productos para que el barredor pueda limpiar si el proceso cae
+        """
+        ahora = datetime.now()
+        reserva = {
+            "_id": ObjectId(),
+            "lineas": lineas,
+            "estado": EstadoReserva.ACTIVA.value,
+            "fecha_creacion": ahora,
+            "expira_en": ahora + timedelta(seconds=ttl),
+        }
+        self.reservas.insert_one(reserva)
+        if self._retener(reserva["_id"], lineas) == len(lineas):
+            return reserva, []
+
+        # Alguna línea no alcanzó: se deshacen solo las que sí se retuvieron
+        self._soltar(reserva["_id"], lineas, confirmar=False)
+        self.reservas.update_one(
+            {"_id": reserva["_id"]},
+            {"$set": {"estado": EstadoReserva.LIBERADA.value, "fecha_cierre": datetime.now(), "motivo": "sin_stock"}}
+        )
+        return None, self._faltantes(lineas)
+
+    async def obtener(self, reserva_id: str) -> Optional[dict]:
+        if not ObjectId.is_valid(reserva_id):
+            return None
+        return self.reservas.find_one({"_id": ObjectId(reserva_id)})
+
+    async def productos_de(self, producto_ids: List[ObjectId], proyeccion: dict) -> List[dict]:
+        """Estado de los productos de una reserva tras cerrarla, en una lectura"""
+        return list(self.productos.find({"_id": {"$in": producto_ids}}, proyeccion))
+
+    def _finalizar(self, reserva: dict) -> dict:
+        confirmar = reserva["estado"] == EstadoReserva.CONFIRMANDO.value
+        self._soltar(reserva["_id"], reserva["lineas"], confirmar)
+        final = EstadoReserva.CONFIRMADA if confirmar else EstadoReserva.LIBERADA
+        return self.reservas.find_one_and_update(
+            {"_id": reserva["_id"]},
+            {"$set": {"estado": final.value, "fecha_cierre": datetime.now()}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def cerrar(self, reserva_id: str, confirmar: bool, motivo: str) -> Optional[dict]:
+        """
+        Confirma o libera una reserva activa. La transición de estado se hace
+        primero y de forma atómica: de dos cierres simultáneos (o cierre y
+        barredor) solo uno la gana. Devuelve None si no estaba activa
+        """
+        if not ObjectId.is_valid(reserva_id):
+            return None
+        filtro: Dict[str, Any] = {"_id": ObjectId(reserva_id), "estado": EstadoReserva.ACTIVA.value}
+        if confirmar:
+            filtro["expira_en"] = {"$gt": datetime.now()}
+        intermedio = EstadoReserva.CONFIRMANDO if confirmar else EstadoReserva.LIBERANDO
+        reserva = self.reservas.find_one_and_update(
+            filtro,
+            {"$set": {"estado": intermedio.value, "fecha_estado": datetime.now(), "motivo": motivo}},
+            return_document=ReturnDocument.AFTER
+        )
+        return self._finalizar(reserva) if reserva is not None else None
+
+    def barrer(self, maximo: int = 500) -> int:
+        """
+        Libera las reservas caducadas y completa cierres interrumpidos;
+        devuelve cuántas cerró. Bloqueante: el barredor lo ejecuta en un hilo
+        """
+        ahora = datetime.now()
+        cerradas = 0
+        while cerradas < maximo:
+            reserva = self.reservas.find_one_and_update(
+                {"estado": EstadoReserva.ACTIVA.value, "expira_en": {"$lte": ahora}},
+                {"$set": {"estado": EstadoReserva.LIBERANDO.value, "fecha_estado": ahora, "motivo": "caducada"}},
+                return_document=ReturnDocument.AFTER
+            )
+            if reserva is None:
+                break
+            self._finalizar(reserva)
+            cerradas += 1
+        interrumpidas = self.reservas.find({
+            "estado": {"$in": [EstadoReserva.CONFIRMANDO.value, EstadoReserva.LIBERANDO.value]},
+            "fecha_estado": {"$lt": ahora - MARGEN_CIERRE},
+        }).limit(maximo)
+        for reserva in interrumpidas:
+            self._finalizar(reserva)
+            cerradas += 1
+        return cerradas
+
+    async def crear_indices(self, retencion: float):
+        """Barrido por caducidad; las reservas cerradas se borran solas pasada la retención"""
+        self.reservas.create_index([("estado", ASCENDING), ("expira_en", ASCENDING)])
+        self.reservas.create_index("fecha_cierre", expireAfterSeconds=int(retencion))
+
+class BarredorReservas:
+    """Tarea periódica que devuelve al disponible el stock de reservas abandonadas"""
+
+    def __init__(self, repositorio: ReservaRepository, intervalo: float):
+        self.repositorio = repositorio
+        self.intervalo = intervalo
+        self._tarea: Optional[asyncio.Task] = None
+
+    async def _bucle(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                cerradas = await asyncio.to_thread(self.repositorio.barrer)
+                if cerradas:
+                    logger.info("Barredor de reservas: %s reservas cerradas", cerradas)
+            except Exception as e:
+                logger.error("Error barriendo reservas: %s", e)
+
+    async def iniciar(self):
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
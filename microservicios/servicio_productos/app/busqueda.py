@@ -0,0 +1,445 @@
+"""
+Índice de búsqueda de productos en memoria - PATRON OBSERVER
+Índice invertido con plegado de acentos, prefijos sobre el vocabulario
+ordenado y tolerancia a erratas por trigramas. Se mantiene sincronizado
+suscrito a los cambios del catálogo residente.
+
+Tres estructuras, de más a menos específica:
+- SKU: clave compacta exacta o por prefijo (lo que entra por el escáner);
+  una parte numérica puede ser común a varios SKU ("000123")
+- nombre: postings en conjuntos, intersecados en C
+- descripción: arrays compactos que solo se consultan para completar la
+  página cuando el nombre no llega al límite
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from bson import ObjectId
+
+# Puntuaciones: SKU por encima de nombre, nombre por encima de descripción
+PUNTOS_SKU_EXACTO = 1000.0
+PUNTOS_SKU_PREFIJO = 500.0
+PUNTOS_DESCRIPCION = 0.1
+
+# Factor de puntuación según cómo casó el término de la consulta
+FACTOR_EXACTO = 1.0
+FACTOR_PREFIJO = 0.7
+FACTOR_ERRATA = 0.5
+
+LONGITUD_MINIMA_PREFIJO = 2
+LONGITUD_MINIMA_ERRATA = 4
+LONGITUD_MINIMA_SKU = 4
+MAX_EXPANSIONES_PREFIJO = 30
+MAX_EXPANSIONES_DESCRIPCION = 5
+MAX_CORRECCIONES = 5
+MAX_TERMINOS_DESCRIPCION = 40
+# Documentos que se examinan como máximo al completar con la descripción
+MAX_CANDIDATOS_DESCRIPCION = 200
+
+PALABRAS_VACIAS = frozenset(
+    "a al con de del el en es la las lo los para por que se sin su sus un una uno y o".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_DIACRITICOS = re.compile("[\u0300-\u036f]")
+
+def plegar(texto: str) -> str:
+    """Minúsculas y sin acentos ni diéresis: "Café Ñandú" -> "cafe nandu" """
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    return _DIACRITICOS.sub("", unicodedata.normalize("NFKD", texto))
+
+def tokenizar(texto: Optional[str]) -> List[str]:
+    return _TOKEN.findall(plegar(texto or ""))
+
+def claves_sku(sku: Optional[str]) -> Set[str]:
+    """SKU compacto ("SKU-000123" -> "sku000123") y sus partes con dígitos ("000123")"""
+    tokens = tokenizar(sku)
+    claves = {t for t in tokens if len(t) >= LONGITUD_MINIMA_SKU and any(c.isdigit() for c in t)}
+    if tokens:
+        claves.add("".join(tokens))
+    return claves
+
+def _trigramas(termino: str) -> Set[str]:
+    relleno = f"^{termino}$"
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+def _admite_errata(termino: str) -> bool:
+    return len(termino) >= LONGITUD_MINIMA_ERRATA and not termino.isdigit()
+
+def _distancia(a: str, b: str, maximo: int) -> int:
+    """Levenshtein con corte: devuelve maximo + 1 en cuanto se supera"""
+    if abs(len(a) - len(b)) > maximo:
+        return maximo + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        if min(actual) > maximo:
+            return maximo + 1
+        anterior = actual
+    return anterior[-1]
+
+def _contiene(postings: array, interno: int) -> bool:
+    posicion = bisect_left(postings, interno)
+    return posicion < len(postings) and postings[posicion] == interno
+
+class Vocabulario:
+    """
+    Términos ordenados para buscar por prefijo con bisect. Las altas se
+    acumulan y se ordenan en bloque: la carga inicial no paga un insort
+    por término
+    """
+
+    def __init__(self):
+        self._ordenados: List[str] = []
+        self._pendientes: Set[str] = set()
+
+    def agregar(self, termino: str):
+        self._pendientes.add(termino)
+
+    def quitar(self, termino: str):
+        if termino in self._pendientes:
+            self._pendientes.discard(termino)
+            return
+        posicion = bisect_left(self._ordenados, termino)
+        if posicion < len(self._ordenados) and self._ordenados[posicion] == termino:
+            del self._ordenados[posicion]
+
+    def ordenar(self):
+        if len(self._pendientes) > 1000:
+            self._ordenados = sorted(self._ordenados + list(self._pendientes))
+        else:
+            for termino in self._pendientes:
+                insort(self._ordenados, termino)
+        self._pendientes.clear()
+
+    def con_prefijo(self, prefijo: str, maximo: int) -> List[str]:
+        if self._pendientes:
+            self.ordenar()
+        inicio = bisect_left(self._ordenados, prefijo)
+        terminos = []
+        for termino in self._ordenados[inicio:inicio + maximo + 1]:
+            if not termino.startswith(prefijo):
+                break
+            if termino != prefijo:
+                terminos.append(termino)
+        return terminos[:maximo]
+
+    def __len__(self) -> int:
+        return len(self._ordenados) + len(self._pendientes)
+
+class IndiceBusqueda:
+    """Índice sobre identificadores enteros internos, reutilizados tras las bajas"""
+
+    def __init__(self):
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._sku: Dict[str, Set[int]] = {}
+        self._vocabulario_sku = Vocabulario()
+        self._nombre: Dict[str, Set[int]] = {}
+        self._vocabulario = Vocabulario()
+        self._trigramas: Dict[str, Set[str]] = {}
+        # La descripción usa identificadores de término para guardar poco por documento
+        self._descripcion: List[Optional[array]] = []
+        self._id_termino: Dict[str, int] = {}
+        self._termino_de_id: List[Optional[str]] = []
+        self._terminos_libres: List[int] = []
+        self._vocabulario_descripcion = Vocabulario()
+        self._internos: Dict[ObjectId, int] = {}
+        self._externos: List[Optional[ObjectId]] = []
+        self._documentos: List[Optional[Tuple[Tuple[str, ...], Tuple[str, ...], array]]] = []
+        self._categorias: List[Optional[str]] = []
+        self._libres: List[int] = []
+
+    def preparar(self):
+        """Ordena los vocabularios tras una carga completa, antes de la primera consulta"""
+        for vocabulario in (self._vocabulario, self._vocabulario_sku, self._vocabulario_descripcion):
+            vocabulario.ordenar()
+
+    # --- Suscriptor del catálogo ---
+
+    def _alta_nombre(self, termino: str, interno: int):
+        postings = self._nombre.get(termino)
+        if postings is None:
+            postings = self._nombre[termino] = set()
+            self._vocabulario.agregar(termino)
+            if _admite_errata(termino):
+                for trigrama in _trigramas(termino):
+                    self._trigramas.setdefault(trigrama, set()).add(termino)
+        postings.add(interno)
+
+    def _baja_nombre(self, termino: str, interno: int):
+        postings = self._nombre[termino]
+        postings.discard(interno)
+        if postings:
+            return
+        del self._nombre[termino]
+        self._vocabulario.quitar(termino)
+        if _admite_errata(termino):
+            for trigrama in _trigramas(termino):
+                terminos = self._trigramas[trigrama]
+                terminos.discard(termino)
+                if not terminos:
+                    del self._trigramas[trigrama]
+
+    def _alta_descripcion(self, termino: str, interno: int) -> int:
+        id_termino = self._id_termino.get(termino)
+        if id_termino is None:
+            if self._terminos_libres:
+                id_termino = self._terminos_libres.pop()
+                self._descripcion[id_termino] = array("I")
+                self._termino_de_id[id_termino] = termino
+            else:
+                id_termino = len(self._descripcion)
+                self._descripcion.append(array("I"))
+                self._termino_de_id.append(termino)
+            self._id_termino[termino] = id_termino
+            self._vocabulario_descripcion.agregar(termino)
+        postings = self._descripcion[id_termino]
+        if not postings or postings[-1] < interno:
+            postings.append(interno)
+        else:
+            # Identificador reutilizado: se mantiene el array ordenado
+            insort(postings, interno)
+        return id_termino
+
+    def _baja_descripcion(self, id_termino: int, interno: int):
+        postings = self._descripcion[id_termino]
+        del postings[bisect_left(postings, interno)]
+        if not postings:
+            termino = self._termino_de_id[id_termino]
+            self._descripcion[id_termino] = None
+            self._termino_de_id[id_termino] = None
+            del self._id_termino[termino]
+            self._terminos_libres.append(id_termino)
+            self._vocabulario_descripcion.quitar(termino)
+
+    def indexar(self, documento: dict):
+        """Alta o cambio de un producto activo"""
+        producto_id = documento["_id"]
+        self.desindexar(producto_id)
+        if self._libres:
+            interno = self._libres.pop()
+        else:
+            interno = len(self._externos)
+            self._externos.append(None)
+            self._documentos.append(None)
+            self._categorias.append(None)
+
+        skus = tuple(claves_sku(documento.get("sku")))
+        for clave in skus:
+            postings = self._sku.get(clave)
+            if postings is None:
+                postings = self._sku[clave] = set()
+                self._vocabulario_sku.agregar(clave)
+            postings.add(interno)
+        nombre = tuple(dict.fromkeys(tokenizar(documento.get("nombre"))))
+        for termino in nombre:
+            self._alta_nombre(termino, interno)
+        descripcion = [
+            t for t in dict.fromkeys(tokenizar(documento.get("descripcion")))
+            if t not in PALABRAS_VACIAS and t not in nombre
+        ][:MAX_TERMINOS_DESCRIPCION]
+        ids_descripcion = array("I", (self._alta_descripcion(t, interno) for t in descripcion))
+
+        self._externos[interno] = producto_id
+        self._documentos[interno] = (skus, nombre, ids_descripcion)
+        self._categorias[interno] = documento.get("categoria")
+        self._internos[producto_id] = interno
+
+    def desindexar(self, producto_id: ObjectId):
+        """Baja de un producto (eliminado o inactivo)"""
+        interno = self._internos.pop(producto_id, None)
+        if interno is None:
+            return
+        skus, nombre, ids_descripcion = self._documentos[interno]
+        for clave in skus:
+            postings = self._sku[clave]
+            postings.discard(interno)
+            if not postings:
+                del self._sku[clave]
+                self._vocabulario_sku.quitar(clave)
+        for termino in nombre:
+            self._baja_nombre(termino, interno)
+        for id_termino in ids_descripcion:
+            self._baja_descripcion(id_termino, interno)
+        self._externos[interno] = None
+        self._documentos[interno] = None
+        self._categorias[interno] = None
+        self._libres.append(interno)
+
+    # --- Consulta ---
+
+    def _correcciones(self, token: str) -> List[str]:
+        """Términos de nombre a distancia de edición 1 (o 2 si es largo)"""
+        if not _admite_errata(token):
+            return []
+        maximo = 1 if len(token) <= 5 else 2
+        coincidencias: Dict[str, int] = {}
+        for trigrama in _trigramas(token):
+            for termino in self._trigramas.get(trigrama, ()):
+                coincidencias[termino] = coincidencias.get(termino, 0) + 1
+        # Solo se verifica la distancia de los candidatos con más trigramas en común
+        candidatos = heapq.nlargest(50, coincidencias.items(), key=lambda par: par[1])
+        distancias = []
+        for termino, _ in candidatos:
+            distancia = _distancia(token, termino, maximo)
+            if distancia <= maximo:
+                distancias.append((distancia, termino))
+        return [termino for _, termino in sorted(distancias)[:MAX_CORRECCIONES]]
+
+    def _grupo_nombre(self, token: str) -> List[Tuple[Set[int], float]]:
+        """Postings que casan con el token y su puntuación, de mayor a menor"""
+        terminos = []
+        if token in self._nombre:
+            terminos.append((token, FACTOR_EXACTO))
+        if len(token) >= LONGITUD_MINIMA_PREFIJO:
+            terminos.extend(
+                (termino, FACTOR_PREFIJO)
+                for termino in self._vocabulario.con_prefijo(token, MAX_EXPANSIONES_PREFIJO)
+            )
+        if not terminos:
+            terminos = [(termino, FACTOR_ERRATA) for termino in self._correcciones(token)]
+        total = len(self._internos)
+        grupo = [
+            (self._nombre[termino], factor * math.log(1 + total / len(self._nombre[termino])))
+            for termino, factor in terminos
+        ]
+        grupo.sort(key=lambda par: par[1], reverse=True)
+        return grupo
+
+    def _grupo_descripcion(self, token: str) -> List[array]:
+        terminos = [token] if token in self._id_termino else []
+        if len(token) >= LONGITUD_MINIMA_PREFIJO:
+            terminos.extend(self._vocabulario_descripcion.con_prefijo(token, MAX_EXPANSIONES_DESCRIPCION))
+        return [self._descripcion[self._id_termino[termino]] for termino in terminos]
+
+    def _por_sku(self, tokens: List[str], limite: int) -> Dict[int, float]:
+        compacto = "".join(tokens)
+        if len(compacto) < LONGITUD_MINIMA_SKU or not any(c.isdigit() for c in compacto):
+            return {}
+        resultado: Dict[int, float] = {}
+        for interno in self._sku.get(compacto, ()):
+            resultado[interno] = PUNTOS_SKU_EXACTO
+        for clave in self._vocabulario_sku.con_prefijo(compacto, limite):
+            for interno in self._sku[clave]:
+                resultado.setdefault(interno, PUNTOS_SKU_PREFIJO)
+            if len(resultado) >= limite:
+                break
+        return resultado
+
+    def _por_nombre(self, grupos: List[List[Tuple[Set[int], float]]], limite: int) -> Dict[int, float]:
+        if len(grupos) == 1:
+            # Un solo token: la puntuación es constante por término, basta
+            # con tomar documentos de los términos mejor puntuados
+            resultado: Dict[int, float] = {}
+            for postings, puntos in grupos[0]:
+                for interno in postings:
+                    if interno not in resultado:
+                        resultado[interno] = puntos
+                        if len(resultado) >= limite:
+                            return resultado
+            return resultado
+
+        # Varios tokens (AND): se parte del más selectivo y se interseca en C
+        grupos = sorted(grupos, key=lambda grupo: sum(len(postings) for postings, _ in grupo))
+        candidatos: Dict[int, float] = {}
+        for postings, puntos in grupos[0]:
+            for interno in postings:
+                if interno not in candidatos:
+                    candidatos[interno] = puntos
+        for grupo in grupos[1:]:
+            siguientes: Dict[int, float] = {}
+            for postings, puntos in grupo:
+                for interno in candidatos.keys() & postings:
+                    if interno not in siguientes:
+                        siguientes[interno] = candidatos[interno] + puntos
+            candidatos = siguientes
+            if not candidatos:
+                break
+        return candidatos
+
+    def _por_descripcion(
+        self,
+        grupos_nombre: List[List[Tuple[Set[int], float]]],
+        tokens: List[str],
+        excluidos: Dict[int, float]
+    ) -> Dict[int, float]:
+        """
+        Documentos donde cada token casa en el nombre o en la descripción.
+        Se examinan como mucho MAX_CANDIDATOS_DESCRIPCION documentos del
+        token más selectivo, así el coste queda acotado aunque sea muy común
+        """
+        grupos = []
+        for posicion, token in enumerate(tokens):
+            nombre = [postings for postings, _ in grupos_nombre[posicion]]
+            descripcion = self._grupo_descripcion(token)
+            if not nombre and not descripcion:
+                return {}
+            grupos.append((nombre, descripcion))
+        grupos.sort(key=lambda g: sum(len(p) for p in g[0]) + sum(len(d) for d in g[1]))
+
+        def casa(interno: int, grupo) -> bool:
+            nombre, descripcion = grupo
+            return any(interno in p for p in nombre) or any(_contiene(d, interno) for d in descripcion)
+
+        def candidatos(grupo) -> Iterator[int]:
+            for postings in grupo[0] + grupo[1]:
+                yield from postings
+
+        resultado: Dict[int, float] = {}
+        examinados = 0
+        for interno in candidatos(grupos[0]):
+            if interno in excluidos or interno in resultado:
+                continue
+            examinados += 1
+            if examinados > MAX_CANDIDATOS_DESCRIPCION:
+                break
+            if all(casa(interno, grupo) for grupo in grupos[1:]):
+                resultado[interno] = PUNTOS_DESCRIPCION
+        return resultado
+
+    def buscar(self, consulta: str, limite: int = 10, categoria: Optional[str] = None) -> List[Tuple[ObjectId, float]]:
+        """
+        Todos los tokens deben casar (AND), exactos o como prefijo porque en
+        caja se abrevian ("auricu inalam"); si un token no casa de ninguna de
+        las dos formas se buscan erratas
+        """
+        tokens = list(dict.fromkeys(tokenizar(consulta)))
+        tokens = [t for t in tokens if t not in PALABRAS_VACIAS] or tokens
+        if not tokens or limite <= 0:
+            return []
+
+        # Con filtro de categoría se piden más candidatos antes de filtrar
+        objetivo = limite if categoria is None else limite * 10
+        candidatos = self._por_sku(tokens, objetivo)
+        grupos = [self._grupo_nombre(token) for token in tokens]
+        if all(grupos) and len(candidatos) < objetivo:
+            for interno, puntos in self._por_nombre(grupos, objetivo).items():
+                candidatos.setdefault(interno, puntos)
+        if len(candidatos) < objetivo:
+            candidatos.update(self._por_descripcion(grupos, tokens, candidatos))
+
+        if categoria is not None:
+            candidatos = {i: p for i, p in candidatos.items() if self._categorias[i] == categoria}
+        mejores = heapq.nlargest(limite, candidatos.items(), key=lambda par: (par[1], -par[0]))
+        return [(self._externos[interno], round(puntuacion, 4)) for interno, puntuacion in mejores]
+
+    def informe(self) -> Dict[str, int]:
+        return {
+            "productos": len(self._internos),
+            "claves_sku": len(self._sku),
+            "terminos_nombre": len(self._nombre),
+            "terminos_descripcion": len(self._id_termino),
+            "postings_nombre": sum(len(p) for p in self._nombre.values()),
+            "postings_descripcion": sum(len(p) for p in self._descripcion if p is not None),
+        }
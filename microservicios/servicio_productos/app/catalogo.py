@@ -0,0 +1,281 @@
+"""
+Catálogo residente en memoria - PATRON PROXY
+Mantiene los productos activos ya serializados en JSON, indexados por _id
+y por categoría, y los refresca de forma incremental con una marca de agua
+sobre fecha_actualizacion
+"""
+
+import asyncio
+import gc
+import logging
+import sys
+import time
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING
+from comun.etag import VersionColeccion
+from comun.serializacion import AdaptadorRespuesta
+
+logger = logging.getLogger(__name__)
+
+class CatalogoResidente:
+    """
+    Instantánea del catálogo activo: JSON precalculado por producto y listas
+    ordenadas de _id (global y por categoría) para paginar por keyset.
+    Las lecturas de Mongo se hacen en un hilo; los cambios se aplican en el
+    event loop, así que las consultas nunca ven un estado a medias
+    """
+
+    def __init__(
+        self,
+        coleccion,
+        adaptador: AdaptadorRespuesta,
+        intervalo: float = 5.0,
+        margen: float = 2.0,
+        proyeccion: Optional[dict] = None,
+        versiones: Optional[VersionColeccion] = None
+    ):
+        self.coleccion = coleccion
+        self.adaptador = adaptador
+        self.intervalo = intervalo
+        # Solape de la marca de agua: absorbe desfases de reloj entre escritores
+        self.margen = timedelta(seconds=margen)
+        self.proyeccion = proyeccion
+        self.version = 0
+        # Versión global de la colección leída antes de la última carga o
+        # refresco: el contenido servido es al menos tan nuevo como ella
+        self.versiones = versiones
+        self.version_coleccion = 0
+        self._escrituras_locales = False
+        self.disponible = False
+        self._entradas: Dict[ObjectId, Tuple[bytes, str, int]] = {}
+        self._orden: List[ObjectId] = []
+        self._por_categoria: Dict[str, List[ObjectId]] = {}
+        self._marca_agua: Optional[datetime] = None
+        self._ultimo_refresco: Optional[datetime] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._suscriptores: List[Any] = []
+
+    def suscribir(self, suscriptor):
+        """
+        PATRON OBSERVER: el suscriptor recibe reiniciar(), indexar(documento)
+        y desindexar(producto_id) con cada cambio aplicado al catálogo, y
+        preparar() al terminar una carga completa
+        """
+        self._suscriptores.append(suscriptor)
+
+    # --- Consultas (event loop) ---
+
+    def obtener(self, producto_id: str) -> Optional[bytes]:
+        """JSON del producto o None si no está (inexistente, inactivo o aún no sincronizado)"""
+        if not ObjectId.is_valid(producto_id):
+            return None
+        entrada = self._entradas.get(ObjectId(producto_id))
+        return entrada[0] if entrada is not None else None
+    
+    def obtener_con_version(self, producto_id: str) -> Optional[Tuple[bytes, int]]:
+        """JSON y versión del documento, para la ETag sin tocar el JSON"""
+        if not ObjectId.is_valid(producto_id):
+            return None
+        entrada = self._entradas.get(ObjectId(producto_id))
+        return (entrada[0], entrada[2]) if entrada is not None else None
+
+    def _ids(self, categoria: Optional[str]) -> List[ObjectId]:
+        return self._orden if categoria is None else self._por_categoria.get(categoria, [])
+
+    def listar(
+        self,
+        categoria: Optional[str],
+        skip: int,
+        limit: int,
+        despues_de: Optional[ObjectId] = None
+    ) -> Tuple[bytes, Optional[ObjectId]]:
+        """Página como array JSON y el último _id si la página está completa"""
+        ids = self._ids(categoria)
+        inicio = (bisect_right(ids, despues_de) if despues_de is not None else 0) + skip
+        # Como en Mongo, limit=0 significa sin límite
+        pagina = ids[inicio:inicio + limit] if limit > 0 else ids[inicio:]
+        contenido = b"[" + b",".join(self._entradas[i][0] for i in pagina) + b"]"
+        ultimo = pagina[-1] if pagina and len(pagina) == limit else None
+        return contenido, ultimo
+
+    def contar(self, categoria: Optional[str] = None) -> int:
+        return len(self._ids(categoria))
+
+    # --- Mantenimiento ---
+
+    def _serializar(self, documento: dict) -> Optional[bytes]:
+        try:
+            return self.adaptador.serializar(documento)
+        except Exception as e:
+            logger.error("Producto %s no se pudo cargar en el catálogo: %s", documento.get("_id"), e)
+            return None
+
+    def _retirar(self, producto_id: ObjectId) -> bool:
+        entrada = self._entradas.pop(producto_id, None)
+        if entrada is None:
+            return False
+        for suscriptor in self._suscriptores:
+            suscriptor.desindexar(producto_id)
+        for ids in (self._orden, self._por_categoria.get(entrada[1], [])):
+            posicion = bisect_right(ids, producto_id) - 1
+            if posicion >= 0 and ids[posicion] == producto_id:
+                del ids[posicion]
+        return True
+
+    def aplicar(self, documento: dict) -> bool:
+        """Incorpora un documento (alta, cambio o baja); devuelve si cambió algo"""
+        producto_id = documento["_id"]
+        if not documento.get("activo", False):
+            return self._retirar(producto_id)
+        contenido = self._serializar(documento)
+        if contenido is None:
+            return self._retirar(producto_id)
+        actual = self._entradas.get(producto_id)
+        version = documento.get("version") or 0
+        if actual is not None and actual[0] == contenido:
+            if actual[2] != version:
+                # Escritura sin cambio visible: solo avanza la versión (ETag)
+                self._entradas[producto_id] = (contenido, actual[1], version)
+            return False
+        categoria = documento.get("categoria")
+        if actual is not None and actual[1] != categoria:
+            self._retirar(producto_id)
+            actual = None
+        self._entradas[producto_id] = (contenido, categoria, version)
+        if actual is None:
+            insort(self._orden, producto_id)
+            insort(self._por_categoria.setdefault(categoria, []), producto_id)
+        for suscriptor in self._suscriptores:
+            suscriptor.indexar(documento)
+        return True
+
+    def sincronizar(self, documento: dict):
+        """Alta o cambio inmediato de un producto escrito en este worker"""
+        if self.aplicar(documento):
+            self.version += 1
+            self._escrituras_locales = True
+
+    def retirar(self, producto_id: str):
+        """Baja inmediata de un producto eliminado en este worker"""
+        if ObjectId.is_valid(producto_id) and self._retirar(ObjectId(producto_id)):
+            self.version += 1
+            self._escrituras_locales = True
+    
+    def version_listado(self) -> Optional[int]:
+        """
+        Versión de colección que identifica los listados servidos, o None
+        mientras haya escrituras propias aún no cubiertas por un refresco
+        (el contenido ya no coincide con el de otros workers en esa versión)
+        """
+        if not self.disponible or self.versiones is None or self._escrituras_locales:
+            return None
+        return self.version_coleccion
+
+    def _leer(self, filtro: dict) -> List[dict]:
+        return list(self.coleccion.find(filtro, self.proyeccion).sort("_id", ASCENDING))
+
+    async def _leer_version(self) -> int:
+        # Se lee antes que los documentos: nunca se etiqueta contenido más viejo que la versión
+        if self.versiones is None:
+            return self.version_coleccion
+        return await asyncio.to_thread(self.versiones.actual)
+    
+    def _marca(self, documentos: List[dict]) -> Optional[datetime]:
+        fechas = [d["fecha_actualizacion"] for d in documentos if d.get("fecha_actualizacion")]
+        marca = max(fechas, default=self._marca_agua)
+        if self._marca_agua is not None and marca is not None:
+            marca = max(marca, self._marca_agua)
+        return marca
+
+    async def cargar(self):
+        """Carga completa del catálogo activo (fase de calentamiento)"""
+        inicio = time.perf_counter()
+        self._escrituras_locales = False
+        version_coleccion = await self._leer_version()
+        documentos = await asyncio.to_thread(self._leer, {"activo": True})
+        self._entradas, self._orden, self._por_categoria = {}, [], {}
+        self.version_coleccion = version_coleccion
+        for suscriptor in self._suscriptores:
+            suscriptor.reiniciar()
+        for documento in documentos:
+            self.aplicar(documento)
+        for suscriptor in self._suscriptores:
+            suscriptor.preparar()
+        # Los cientos de miles de objetos recién creados viven lo que el
+        # proceso: se sacan del recolector para que su primera pasada
+        # completa no caiga en mitad de una petición
+        gc.freeze()
+        # Sin productos aún no hay fechas: se parte de ahora
+        self._marca_agua = self._marca(documentos) or datetime.now()
+        self._ultimo_refresco = datetime.now()
+        self.version += 1
+        self.disponible = True
+        logger.info(
+            "Catálogo residente cargado: %s productos en %.1f ms",
+            len(self._entradas), (time.perf_counter() - inicio) * 1000
+        )
+
+    async def refrescar(self) -> int:
+        """Aplica los productos modificados desde la marca de agua; devuelve cuántos cambiaron"""
+        if not self.disponible:
+            await self.cargar()
+            return len(self._entradas)
+        filtro = {"fecha_actualizacion": {"$gte": self._marca_agua - self.margen}}
+        self._escrituras_locales = False
+        version_coleccion = await self._leer_version()
+        documentos = await asyncio.to_thread(self._leer, filtro)
+        cambios = sum(1 for documento in documentos if self.aplicar(documento))
+        self.version_coleccion = version_coleccion
+        self._marca_agua = self._marca(documentos)
+        self._ultimo_refresco = datetime.now()
+        if cambios:
+            self.version += 1
+        return cambios
+
+    async def _bucle(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.refrescar()
+            except Exception as e:
+                logger.error("Error refrescando el catálogo residente: %s", e)
+
+    async def iniciar(self):
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
+
+    # --- Informe ---
+
+    def memoria_bytes(self) -> int:
+        """Tamaño aproximado de las estructuras residentes"""
+        total = sys.getsizeof(self._entradas) + sys.getsizeof(self._orden)
+        total += sum(sys.getsizeof(ids) for ids in self._por_categoria.values())
+        for producto_id, (contenido, _, _) in self._entradas.items():
+            # Clave ObjectId (objeto + sus 12 bytes), tupla y JSON; la categoría es compartida
+            total += sys.getsizeof(producto_id) + sys.getsizeof(producto_id.binary)
+            total += sys.getsizeof((contenido, None, 0)) + sys.getsizeof(contenido)
+        return total
+
+    def informe(self) -> Dict[str, Any]:
+        productos = len(self._entradas)
+        memoria = self.memoria_bytes()
+        return {
+            "disponible": self.disponible,
+            "version": self.version,
+            "version_coleccion": self.version_coleccion,
+            "productos": productos,
+            "categorias": {categoria: len(ids) for categoria, ids in self._por_categoria.items()},
+            "memoria_bytes": memoria,
+            "memoria_mb_por_100k": round(memoria / productos * 100_000 / 1_048_576, 2) if productos else None,
+            "marca_agua": self._marca_agua.isoformat() if self._marca_agua else None,
+            "ultimo_refresco": self._ultimo_refresco.isoformat() if self._ultimo_refresco else None,
+            "intervalo_segundos": self.intervalo,
+        }
@@ -2,17 +2,38 @@
 Servicio de Productos - PATRON MVC + GOF
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
-from pymongo import MongoClient
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, status
 from bson import ObjectId
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 import logging
+from pydantic import ValidationError
+from pymongo.errors import DuplicateKeyError
 from configuracion import configuration
-from modelos import Producto, ProductoCrear, ProductoActualizar
+from comun.admin import con_worker, ruta_admin
+from comun.arranque import CalentadorArranque
+from comun.cache import CacheLRU
+from comun.campos import SeleccionCampos, seleccion_campos
+from comun.etag import VersionColeccion, coincide, condicion_if_match, etag_coleccion, etag_documento, no_modificado
+from comun.exportacion import respuesta_exportacion, validar_formato
+from comun.facetas import RecalculadorFacetas
+from comun.lotes import error_validacion, leer_filas, resumen_lote
+from comun.mongo import obtener_cliente, precalentar_pool, proyeccion_modelo
+from comun.paginacion import codificar_cursor, decodificar_cursor, id_de_cursor
+from comun.perfilador import registrar_perfilador
+from comun.registro import configurar_logging, registrar_metricas_logging
+from comun.serializacion import AdaptadorRespuesta, respuesta_json
+from comun.sondas import ProbadorSalud, registrar_sondas, verificacion_mongo
+from modelos import (
+    CambiosProductos, CategoriaProducto, FacetasCatalogo, Producto, ProductoCaja, ProductoCrear, ProductoActualizar,
+    ReprecioCrear, TipoCambioPrecio, TrabajoReprecio
+)
 from repositorio import ProductoRepository
+from catalogo import CatalogoResidente
+from busqueda import IndiceBusqueda, tokenizar
+from reprecio import EjecutorReprecios, ReprecioRepository
 
-logging.basicConfig(level=logging.INFO)
+configurar_logging("productos")
 logger = logging.getLogger(__name__)
 
 # PATRON MVC - Controller principal
@@ -21,32 +42,87 @@ app = FastAPI(
     description="Microservicio para gestión de catálogo de productos",
     version="1.0.0"
 )
+registrar_metricas_logging(app)
+registrar_perfilador(app)
+
+# PATRON ADAPTER: Serializadores precompilados para las respuestas
+adaptador_producto = AdaptadorRespuesta(Producto)
+adaptador_lista_productos = AdaptadorRespuesta(List[Producto])
+adaptador_caja = AdaptadorRespuesta(ProductoCaja)
+adaptador_textos = AdaptadorRespuesta(List[str])
+adaptador_cambios = AdaptadorRespuesta(CambiosProductos)
+adaptador_facetas = AdaptadorRespuesta(FacetasCatalogo)
+adaptador_reprecio = AdaptadorRespuesta(TrabajoReprecio)
+adaptador_lista_reprecios = AdaptadorRespuesta(List[TrabajoReprecio])
 
 # PATRON DEPENDENCY INJECTION
 def get_database():
-    """PATRON FACTORY METHOD: Crea conexión a MongoDB"""
-    try:
-        client = MongoClient(configuration.MONGODB_URL)
-        database = client[configuration.BASE_DATOS]
-        collection = database[configuration.COLECCION_PRODUCTOS]
-        client.admin.command('ping')
-        logger.info("Conexión a MongoDB establecida correctamente")
-        return collection
-    except Exception as e:
-        logger.error(f"Error conectando a MongoDB: {e}")
-        raise
+    """PATRON FACTORY METHOD: Obtiene la base de datos desde el cliente compartido"""
+    client = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
+    return client[configuration.BASE_DATOS]
+
+# Proyección de lectura: solo se decodifican los campos del modelo Producto
+# (y la versión, de la que sale la ETag)
+PROYECCION_PRODUCTO = (
+    {**proyeccion_modelo(Producto), "version": 1} if configuration.MONGODB_LECTURA_PROYECTADA else None
+)
+# Campos que la lógica de negocio necesita aunque no se pidan con fields=
+CAMPOS_OBLIGATORIOS = ("activo", "version")
+LIMITE_BUSQUEDA_MAX = 50
+# Escaneo en caja: solo los campos de ProductoCaja y activo para descartar bajas
+PROYECCION_CAJA = {**proyeccion_modelo(ProductoCaja), "activo": 1}
+LIMITE_SKUS_LOTE = 200
+LIMITE_CAMBIOS_MAX = 1000
+cache_sku = CacheLRU(configuration.SKU_CACHE_CAPACIDAD, configuration.SKU_CACHE_TTL)
+
+# Sondas de salud: verificación en segundo plano sobre el cliente compartido
+cliente_mongo = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
+probador_salud = ProbadorSalud("Productos", configuration.SONDA_INTERVALO)
+probador_salud.agregar_verificacion("mongodb", verificacion_mongo(cliente_mongo))
+
+# Calentamiento de arranque: la readiness no pasa a listo hasta completarlo
+calentador = CalentadorArranque("Productos")
+calentador.agregar_fase(
+    "mongodb_pool",
+    lambda: precalentar_pool(cliente_mongo, configuration.MONGODB_CONEXIONES_INICIALES)
+)
+calentador.agregar_fase("openapi", app.openapi)
+registrar_sondas(app, probador_salud, calentador)
 
 def get_producto_repository():
     """PATRON FACTORY: Crea instancia del repositorio"""
     database = get_database()
-    return ProductoRepository(database)
+    return ProductoRepository(database, PROYECCION_PRODUCTO)
 
 # PATTERN SERVICE LAYER
 class ProductoService:
     """Service Layer: Contiene la lógica de negocio de productos"""
     
-    def __init__(self, repository: ProductoRepository):
+    def __init__(
+        self,
+        repository: ProductoRepository,
+        catalogo: Optional[CatalogoResidente] = None,
+        indice: Optional[IndiceBusqueda] = None,
+        cache: Optional[CacheLRU] = None
+    ):
         self.repository = repository
+        self.catalogo = catalogo
+        self.indice = indice
+        self.cache = cache
+    
+    @property
+    def _catalogo_disponible(self) -> bool:
+        return self.catalogo is not None and self.catalogo.disponible
+    
+    def _sincronizar_catalogo(self, producto: Optional[dict]):
+        """Escritura en este worker: el catálogo se actualiza sin esperar al refresco"""
+        if producto is not None and self._catalogo_disponible:
+            self.catalogo.sincronizar(producto)
+    
+    def _invalidar_skus(self, *skus: str):
+        """Libera las entradas en este worker; la versión de la colección ya las descarta en todos"""
+        if self.cache is not None:
+            self.cache.invalidar(*skus)
     
     async def crear_producto(self, producto: ProductoCrear) -> dict:
         """PATRON FACTORY: Crea nuevo producto con validaciones"""
@@ -64,14 +140,22 @@ class ProductoService:
         producto_data["fecha_actualizacion"] = datetime.now()
         producto_data["activo"] = True
         
-        producto_id = await self.repository.crear(producto_data)
+        try:
+            producto_id = await self.repository.crear(producto_data)
+        except DuplicateKeyError:
+            # Otra petición creó el mismo SKU entre la comprobación y la inserción
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ya existe un producto con este SKU"
+            )
         producto_creado = await self.repository.obtener_por_id(producto_id)
+        self._sincronizar_catalogo(producto_creado)
         
-        return self._adaptar_producto(producto_creado)
+        return producto_creado
     
-    async def obtener_producto(self, producto_id: str) -> dict:
+    async def obtener_producto(self, producto_id: str, proyeccion: Optional[dict] = None) -> dict:
         """Obtiene producto por ID"""
-        producto = await self.repository.obtener_por_id(producto_id)
+        producto = await self.repository.obtener_por_id(producto_id, proyeccion)
         if not producto:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -82,19 +166,302 @@ class ProductoService:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Producto no disponible"
             )
-        return self._adaptar_producto(producto)
+        return producto
+    
+    async def obtener_producto_json(
+        self,
+        producto_id: str,
+        if_none_match: Optional[str] = None
+    ) -> Tuple[Optional[bytes], str]:
+        """
+        Producto ya serializado y su ETag: del catálogo residente o, si no
+        está, de Mongo. Sin contenido (304) si el cliente ya tiene esa versión
+        """
+        if self._catalogo_disponible:
+            entrada = self.catalogo.obtener_con_version(producto_id)
+            if entrada is not None:
+                contenido, version = entrada
+                etag = etag_documento(version)
+                return (None if coincide(if_none_match, etag) else contenido), etag
+        producto = await self.obtener_producto(producto_id)
+        etag = etag_documento(producto.get("version"))
+        if coincide(if_none_match, etag):
+            return None, etag
+        return adaptador_producto.serializar(producto), etag
+    
+    async def etag_listado(self, seleccion: Optional[SeleccionCampos] = None) -> Optional[str]:
+        """
+        ETag de los listados a partir de la versión de la colección: la del
+        catálogo residente si sirve él la página, si no la leída de Mongo
+        antes de la consulta. None si no se puede garantizar
+        """
+        if seleccion is None and self._catalogo_disponible:
+            version = self.catalogo.version_listado()
+        else:
+            version = await self.repository.version_coleccion()
+        if version is None:
+            return None
+        return etag_coleccion(version, seleccion.campos if seleccion else None)
+    
+    async def facetas(self) -> dict:
+        """Conteos y precios por categoría desde los contadores: no depende del tamaño del catálogo"""
+        facetas = {faceta["_id"]: faceta for faceta in self.repository.facetas.listar()}
+        categorias = []
+        for categoria in CategoriaProducto:
+            faceta = facetas.get(categoria.value, {})
+            total = max(faceta.get("total", 0), 0)
+            categorias.append({
+                "categoria": categoria,
+                "total": total,
+                "precio_min": faceta.get("precio_min") if total else None,
+                "precio_max": faceta.get("precio_max") if total else None,
+                "precio_medio": round(faceta["suma_precio"] / total, 2) if total else None,
+            })
+        recalculos = [faceta["fecha_recalculo"] for faceta in facetas.values() if faceta.get("fecha_recalculo")]
+        return {
+            "total": sum(categoria["total"] for categoria in categorias),
+            "categorias": categorias,
+            "fecha_recalculo": max(recalculos) if recalculos else None,
+        }
+    
+    def _despues_de(self, cursor: Optional[str]) -> Optional[ObjectId]:
+        if not cursor:
+            return None
+        try:
+            return id_de_cursor(decodificar_cursor(cursor))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor inválido"
+            )
     
-    async def listar_productos(self, categoria: Optional[str] = None, skip: int = 0, limit: int = 10) -> List[dict]:
-        """Lista productos con filtros opcionales"""
+    def _filtro_listado(self, categoria: Optional[str]) -> dict:
         filtro = {"activo": True}
         if categoria:
             filtro["categoria"] = categoria
+        return filtro
+    
+    async def listar_productos(
+        self,
+        categoria: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        proyeccion: Optional[dict] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Lista productos con filtros opcionales
+        PATRON ITERATOR: devuelve además el cursor de la página siguiente
+        """
+        productos = await self.repository.listar_todos(
+            self._filtro_listado(categoria), skip, limit, self._despues_de(cursor), proyeccion
+        )
+        siguiente_cursor = None
+        if productos and len(productos) == limit:
+            siguiente_cursor = codificar_cursor({"id": productos[-1]["_id"]})
+        return productos, siguiente_cursor
+    
+    def cursor_exportacion(
+        self,
+        categoria: Optional[str] = None,
+        actualizado_desde: Optional[datetime] = None,
+        proyeccion: Optional[dict] = None
+    ):
+        """PATRON ITERATOR: Cursor con todos los productos activos que cumplen el filtro"""
+        filtro = self._filtro_listado(categoria)
+        if actualizado_desde is not None:
+            filtro["fecha_actualizacion"] = {"$gte": actualizado_desde}
+        return self.repository.cursor_exportacion(filtro, proyeccion)
+    
+    async def listar_productos_json(
+        self,
+        categoria: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        """Página ya serializada: del catálogo residente si está cargado, si no de Mongo"""
+        if self._catalogo_disponible:
+            contenido, ultimo = self.catalogo.listar(categoria, skip, limit, self._despues_de(cursor))
+            return contenido, codificar_cursor({"id": ultimo}) if ultimo is not None else None
+        productos, siguiente_cursor = await self.listar_productos(categoria, skip, limit, cursor)
+        return adaptador_lista_productos.serializar(productos), siguiente_cursor
+    
+    def _marca_agua(self, desde: Optional[str]) -> Tuple[Optional[datetime], Optional[ObjectId]]:
+        """Fecha y último _id de una marca de agua devuelta por /cambios"""
+        if not desde:
+            return None, None
+        try:
+            valores = decodificar_cursor(desde)
+            fecha = datetime.fromisoformat(valores["fecha"])
+            ultimo_id = id_de_cursor(valores) if valores.get("id") is not None else None
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Marca de agua inválida"
+            )
+        return fecha, ultimo_id
+    
+    async def cambios_json(self, desde: Optional[str] = None, limit: int = 500) -> bytes:
+        """
+        PATRON ITERATOR: Altas, cambios y bajas lógicas desde la marca de agua
+        en orden (fecha_actualizacion, _id). Solo se sirve lo escrito hace más
+        de CAMBIOS_MARGEN segundos: una escritura en curso o el reloj de otro
+        worker algo atrasado no pueden quedar por detrás de la marca devuelta
+        """
+        limit = max(1, min(limit, LIMITE_CAMBIOS_MAX))
+        fecha, ultimo_id = self._marca_agua(desde)
+        hasta = datetime.now() - timedelta(seconds=configuration.CAMBIOS_MARGEN)
+        rango: Dict[str, Any] = {"$lt": hasta}
+        filtro: Dict[str, Any] = {"fecha_actualizacion": rango}
+        if fecha is not None:
+            rango["$gte"] = fecha
+            if ultimo_id is not None:
+                # Empates de fecha: se sigue por _id dentro del mismo instante
+                filtro["$or"] = [{"fecha_actualizacion": {"$gt": fecha}}, {"_id": {"$gt": ultimo_id}}]
+        
+        documentos = await self.repository.listar_cambios(filtro, limit + 1)
+        hay_mas = len(documentos) > limit
+        documentos = documentos[:limit]
+        if hay_mas:
+            marca = codificar_cursor({"fecha": documentos[-1]["fecha_actualizacion"], "id": documentos[-1]["_id"]})
+        else:
+            # Todo lo anterior a `hasta` ya se entregó: la marca avanza hasta ahí
+            marca = codificar_cursor({"fecha": hasta, "id": None})
+        return adaptador_cambios.serializar({
+            "productos": [d for d in documentos if d.get("activo", False)],
+            "eliminados": [str(d["_id"]) for d in documentos if not d.get("activo", False)],
+            "marca_agua": marca,
+            "hay_mas": hay_mas,
+        })
+    
+    def _de_cache(self, sku: str, version: int) -> Optional[bytes]:
+        """
+        Entrada de la caché escrita con la versión actual de la colección;
+        cualquier escritura de productos (de este worker, de otro o de
+        inventario) sube la versión y deja las anteriores como fallo
+        """
+        entrada = self.cache.obtener(sku) if self.cache is not None else None
+        if entrada is None or entrada[0] != version:
+            return None
+        return entrada[1]
+    
+    def _a_cache(self, sku: str, version: int, contenido: bytes):
+        if self.cache is not None:
+            self.cache.guardar(sku, (version, contenido))
+    
+    async def _leer_caja(self, sku: str) -> Optional[bytes]:
+        """PATRON PROXY: lectura a través de la caché LRU por SKU"""
+        # La versión se lee antes que el producto: una escritura entre ambas
+        # lecturas deja la entrada con una versión vieja, nunca al revés
+        version = await self.repository.version_coleccion()
+        contenido = self._de_cache(sku, version)
+        if contenido is None:
+            producto = await self.repository.obtener_por_sku(sku, PROYECCION_CAJA)
+            if not producto or not producto.get("activo", True):
+                return None
+            contenido = adaptador_caja.serializar(producto)
+            self._a_cache(sku, version, contenido)
+        return contenido
+    
+    async def obtener_por_sku_json(self, sku: str) -> bytes:
+        """Producto escaneado en caja, solo con los campos de ProductoCaja"""
+        contenido = await self._leer_caja(sku)
+        if contenido is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Producto no encontrado"
+            )
+        return contenido
+    
+    async def obtener_por_skus_json(self, skus: List[str]) -> bytes:
+        """
+        Varios SKUs en una sola consulta $in para los que no están en caché
+        Devuelve {"productos": [...], "no_encontrados": [...]} en el orden pedido
+        """
+        skus = list(dict.fromkeys(skus))
+        if len(skus) > LIMITE_SKUS_LOTE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Máximo {LIMITE_SKUS_LOTE} SKUs por consulta"
+            )
+        encontrados: Dict[str, bytes] = {}
+        version = await self.repository.version_coleccion()
+        for sku in skus:
+            contenido = self._de_cache(sku, version)
+            if contenido is not None:
+                encontrados[sku] = contenido
+        pendientes = [sku for sku in skus if sku not in encontrados]
+        if pendientes:
+            for producto in await self.repository.obtener_por_skus(pendientes, PROYECCION_CAJA):
+                if not producto.get("activo", True):
+                    continue
+                contenido = adaptador_caja.serializar(producto)
+                encontrados[producto["sku"]] = contenido
+                self._a_cache(producto["sku"], version, contenido)
+        productos = b",".join(encontrados[sku] for sku in skus if sku in encontrados)
+        no_encontrados = adaptador_textos.serializar([sku for sku in skus if sku not in encontrados])
+        return b'{"productos":[' + productos + b'],"no_encontrados":' + no_encontrados + b"}"
+    
+    async def buscar_productos_json(self, consulta: str, limit: int = 10, categoria: Optional[str] = None) -> bytes:
+        """
+        Búsqueda para caja: índice en memoria si el catálogo residente está
+        cargado; si no, subcadena en Mongo (sin plegar acentos ni erratas)
+        """
+        limit = max(0, min(limit, LIMITE_BUSQUEDA_MAX))
+        if self._catalogo_disponible and self.indice is not None:
+            resultados = self.indice.buscar(consulta, limit, categoria)
+            encontrados = (self.catalogo.obtener(str(producto_id)) for producto_id, _ in resultados)
+            return b"[" + b",".join(c for c in encontrados if c is not None) + b"]"
+        tokens = tokenizar(consulta)
+        if not tokens or limit == 0:
+            return b"[]"
+        return adaptador_lista_productos.serializar(await self.repository.buscar_texto(tokens, categoria, limit))
+    
+    async def contar_productos(self, categoria: Optional[str] = None) -> Optional[int]:
+        """Total estimado de productos del listado (exacto con el catálogo residente)"""
+        if self._catalogo_disponible:
+            return self.catalogo.contar(categoria)
+        return await self.repository.contar_estimado(self._filtro_listado(categoria))
+    
+    async def carga_masiva(self, filas: List[Any], ordenado: bool = False) -> Dict[str, Any]:
+        """
+        PATRON COMMAND: Crea o actualiza productos por SKU en lote
+        Las filas inválidas se informan sin enviarse a la base de datos
+        """
+        resultados: Dict[int, Dict[str, Any]] = {}
+        claves: Dict[int, Any] = {}
+        validos = []
+        for fila, datos in enumerate(filas):
+            if isinstance(datos, dict):
+                claves[fila] = datos.get("sku")
+            try:
+                producto = ProductoCrear.model_validate(datos)
+            except ValidationError as e:
+                resultados[fila] = {"estado": "error", "error": error_validacion(e)}
+                continue
+            producto_data = producto.dict()
+            stock_inicial = producto_data.pop("stock_inicial")
+            # Sin stock_inicial en la fila, un SKU existente conserva su stock
+            if "stock_inicial" in producto.model_fields_set:
+                producto_data["stock"] = stock_inicial
+            validos.append((fila, producto_data))
         
-        productos = await self.repository.listar_todos(filtro, skip, limit)
-        return [self._adaptar_producto(prod) for prod in productos]
+        if validos:
+            resultados.update(await self.repository.upsert_por_sku(validos, ordenado))
+            self._invalidar_skus(*(producto_data["sku"] for _, producto_data in validos))
+        return resumen_lote(resultados, claves)
     
-    async def actualizar_producto(self, producto_id: str, producto_actualizar: ProductoActualizar) -> dict:
-        """Actualiza producto existente"""
+    async def actualizar_producto(
+        self,
+        producto_id: str,
+        producto_actualizar: ProductoActualizar,
+        if_match: Optional[str] = None
+    ) -> dict:
+        """Actualiza producto existente; con If-Match solo si no cambió desde que se leyó"""
+        condicion = condicion_if_match(if_match)
+        if condicion is not None:
+            return await self._actualizar_condicional(producto_id, producto_actualizar, condicion)
         producto = await self.repository.obtener_por_id(producto_id)
         if not producto:
             raise HTTPException(
@@ -112,7 +479,37 @@ class ProductoService:
             )
         
         producto_actualizado = await self.repository.obtener_por_id(producto_id)
-        return self._adaptar_producto(producto_actualizado)
+        self._sincronizar_catalogo(producto_actualizado)
+        self._invalidar_skus(producto["sku"])
+        return producto_actualizado
+    
+    async def _actualizar_condicional(
+        self,
+        producto_id: str,
+        producto_actualizar: ProductoActualizar,
+        condicion: dict
+    ) -> dict:
+        """
+        PATRON OPTIMISTIC LOCK: la versión esperada va en el filtro de la
+        escritura; solo si no casa se lee el documento para distinguir 404 de 412
+        """
+        datos_actualizacion = {k: v for k, v in producto_actualizar.dict().items() if v is not None}
+        producto_actualizado = await self.repository.actualizar_condicional(producto_id, datos_actualizacion, condicion)
+        if producto_actualizado is None:
+            actual = await self.repository.obtener_por_id(producto_id)
+            if not actual or not actual.get("activo", True):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Producto no encontrado"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="El producto cambió desde que se leyó",
+                headers={"ETag": etag_documento(actual.get("version"))}
+            )
+        self._sincronizar_catalogo(producto_actualizado)
+        self._invalidar_skus(producto_actualizado["sku"])
+        return producto_actualizado
     
     async def eliminar_producto(self, producto_id: str):
         """Elimina producto (borrado lógico)"""
@@ -128,20 +525,107 @@ class ProductoService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No se pudo eliminar el producto"
             )
+        if self._catalogo_disponible:
+            self.catalogo.retirar(producto_id)
+        self._invalidar_skus(producto["sku"])
+
+class ReprecioService:
+    """Service Layer: Trabajos de reprecio masivo en segundo plano"""
     
-    def _adaptar_producto(self, producto_db: dict) -> dict:
-        """PATRON ADAPTER: Convierte producto de BD a formato API"""
-        if not producto_db:
-            return None
-        producto_adaptado = producto_db.copy()
-        producto_adaptado["id"] = str(producto_adaptado["_id"])
-        del producto_adaptado["_id"]
-        return producto_adaptado
+    def __init__(self, repository: ReprecioRepository, ejecutor: EjecutorReprecios):
+        self.repository = repository
+        self.ejecutor = ejecutor
+    
+    async def crear_reprecio(self, reprecio: ReprecioCrear) -> dict:
+        """PATRON COMMAND: Registra el trabajo y lo lanza; el progreso se consulta aparte"""
+        if reprecio.tipo == TipoCambioPrecio.PORCENTAJE and reprecio.valor <= -100:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Un porcentaje de -100 o menos deja los precios a cero"
+            )
+        regla = reprecio.model_dump(mode="json", exclude={"simulacion"})
+        trabajo = await self.repository.crear(regla, reprecio.simulacion)
+        return await self.ejecutor.lanzar(trabajo["_id"]) or trabajo
+    
+    async def obtener_reprecio(self, trabajo_id: str) -> dict:
+        trabajo = await self.repository.obtener(trabajo_id)
+        if not trabajo:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Trabajo de reprecio no encontrado"
+            )
+        return trabajo
+    
+    async def listar_reprecios(self, limit: int = 20) -> List[dict]:
+        return await self.repository.listar(max(1, min(limit, 100)))
+    
+    async def reanudar_reprecio(self, trabajo_id: str) -> dict:
+        """Retoma desde el punto de control un trabajo fallido o abandonado"""
+        trabajo = await self.obtener_reprecio(trabajo_id)
+        reanudado = await self.ejecutor.lanzar(trabajo["_id"], fallidos=True)
+        if reanudado is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"El trabajo no se puede reanudar en estado {trabajo['estado']}"
+            )
+        return reanudado
 
 def get_producto_service() -> ProductoService:
     """PATRON DEPENDENCY INJECTION: Proporciona instancia del servicio"""
     repository = get_producto_repository()
-    return ProductoService(repository)
+    return ProductoService(repository, catalogo, indice_busqueda, cache_sku)
+
+calentador.agregar_fase("indices", get_producto_repository().crear_indices)
+
+# Recálculo periódico de las facetas: corrige la deriva de los contadores incrementales
+recalculador_facetas = RecalculadorFacetas(
+    get_producto_repository().facetas, configuration.FACETAS_INTERVALO_RECALCULO
+)
+app.add_event_handler("startup", recalculador_facetas.iniciar)
+app.add_event_handler("shutdown", recalculador_facetas.detener)
+
+def get_reprecio_repository() -> ReprecioRepository:
+    """PATRON FACTORY: Trabajos de reprecio sobre la misma base de datos"""
+    database = get_database()
+    return ReprecioRepository(
+        database[configuration.COLECCION_REPRECIOS],
+        database[configuration.COLECCION_PRODUCTOS],
+        configuration.REPRECIO_MUESTRA
+    )
+
+# Reprecios en segundo plano: cada worker retoma al arrancar los que quedaron a medias
+ejecutor_reprecios = EjecutorReprecios(
+    get_reprecio_repository(),
+    configuration.REPRECIO_TAMANO_LOTE,
+    configuration.REPRECIO_PAUSA,
+    configuration.REPRECIO_ABANDONO,
+    lambda skus: cache_sku.invalidar(*skus)
+)
+calentador.agregar_fase("indices_reprecios", get_reprecio_repository().crear_indices)
+app.add_event_handler("startup", ejecutor_reprecios.iniciar)
+app.add_event_handler("shutdown", ejecutor_reprecios.detener)
+
+def get_reprecio_service() -> ReprecioService:
+    return ReprecioService(get_reprecio_repository(), ejecutor_reprecios)
+
+# Catálogo residente opcional: lecturas calientes servidas desde memoria
+catalogo: Optional[CatalogoResidente] = None
+indice_busqueda: Optional[IndiceBusqueda] = None
+if configuration.CATALOGO_RESIDENTE:
+    catalogo = CatalogoResidente(
+        get_database()[configuration.COLECCION_PRODUCTOS],
+        adaptador_producto,
+        configuration.CATALOGO_INTERVALO_REFRESCO,
+        configuration.CATALOGO_MARGEN_REFRESCO,
+        PROYECCION_PRODUCTO,
+        VersionColeccion(get_database()[configuration.COLECCION_PRODUCTOS])
+    )
+    # El índice de búsqueda se mantiene con los mismos cambios que el catálogo
+    indice_busqueda = IndiceBusqueda()
+    catalogo.suscribir(indice_busqueda)
+    calentador.agregar_fase("catalogo", catalogo.cargar)
+    app.add_event_handler("startup", catalogo.iniciar)
+    app.add_event_handler("shutdown", catalogo.detener)
 
 # PATRON MVC - Endpoints Controller
 @app.get("/")
@@ -154,13 +638,13 @@ async def raiz():
 
 @app.get("/health")
 async def salud():
-    try:
-        client = MongoClient(configuration.MONGODB_URL)
-        client.admin.command('ping')
+    mongodb = probador_salud.resultado("mongodb")
+    if mongodb is None:
+        base_datos_status = "Sin verificar"
+    elif mongodb["estado"] == "ok":
         base_datos_status = "Conectado"
-    except Exception as e:
-        base_datos_status = f"Error: {str(e)}"
-        logger.error(f"Health check falló: {e}")
+    else:
+        base_datos_status = f"Error: {mongodb['detalle']}"
 
     return {
         "estado": "Saludable",
@@ -177,7 +661,9 @@ async def crear_producto(
     """PATRON MVC - Controller: Endpoint para crear producto"""
     try:
         producto_creado = await producto_service.crear_producto(producto)
-        return Producto(**producto_creado)
+        return adaptador_producto.respuesta(
+            producto_creado, status.HTTP_201_CREATED, {"ETag": etag_documento(producto_creado.get("version"))}
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -187,17 +673,69 @@ async def crear_producto(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
+@app.post("/api/v1/productos/bulk")
+async def carga_masiva_productos(
+    request: Request,
+    ordenado: bool = False,
+    producto_service: ProductoService = Depends(get_producto_service)
+):
+    """
+    PATRON MVC - Controller: Carga masiva de productos (upsert por SKU)
+    Acepta un array JSON o NDJSON (Content-Type: application/x-ndjson);
+    con ordenado=true la escritura se detiene en el primer error
+    """
+    filas = await leer_filas(request)
+    try:
+        return await producto_service.carga_masiva(filas, ordenado)
+    except Exception as e:
+        logger.error("Error en carga masiva de productos: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
 @app.get("/api/v1/productos", response_model=List[Producto])
 async def listar_productos(
     categoria: Optional[str] = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    incluir_total: bool = False,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     producto_service: ProductoService = Depends(get_producto_service)
 ):
-    """PATRON MVC - Controller: Endpoint para listar productos"""
+    """
+    PATRON MVC - Controller: Endpoint para listar productos
+    Paginación por cursor: la cabecera X-Siguiente-Cursor trae el valor de
+    `cursor` para la página siguiente; `skip` se mantiene por compatibilidad
+    fields=id,nombre,precio limita los campos leídos de Mongo y devueltos
+    La ETag es la versión de la colección: If-None-Match responde 304 sin consultar
+    """
     try:
-        productos = await producto_service.listar_productos(categoria, skip, limit)
-        return [Producto(**prod) for prod in productos]
+        seleccion = seleccion_campos(Producto, fields, CAMPOS_OBLIGATORIOS)
+        etag = await producto_service.etag_listado(seleccion)
+        if etag is not None and coincide(if_none_match, etag):
+            return no_modificado(etag)
+        if seleccion:
+            productos, siguiente_cursor = await producto_service.listar_productos(
+                categoria, skip, limit, cursor, seleccion.proyeccion
+            )
+            contenido = seleccion.adaptador_lista.serializar(productos)
+        else:
+            contenido, siguiente_cursor = await producto_service.listar_productos_json(
+                categoria, skip, limit, cursor
+            )
+        headers = {"ETag": etag} if etag is not None else {}
+        if siguiente_cursor:
+            headers["X-Siguiente-Cursor"] = siguiente_cursor
+        if incluir_total:
+            total = await producto_service.contar_productos(categoria)
+            if total is not None:
+                headers["X-Total-Estimado"] = str(total)
+        return respuesta_json(contenido, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listando productos: {e}")
         raise HTTPException(
@@ -205,15 +743,221 @@ async def listar_productos(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
+@app.get("/api/v1/productos/export")
+async def exportar_productos(
+    formato: str = "ndjson",
+    categoria: Optional[str] = None,
+    actualizado_desde: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    producto_service: ProductoService = Depends(get_producto_service)
+):
+    """
+    PATRON MVC - Controller: Exporta el catálogo activo completo en streaming
+    formato=ndjson|csv; actualizado_desde filtra por fecha_actualizacion
+    """
+    validar_formato(formato)
+    seleccion = seleccion_campos(Producto, fields)
+    cursor = producto_service.cursor_exportacion(
+        categoria, actualizado_desde, seleccion.proyeccion if seleccion else None
+    )
+    return respuesta_exportacion(
+        cursor,
+        seleccion.adaptador if seleccion else adaptador_producto,
+        seleccion.campos if seleccion else tuple(Producto.model_fields),
+        formato,
+        configuration.EXPORT_TAMANO_LOTE,
+        "productos"
+    )
+
+@app.get("/api/v1/productos/facetas", response_model=FacetasCatalogo)
+async def facetas_productos(
+    producto_service: ProductoService = Depends(get_producto_service)
+):
+    """
+    PATRON MVC - Controller: Productos activos por categoría con su rango y
+    precio medio, leídos de contadores que se mantienen con cada escritura
+    """
+    try:
+        return adaptador_facetas.respuesta(await producto_service.facetas())
+    except Exception as e:
+        logger.error(f"Error obteniendo facetas de productos: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.get("/api/v1/productos/cambios", response_model=CambiosProductos)
+async def cambios_productos(
+    desde: Optional[str] = None,
+    limit: int = 500,
+    producto_service: ProductoService = Depends(get_producto_service)
+):
+    """
+    PATRON MVC - Controller: Sincronización incremental para terminales
+    Devuelve los productos escritos desde la marca de agua `desde` (sin ella,
+    todo el catálogo) y los ids dados de baja. Se repite con la `marca_agua`
+    recibida mientras `hay_mas` sea true; después, en cada refresco
+    """
+    try:
+        return respuesta_json(await producto_service.cambios_json(desde, limit))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error obteniendo cambios de productos: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.get("/api/v1/productos/sku", response_model=Dict[str, Any])
+async def obtener_productos_por_skus(
+    skus: str,
+    producto_service: ProductoService = Depends(get_producto_service)
+):
+    """
+    PATRON MVC - Controller: Varios productos por SKU (skus=A,B,C)
+    Respuesta {"productos": [...], "no_encontrados": [...]} en el orden pedido
+    """
+    try:
+        lista = [sku.strip() for sku in skus.split(",") if sku.strip()]
+        return respuesta_json(await producto_service.obtener_por_skus_json(lista))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error obteniendo productos por SKU: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.get("/api/v1/productos/sku/{sku}", response_model=ProductoCaja)
+async def obtener_producto_por_sku(
+    sku: str,
+    producto_service: ProductoService = Depends(get_producto_service)
+):
+    """PATRON MVC - Controller: Escaneo en caja por SKU o código de barras"""
+    try:
+        return respuesta_json(await producto_service.obtener_por_sku_json(sku.strip()))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error obteniendo producto por SKU: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.get("/api/v1/productos/buscar", response_model=List[Producto])
+async def buscar_productos(
+    q: str,
+    limit: int = 10,
+    categoria: Optional[str] = None,
+    producto_service: ProductoService = Depends(get_producto_service)
+):
+    """
+    PATRON MVC - Controller: Búsqueda por nombre, descripción o SKU
+    Pensada para el teclado de caja: prefijos ("caf"), sin acentos y con
+    tolerancia a erratas ("choclate"); la respuesta va ordenada por relevancia
+    """
+    try:
+        return respuesta_json(await producto_service.buscar_productos_json(q, limit, categoria))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error buscando productos: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.post("/api/v1/reprecios", response_model=TrabajoReprecio, status_code=status.HTTP_202_ACCEPTED)
+async def crear_reprecio(
+    reprecio: ReprecioCrear,
+    reprecio_service: ReprecioService = Depends(get_reprecio_service)
+):
+    """
+    PATRON MVC - Controller: Cambio de precio masivo por categoría y/o SKUs
+    El trabajo corre en segundo plano; su progreso está en GET /api/v1/reprecios/{id}.
+    Con simulacion=true solo cuenta y muestra los cambios que haría
+    """
+    try:
+        trabajo = await reprecio_service.crear_reprecio(reprecio)
+        return adaptador_reprecio.respuesta(trabajo, status.HTTP_202_ACCEPTED)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creando reprecio: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@app.get("/api/v1/reprecios", response_model=List[TrabajoReprecio])
+async def listar_reprecios(
+    limit: int = 20,
+    reprecio_service: ReprecioService = Depends(get_reprecio_service)
+):
+    """PATRON MVC - Controller: Trabajos de reprecio más recientes (sin la muestra)"""
+    return adaptador_lista_reprecios.respuesta(await reprecio_service.listar_reprecios(limit))
+
+@app.get("/api/v1/reprecios/{trabajo_id}", response_model=TrabajoReprecio)
+async def obtener_reprecio(
+    trabajo_id: str,
+    reprecio_service: ReprecioService = Depends(get_reprecio_service)
+):
+    """PATRON MVC - Controller: Estado y progreso de un trabajo de reprecio"""
+    return adaptador_reprecio.respuesta(await reprecio_service.obtener_reprecio(trabajo_id))
+
+@app.post("/api/v1/reprecios/{trabajo_id}/reanudar", response_model=TrabajoReprecio)
+async def reanudar_reprecio(
+    trabajo_id: str,
+    reprecio_service: ReprecioService = Depends(get_reprecio_service)
+):
+    """PATRON MVC - Controller: Retoma un reprecio fallido desde su último lote"""
+    try:
+        return adaptador_reprecio.respuesta(await reprecio_service.reanudar_reprecio(trabajo_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reanudando reprecio: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+@ruta_admin(app, "/admin/cache-sku")
+async def informe_cache_sku():
+    """Aciertos, fallos y ocupación de la caché de escaneo por SKU (de este worker)"""
+    return con_worker(cache_sku.estadisticas())
+
+@ruta_admin(app, "/admin/catalogo", activa=catalogo is not None)
+async def informe_catalogo():
+    """Versión, tamaño y huella de memoria del catálogo residente (de este worker)"""
+    return con_worker({**catalogo.informe(), "busqueda": indice_busqueda.informe()})
+
 @app.get("/api/v1/productos/{producto_id}", response_model=Producto)
 async def obtener_producto(
     producto_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     producto_service: ProductoService = Depends(get_producto_service)
 ):
-    """PATRON MVC - Controller: Endpoint para obtener producto"""
+    """
+    PATRON MVC - Controller: Endpoint para obtener producto
+    ETag fuerte por versión del documento; If-None-Match responde 304 sin serializar
+    """
     try:
-        producto = await producto_service.obtener_producto(producto_id)
-        return Producto(**producto)
+        seleccion = seleccion_campos(Producto, fields, CAMPOS_OBLIGATORIOS)
+        if seleccion:
+            producto = await producto_service.obtener_producto(producto_id, seleccion.proyeccion)
+            etag = etag_documento(producto.get("version"), seleccion.campos)
+            if coincide(if_none_match, etag):
+                return no_modificado(etag)
+            return seleccion.adaptador.respuesta(producto, headers={"ETag": etag})
+        contenido, etag = await producto_service.obtener_producto_json(producto_id, if_none_match)
+        if contenido is None:
+            return no_modificado(etag)
+        return respuesta_json(contenido, headers={"ETag": etag})
     except HTTPException:
         raise
     except Exception as e:
@@ -227,12 +971,18 @@ async def obtener_producto(
 async def actualizar_producto(
     producto_id: str,
     producto_actualizar: ProductoActualizar,
+    if_match: Optional[str] = Header(None),
     producto_service: ProductoService = Depends(get_producto_service)
 ):
-    """PATRON MVC - Controller: Endpoint para actualizar producto"""
+    """
+    PATRON MVC - Controller: Endpoint para actualizar producto
+    Con If-Match (ETag de una lectura previa) responde 412 si otro lo modificó antes
+    """
     try:
-        producto_actualizado = await producto_service.actualizar_producto(producto_id, producto_actualizar)
-        return Producto(**producto_actualizado)
+        producto_actualizado = await producto_service.actualizar_producto(producto_id, producto_actualizar, if_match)
+        return adaptador_producto.respuesta(
+            producto_actualizado, headers={"ETag": etag_documento(producto_actualizado.get("version"))}
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -261,5 +1011,5 @@ async def eliminar_producto(
         )
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from comun.lanzador import ejecutar
+    ejecutar("main:app")
\ No newline at end of file
@@ -2,10 +2,11 @@
 Modelos Pydantic para productos - PATRON MVC Model Layer
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, AliasChoices
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
+from comun.serializacion import IdMongo
 
 class CategoriaProducto(str, Enum):
     """PATRON STRATEGY: Categorías como estrategias de agrupación"""
@@ -38,11 +39,95 @@ class ProductoActualizar(BaseModel):
     stock: Optional[int] = Field(None, ge=0)
     stock_minimo: Optional[int] = Field(None, ge=0)
 
+class ProductoCaja(BaseModel):
+    """PATRON DTO: Lo imprescindible para cobrar un producto escaneado"""
+    id: IdMongo = Field(..., validation_alias=AliasChoices("id", "_id"))
+    sku: str
+    nombre: str
+    precio: float
+    stock: int
+
 class Producto(ProductoBase):
     """Modelo completo de producto - PATRON DOMAIN MODEL"""
-    id: str
+    id: IdMongo = Field(..., validation_alias=AliasChoices("id", "_id"))
     stock: int
     stock_minimo: int
     fecha_creacion: datetime
     fecha_actualizacion: datetime
-    activo: bool
\ No newline at end of file
+    activo: bool
+
+class CambiosProductos(BaseModel):
+    """PATRON DTO: Sincronización incremental del catálogo de un terminal"""
+    productos: List[Producto]
+    eliminados: List[str]
+    marca_agua: str
+    hay_mas: bool
+
+class FacetaCategoria(BaseModel):
+    """Contadores de una categoría para la pantalla de navegación"""
+    categoria: CategoriaProducto
+    total: int
+    precio_min: Optional[float] = None
+    precio_max: Optional[float] = None
+    precio_medio: Optional[float] = None
+
+class FacetasCatalogo(BaseModel):
+    """PATRON DTO: Facetas de todas las categorías, mantenidas con cada escritura"""
+    total: int
+    categorias: List[FacetaCategoria]
+    fecha_recalculo: Optional[datetime] = None
+
+class TipoCambioPrecio(str, Enum):
+    """PATRON STRATEGY: Cómo se aplica el valor de la regla al precio"""
+    PORCENTAJE = "porcentaje"
+    ABSOLUTO = "absoluto"
+
+class RedondeoPrecio(str, Enum):
+    """PATRON STRATEGY: Política de redondeo del precio resultante"""
+    CENTIMO = "centimo"
+    CINCO_CENTIMOS = "cinco_centimos"
+    TERMINACION_99 = "terminacion_99"
+
+class ReglaReprecio(BaseModel):
+    """Qué productos cambian de precio y cómo; sin filtros se aplica a todo el catálogo"""
+    categoria: Optional[CategoriaProducto] = None
+    skus: Optional[List[str]] = Field(None, min_length=1, max_length=10000)
+    tipo: TipoCambioPrecio
+    valor: float
+    redondeo: RedondeoPrecio = RedondeoPrecio.CENTIMO
+    # Precios que quedarían por debajo no se tocan (se cuentan como omitidos)
+    precio_minimo: float = Field(0.01, gt=0)
+
+class ReprecioCrear(ReglaReprecio):
+    """PATRON COMMAND: Trabajo de reprecio; con simulacion=true no escribe nada"""
+    simulacion: bool = False
+
+class EstadoReprecio(str, Enum):
+    """PATRON STATE: Ciclo de vida de un trabajo de reprecio"""
+    PENDIENTE = "pendiente"
+    EN_CURSO = "en_curso"
+    COMPLETADO = "completado"
+    FALLIDO = "fallido"
+
+class CambioPrecio(BaseModel):
+    """Un cambio calculado, para revisar una simulación"""
+    sku: str
+    precio_anterior: float
+    precio_nuevo: float
+
+class TrabajoReprecio(BaseModel):
+    """Trabajo de reprecio y su progreso - PATRON DOMAIN MODEL"""
+    id: IdMongo = Field(..., validation_alias=AliasChoices("id", "_id"))
+    regla: ReglaReprecio
+    simulacion: bool
+    estado: EstadoReprecio
+    total: int = 0
+    procesados: int = 0
+    actualizados: int = 0
+    omitidos: int = 0
+    conflictos: int = 0
+    muestra: List[CambioPrecio] = []
+    error: Optional[str] = None
+    fecha_creacion: datetime
+    fecha_actualizacion: datetime
+    fecha_fin: Optional[datetime] = None
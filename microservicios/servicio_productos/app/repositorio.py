@@ -2,49 +2,198 @@
 Repositorio de productos - PATRON REPOSITORY
 """
 
-from pymongo import MongoClient
+import re
+from pymongo import MongoClient, ASCENDING, UpdateOne
+from pymongo.errors import ExecutionTimeout
 from bson import ObjectId
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from configuracion import configuration
+from comun.etag import VersionColeccion
+from comun.facetas import CAMPOS_FACETA, FacetasProductos
+from comun.lotes import ejecutar_lote
+from comun.sku import crear_indice_sku
+from comun.stock_bajo import bajo_stock, con_bajo_stock, crear_indice_bajo_stock
+
+# Tiempo máximo para un conteo filtrado; si se supera no se informa total
+CONTEO_MAX_MS = 200
 
 class ProductoRepository:
     """Repository Pattern: Abstrae el acceso a datos de productos"""
     
-    def __init__(self, database):
+    def __init__(self, database, proyeccion: dict = None):
         self.collection = database[configuration.COLECCION_PRODUCTOS]
+        self.proyeccion = proyeccion
+        # Cada escritura incrementa la `version` del documento y la de la colección
+        self.versiones = VersionColeccion(self.collection)
+        # y las facetas por categoría, antes que la versión: quien vea la nueva las ve al día
+        self.facetas = FacetasProductos(self.collection)
+    
+    async def version_coleccion(self) -> int:
+        return self.versiones.actual()
     
     async def crear(self, producto_data: dict) -> str:
+        producto_data["version"] = 1
+        producto_data["bajo_stock"] = bajo_stock(producto_data)
         result = self.collection.insert_one(producto_data)
+        self.facetas.registrar(None, producto_data)
+        self.versiones.incrementar()
         return str(result.inserted_id)
     
-    async def obtener_por_id(self, producto_id: str):
+    async def obtener_por_id(self, producto_id: str, proyeccion: dict = None):
         if not ObjectId.is_valid(producto_id):
             return None
-        return self.collection.find_one({"_id": ObjectId(producto_id)})
+        return self.collection.find_one({"_id": ObjectId(producto_id)}, proyeccion or self.proyeccion)
+    
+    async def obtener_por_sku(self, sku: str, proyeccion: dict = None):
+        return self.collection.find_one({"sku": sku}, proyeccion)
     
-    async def obtener_por_sku(self, sku: str):
-        return self.collection.find_one({"sku": sku})
+    async def obtener_por_skus(self, skus: List[str], proyeccion: dict = None) -> List[dict]:
+        return list(self.collection.find({"sku": {"$in": skus}}, proyeccion))
     
-    async def listar_todos(self, filtro: dict = None, skip: int = 0, limit: int = 10):
+    async def listar_todos(
+        self,
+        filtro: dict = None,
+        skip: int = 0,
+        limit: int = 10,
+        despues_de: ObjectId = None,
+        proyeccion: dict = None
+    ):
+        """Lista en orden de _id; con despues_de pagina por keyset en vez de skip"""
         if filtro is None:
             filtro = {}
-        cursor = self.collection.find(filtro).skip(skip).limit(limit)
+        if despues_de is not None:
+            filtro = {**filtro, "_id": {"$gt": despues_de}}
+        cursor = self.collection.find(filtro, proyeccion or self.proyeccion).sort("_id", ASCENDING).skip(skip).limit(limit)
+        return list(cursor)
+    
+    async def contar_estimado(self, filtro: dict) -> Optional[int]:
+        """
+        Conteo acotado por el índice (activo, categoria, _id); sin categoría
+        también, porque los metadatos de la colección cuentan los eliminados
+        """
+        try:
+            return self.collection.count_documents(filtro, maxTimeMS=CONTEO_MAX_MS)
+        except ExecutionTimeout:
+            return None
+    
+    @staticmethod
+    def _actualizacion_carga(datos: dict, ahora: datetime) -> List[dict]:
+        """
+        Una fila de carga sobre un SKU existente no toca el stock salvo que lo
+        traiga, ni reactiva un producto eliminado: stock y activo solo se
+        fijan al crear
+        """
+        al_crear: Dict[str, Any] = {"stock": 0, "activo": True, "fecha_creacion": ahora}
+        cambios = {**datos, "fecha_actualizacion": ahora}
+        if "stock" in cambios:
+            del al_crear["stock"]
+        return con_bajo_stock({"$set": cambios, "$setOnInsert": al_crear, "$inc": {"version": 1}})
+    
+    async def upsert_por_sku(self, productos: List[Tuple[int, dict]], ordenado: bool) -> Dict[int, Dict[str, Any]]:
+        """Crea o actualiza por SKU con bulk_write; recibe pares (fila, datos)"""
+        ahora = datetime.now()
+        operaciones = [
+            (fila, UpdateOne({"sku": datos["sku"]}, self._actualizacion_carga(datos, ahora), upsert=True))
+            for fila, datos in productos
+        ]
+        antes = self.facetas.antes_por_sku([datos["sku"] for _, datos in productos])
+        resultados = ejecutar_lote(self.collection, operaciones, ordenado, configuration.BULK_TAMANO_LOTE)
+        self.facetas.registrar_carga(productos, antes, resultados)
+        self.versiones.incrementar()
+        return resultados
+    
+    async def buscar_texto(self, tokens: List[str], categoria: Optional[str], limit: int) -> List[dict]:
+        """Búsqueda sin catálogo residente: cada token como subcadena de nombre o sku"""
+        filtro: Dict[str, Any] = {"activo": True}
+        if categoria:
+            filtro["categoria"] = categoria
+        if tokens:
+            filtro["$and"] = [
+                {"$or": [{campo: {"$regex": re.escape(token), "$options": "i"}} for campo in ("nombre", "sku")]}
+                for token in tokens
+            ]
+        return list(self.collection.find(filtro, self.proyeccion).sort("_id", ASCENDING).limit(limit))
+    
+    async def listar_cambios(self, filtro: dict, limit: int) -> List[dict]:
+        """Productos escritos en orden de (fecha_actualizacion, _id), el del índice"""
+        cursor = (
+            self.collection.find(filtro, self.proyeccion)
+            .sort([("fecha_actualizacion", ASCENDING), ("_id", ASCENDING)])
+            .limit(limit)
+        )
         return list(cursor)
     
+    def cursor_exportacion(self, filtro: dict, proyeccion: dict = None):
+        """Cursor perezoso para exportaciones: no lee nada hasta que se itera"""
+        return (
+            self.collection.find(filtro, proyeccion or self.proyeccion)
+            .sort("_id", ASCENDING)
+            .batch_size(configuration.EXPORT_TAMANO_LOTE)
+        )
+    
+    async def crear_indices(self):
+        """Índice que cubre el filtro de listado y el orden por _id del keyset"""
+        self.collection.create_index([("activo", ASCENDING), ("categoria", ASCENDING), ("_id", ASCENDING)])
+        # Refresco incremental del catálogo residente, exportación por fecha y
+        # sincronización de terminales (keyset por fecha y _id)
+        self.collection.create_index([("fecha_actualizacion", ASCENDING), ("_id", ASCENDING)])
+        await self.facetas.crear_indices()
+        # Productos bajo su stock mínimo, que mantienen las escrituras de ambos servicios
+        crear_indice_bajo_stock(self.collection)
+        # Escaneo en caja y upsert de cargas masivas por SKU; la unicidad la
+        # garantiza la base de datos y no solo la comprobación previa al crear
+        crear_indice_sku(self.collection)
+    
     async def actualizar(self, producto_id: str, datos_actualizacion: dict) -> bool:
         if not ObjectId.is_valid(producto_id):
             return False
         datos_actualizacion["fecha_actualizacion"] = datetime.now()
-        result = self.collection.update_one(
+        # El documento anterior (solo lo que cuenta para las facetas) en el mismo viaje
+        antes = self.collection.find_one_and_update(
             {"_id": ObjectId(producto_id)},
-            {"$set": datos_actualizacion}
+            con_bajo_stock({"$set": datos_actualizacion, "$inc": {"version": 1}}),
+            projection=CAMPOS_FACETA
         )
-        return result.modified_count > 0
+        if antes is None:
+            return False
+        self.facetas.registrar(antes, {**antes, **datos_actualizacion})
+        self.versiones.incrementar()
+        return True
+    
+    async def actualizar_condicional(self, producto_id: str, datos_actualizacion: dict, condicion: dict) -> Optional[dict]:
+        """
+        Concurrencia optimista: actualiza solo si la versión sigue siendo la
+        esperada (If-Match) y devuelve el documento nuevo en el mismo viaje.
+        Se lee el anterior (lo necesitan las facetas) y el nuevo se compone
+        aplicándole el mismo $set e $inc
+        """
+        if not ObjectId.is_valid(producto_id):
+            return None
+        datos_actualizacion["fecha_actualizacion"] = datetime.now()
+        antes = self.collection.find_one_and_update(
+            {"_id": ObjectId(producto_id), "activo": True, **condicion},
+            con_bajo_stock({"$set": datos_actualizacion, "$inc": {"version": 1}}),
+            projection={**self.proyeccion, **CAMPOS_FACETA} if self.proyeccion else None
+        )
+        if antes is None:
+            return None
+        producto = {**antes, **datos_actualizacion, "version": antes.get("version", 0) + 1}
+        self.facetas.registrar(antes, producto)
+        self.versiones.incrementar()
+        return producto
     
     async def eliminar(self, producto_id: str) -> bool:
         if not ObjectId.is_valid(producto_id):
             return False
-        result = self.collection.update_one(
-            {"_id": ObjectId(producto_id)},
-            {"$set": {"activo": False, "fecha_actualizacion": datetime.now()}}
+        # Solo un producto activo: repetir la baja no vuelve a escribir ni sube versiones
+        antes = self.collection.find_one_and_update(
+            {"_id": ObjectId(producto_id), "activo": True},
+            con_bajo_stock({"$set": {"activo": False, "fecha_actualizacion": datetime.now()}, "$inc": {"version": 1}}),
+            projection=CAMPOS_FACETA
         )
-        return result.modified_count > 0
\ No newline at end of file
+        if antes is None:
+            return False
+        self.facetas.registrar(antes, None)
+        self.versiones.incrementar()
+        return True
\ No newline at end of file
@@ -0,0 +1,300 @@
+"""
+Reprecio masivo por categoría o SKU - PATRON COMMAND
+Un trabajo recorre en orden de _id los productos que cumplen la regla y
+escribe los precios nuevos en lotes de bulk_write. Tras cada lote guarda
+el último _id como punto de control, así otro worker lo retoma si el
+proceso cae. Cada producto escrito queda marcado con el id del trabajo:
+repetir un lote tras un fallo nunca aplica el cambio dos veces
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from comun.etag import VersionColeccion
+from comun.facetas import FacetasProductos
+from modelos import EstadoReprecio, RedondeoPrecio, TipoCambioPrecio
+
+logger = logging.getLogger(__name__)
+
+CENTIMO = Decimal("0.01")
+CINCO_CENTIMOS = Decimal("0.05")
+UNIDAD = Decimal("1")
+
+class CalculadoraPrecio:
+    """PATRON STRATEGY: Regla de reprecio precompilada a Decimal (sin errores de coma flotante)"""
+
+    def __init__(self, regla: Dict[str, Any]):
+        valor = Decimal(str(regla["valor"]))
+        self.porcentaje = regla["tipo"] == TipoCambioPrecio.PORCENTAJE.value
+        self.factor = 1 + valor / 100
+        self.valor = valor
+        self.redondeo = RedondeoPrecio(regla["redondeo"])
+        self.minimo = Decimal(str(regla["precio_minimo"]))
+
+    def _redondear(self, precio: Decimal) -> Decimal:
+        if self.redondeo == RedondeoPrecio.CINCO_CENTIMOS:
+            return (precio / CINCO_CENTIMOS).quantize(UNIDAD, ROUND_HALF_UP) * CINCO_CENTIMOS
+        if self.redondeo == RedondeoPrecio.TERMINACION_99:
+            # Al x,99 más cercano: 10,40 -> 9,99 y 10,60 -> 10,99
+            return precio.quantize(UNIDAD, ROUND_HALF_UP) - CENTIMO
+        return precio.quantize(CENTIMO, ROUND_HALF_UP)
+
+    def calcular(self, precio: float) -> Optional[float]:
+        """Precio nuevo, o None si quedaría por debajo del mínimo de la regla"""
+        actual = Decimal(str(precio))
+        nuevo = self._redondear(actual * self.factor if self.porcentaje else actual + self.valor)
+        if nuevo < self.minimo:
+            return None
+        return float(nuevo)
+
+class TrabajoPerdido(Exception):
+    """Otro worker reclamó el trabajo (este dejó de renovar su latido a tiempo)"""
+
+class ReprecioRepository:
+    """PATRON REPOSITORY: Trabajos de reprecio y sus escrituras sobre los productos"""
+
+    def __init__(self, trabajos, productos, tamano_muestra: int = 20):
+        self.trabajos = trabajos
+        self.productos = productos
+        self.tamano_muestra = tamano_muestra
+        self.versiones = VersionColeccion(productos)
+        self.facetas = FacetasProductos(productos)
+
+    def _filtro(self, regla: Dict[str, Any], despues_de: Optional[ObjectId] = None) -> Dict[str, Any]:
+        """Mismo orden de claves que el índice (activo, categoria, _id)"""
+        filtro: Dict[str, Any] = {"activo": True}
+        if regla.get("categoria"):
+            filtro["categoria"] = regla["categoria"]
+        if regla.get("skus"):
+            filtro["sku"] = {"$in": regla["skus"]}
+        if despues_de is not None:
+            filtro["_id"] = {"$gt": despues_de}
+        return filtro
+
+    async def crear(self, regla: Dict[str, Any], simulacion: bool) -> dict:
+        ahora = datetime.now()
+        trabajo = {
+            "_id": ObjectId(),
+            "regla": regla,
+            "simulacion": simulacion,
+            "estado": EstadoReprecio.PENDIENTE.value,
+            "total": self.productos.count_documents(self._filtro(regla)),
+            "procesados": 0,
+            "actualizados": 0,
+            "omitidos": 0,
+            "conflictos": 0,
+            "muestra": [],
+            "ultimo_id": None,
+            "fecha_creacion": ahora,
+            "fecha_actualizacion": ahora,
+        }
+        self.trabajos.insert_one(trabajo)
+        return trabajo
+
+    async def obtener(self, trabajo_id: str) -> Optional[dict]:
+        if not ObjectId.is_valid(trabajo_id):
+            return None
+        return self.trabajos.find_one({"_id": ObjectId(trabajo_id)})
+
+    async def listar(self, limit: int) -> List[dict]:
+        return list(self.trabajos.find({}, {"muestra": 0}).sort("_id", DESCENDING).limit(limit))
+
+    def _reclamable(self, abandono: timedelta) -> Dict[str, Any]:
+        """Pendientes, o en curso sin latido reciente (su worker cayó)"""
+        return {"$or": [
+            {"estado": EstadoReprecio.PENDIENTE.value},
+            {"estado": EstadoReprecio.EN_CURSO.value, "latido": {"$lt": datetime.now() - abandono}},
+        ]}
+
+    def reclamar(self, trabajo_id: ObjectId, propietario: str, abandono: timedelta, fallidos: bool = False) -> Optional[dict]:
+        """Toma el trabajo de forma atómica; de dos workers solo uno lo consigue"""
+        filtro = self._reclamable(abandono)
+        if fallidos:
+            filtro["$or"].append({"estado": EstadoReprecio.FALLIDO.value})
+        return self.trabajos.find_one_and_update(
+            {"_id": trabajo_id, **filtro},
+            {
+                "$set": {"estado": EstadoReprecio.EN_CURSO.value, "propietario": propietario, "latido": datetime.now()},
+                "$unset": {"error": ""},
+            },
+            return_document=ReturnDocument.AFTER
+        )
+
+    def reclamables(self, abandono: timedelta) -> List[ObjectId]:
+        return [t["_id"] for t in self.trabajos.find(self._reclamable(abandono), {"_id": 1})]
+
+    def _escribir(self, trabajo_id: ObjectId, cambios: List[Tuple[dict, float]]) -> int:
+        """
+        Precio nuevo solo si el producto sigue con el precio leído (un PUT
+        concurrente gana) y este trabajo no lo escribió ya; devuelve cuántos casaron
+        """
+        ahora = datetime.now()
+        operaciones = [
+            UpdateOne(
+                {"_id": producto["_id"], "precio": producto["precio"], "reprecio_id": {"$ne": trabajo_id}},
+                {
+                    "$set": {"precio": nuevo, "fecha_actualizacion": ahora, "reprecio_id": trabajo_id},
+                    "$inc": {"version": 1},
+                }
+            )
+            for producto, nuevo in cambios
+        ]
+        escritos = self.productos.bulk_write(operaciones, ordered=False).matched_count
+        if escritos < len(cambios):
+            # Con conflictos, las facetas solo cuentan los que escribió este trabajo
+            propios = {
+                producto["_id"]
+                for producto in self.productos.find(
+                    {"_id": {"$in": [producto["_id"] for producto, _ in cambios]}, "reprecio_id": trabajo_id},
+                    {"_id": 1}
+                )
+            }
+            cambios = [(producto, nuevo) for producto, nuevo in cambios if producto["_id"] in propios]
+        if escritos:
+            self.facetas.registrar_varios((producto, {**producto, "precio": nuevo}) for producto, nuevo in cambios)
+            self.versiones.incrementar()
+        return escritos
+
+    def procesar_lote(self, trabajo: dict, propietario: str, tamano: int) -> Tuple[bool, List[str]]:
+        """
+        Aplica el siguiente lote y guarda el punto de control con los
+        contadores. Devuelve (terminado, SKUs escritos). Bloqueante: el
+        ejecutor lo llama en un hilo
+        """
+        trabajo_id = trabajo["_id"]
+        productos = list(
+            self.productos.find(
+                self._filtro(trabajo["regla"], trabajo.get("ultimo_id")),
+                {"precio": 1, "sku": 1, "reprecio_id": 1, "categoria": 1, "activo": 1}
+            ).sort("_id", ASCENDING).limit(tamano)
+        )
+        calculadora = CalculadoraPrecio(trabajo["regla"])
+        cambios: List[Tuple[dict, float]] = []
+        actualizados = omitidos = 0
+        for producto in productos:
+            if producto.get("reprecio_id") == trabajo_id:
+                # Escrito antes de una caída, sin que llegara a guardarse el punto de control
+                actualizados += 1
+                continue
+            nuevo = calculadora.calcular(producto["precio"])
+            if nuevo is None or nuevo == producto["precio"]:
+                omitidos += 1
+            else:
+                cambios.append((producto, nuevo))
+
+        escritos = len(cambios) if trabajo["simulacion"] or not cambios else self._escribir(trabajo_id, cambios)
+        muestra = [
+            {"sku": producto["sku"], "precio_anterior": producto["precio"], "precio_nuevo": nuevo}
+            for producto, nuevo in cambios[:self.tamano_muestra]
+        ]
+        terminado = len(productos) < tamano
+        actualizacion: Dict[str, Any] = {
+            "$inc": {
+                "procesados": len(productos),
+                "actualizados": actualizados + escritos,
+                "omitidos": omitidos,
+                "conflictos": len(cambios) - escritos,
+            },
+            "$set": {"latido": datetime.now(), "fecha_actualizacion": datetime.now()},
+            "$push": {"muestra": {"$each": muestra, "$slice": self.tamano_muestra}},
+        }
+        if productos:
+            actualizacion["$set"]["ultimo_id"] = productos[-1]["_id"]
+        if terminado:
+            actualizacion["$set"].update({"estado": EstadoReprecio.COMPLETADO.value, "fecha_fin": datetime.now()})
+        guardado = self.trabajos.find_one_and_update(
+            {"_id": trabajo_id, "propietario": propietario, "estado": EstadoReprecio.EN_CURSO.value},
+            actualizacion,
+            return_document=ReturnDocument.AFTER
+        )
+        if guardado is None:
+            raise TrabajoPerdido(str(trabajo_id))
+        trabajo.update(guardado)
+        escritos_skus = [] if trabajo["simulacion"] else [producto["sku"] for producto, _ in cambios]
+        return terminado, escritos_skus
+
+    def fallar(self, trabajo_id: ObjectId, propietario: str, error: str):
+        self.trabajos.update_one(
+            {"_id": trabajo_id, "propietario": propietario},
+            {"$set": {"estado": EstadoReprecio.FALLIDO.value, "error": error, "fecha_actualizacion": datetime.now()}}
+        )
+
+    async def crear_indices(self):
+        """Búsqueda de trabajos reclamables al arrancar; los productos ya usan (activo, categoria, _id)"""
+        self.trabajos.create_index([("estado", ASCENDING), ("latido", ASCENDING)])
+
+class EjecutorReprecios:
+    """
+    Ejecuta los trabajos en segundo plano, un lote por hilo y con una pausa
+    entre lotes para no competir con las lecturas. Al arrancar retoma los
+    trabajos pendientes o abandonados desde su punto de control
+    """
+
+    def __init__(
+        self,
+        repositorio: ReprecioRepository,
+        tamano_lote: int,
+        pausa: float,
+        abandono: float,
+        al_escribir: Optional[Callable[[List[str]], None]] = None
+    ):
+        self.repositorio = repositorio
+        self.tamano_lote = tamano_lote
+        self.pausa = pausa
+        self.abandono = timedelta(seconds=abandono)
+        self.al_escribir = al_escribir
+        self.propietario = uuid.uuid4().hex
+        self._tareas: Dict[ObjectId, asyncio.Task] = {}
+
+    async def _ejecutar(self, trabajo: dict):
+        trabajo_id = trabajo["_id"]
+        try:
+            terminado = False
+            while not terminado:
+                terminado, skus = await asyncio.to_thread(
+                    self.repositorio.procesar_lote, trabajo, self.propietario, self.tamano_lote
+                )
+                if skus and self.al_escribir is not None:
+                    self.al_escribir(skus)
+                if not terminado and self.pausa > 0:
+                    await asyncio.sleep(self.pausa)
+            logger.info(
+                "Reprecio %s completado: %s procesados, %s actualizados, %s omitidos, %s conflictos",
+                trabajo_id, trabajo["procesados"], trabajo["actualizados"], trabajo["omitidos"], trabajo["conflictos"]
+            )
+        except TrabajoPerdido:
+            logger.warning("Reprecio %s reclamado por otro worker; se abandona aquí", trabajo_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error en el reprecio %s: %s", trabajo_id, e)
+            await asyncio.to_thread(self.repositorio.fallar, trabajo_id, self.propietario, str(e))
+        finally:
+            self._tareas.pop(trabajo_id, None)
+
+    async def lanzar(self, trabajo_id: ObjectId, fallidos: bool = False) -> Optional[dict]:
+        """Reclama el trabajo y lo ejecuta en segundo plano; None si no estaba libre"""
+        if trabajo_id in self._tareas:
+            return None
+        trabajo = await asyncio.to_thread(
+            self.repositorio.reclamar, trabajo_id, self.propietario, self.abandono, fallidos
+        )
+        if trabajo is not None:
+            self._tareas[trabajo_id] = asyncio.create_task(self._ejecutar(trabajo))
+        return trabajo
+
+    async def iniciar(self):
+        for trabajo_id in await asyncio.to_thread(self.repositorio.reclamables, self.abandono):
+            if await self.lanzar(trabajo_id):
+                logger.info("Reprecio %s retomado desde su punto de control", trabajo_id)
+
+    async def detener(self):
+        """Los trabajos a medias los retoma otro worker cuando venza su latido"""
+        for tarea in list(self._tareas.values()):
+            tarea.cancel()
+        self._tareas.clear()
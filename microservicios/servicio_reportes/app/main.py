@@ -2,15 +2,23 @@
 Servicio de Reportes - PATRON MVC + GOF
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, status
 from datetime import datetime, timedelta
 from typing import List
 import logging
 from configuracion import configuration
-from modelos import ReporteVentas, ReporteInventario, ReporteGeneral
+from comun.arranque import CalentadorArranque
+from comun.mongo import obtener_cliente, precalentar_pool
+from comun.perfilador import registrar_perfilador
+from comun.registro import configurar_logging, registrar_metricas_logging
+from comun.sondas import ProbadorSalud, registrar_sondas, verificacion_mongo
+from modelos import (
+    CalculoReposicion, ReporteVentas, ReporteInventario, ReporteGeneral, ReporteReposicion, SugerenciaReposicion
+)
+from reposicion import CalculadoraReposicion, MotorReposicion, ReposicionRepository
 from servicios import ReporteService
 
-logging.basicConfig(level=logging.INFO)
+configurar_logging("reportes")
 logger = logging.getLogger(__name__)
 
 # PATRON MVC - Controller principal
@@ -19,11 +27,56 @@ app = FastAPI(
     description="Microservicio para generación de reportes",
     version="1.0.0"
 )
+registrar_metricas_logging(app)
+registrar_perfilador(app)
 
 # PATRON DEPENDENCY INJECTION
 def get_reporte_service():
     return ReporteService()
 
+# Sondas de salud: verificación en segundo plano sobre el cliente compartido
+cliente_mongo = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
+probador_salud = ProbadorSalud("Reportes", configuration.SONDA_INTERVALO)
+probador_salud.agregar_verificacion("mongodb", verificacion_mongo(cliente_mongo))
+
+# Calentamiento de arranque: la readiness no pasa a listo hasta completarlo
+calentador = CalentadorArranque("Reportes")
+calentador.agregar_fase(
+    "mongodb_pool",
+    lambda: precalentar_pool(cliente_mongo, configuration.MONGODB_CONEXIONES_INICIALES)
+)
+calentador.agregar_fase("openapi", app.openapi)
+registrar_sondas(app, probador_salud, calentador)
+
+LIMITE_SUGERENCIAS_MAX = 1000
+
+def get_reposicion_repository() -> ReposicionRepository:
+    """PATRON FACTORY: Ventas, catálogo y sugerencias sobre el cliente compartido"""
+    database = cliente_mongo[configuration.BASE_DATOS]
+    return ReposicionRepository(
+        database["ventas"],
+        database["productos"],
+        database[configuration.COLECCION_SUGERENCIAS],
+        database[configuration.COLECCION_CALCULOS_REPOSICION],
+        configuration.REPOSICION_TAMANO_LOTE
+    )
+
+# Sugerencias de reposición: se recalculan en segundo plano cada REPOSICION_INTERVALO
+motor_reposicion = MotorReposicion(
+    get_reposicion_repository(),
+    CalculadoraReposicion(
+        configuration.REPOSICION_DIAS,
+        configuration.REPOSICION_PLAZO,
+        configuration.REPOSICION_REVISION,
+        configuration.REPOSICION_NIVEL_SERVICIO,
+        configuration.REPOSICION_DIAS_RECIENTES
+    ),
+    configuration.REPOSICION_INTERVALO
+)
+calentador.agregar_fase("indices_reposicion", get_reposicion_repository().crear_indices)
+app.add_event_handler("startup", motor_reposicion.iniciar)
+app.add_event_handler("shutdown", motor_reposicion.detener)
+
 @app.get("/")
 async def raiz():
     return {
@@ -91,6 +144,49 @@ async def obtener_reporte_general(
         logger.error(f"Error generando reporte general: {e}")
         raise HTTPException(status_code=500, detail="Error generando reporte")
 
+@app.get("/api/v1/reportes/reposicion", response_model=ReporteReposicion)
+async def obtener_reporte_reposicion(
+    solo_reponer: bool = True,
+    limit: int = 100,
+    repositorio: ReposicionRepository = Depends(get_reposicion_repository)
+):
+    """
+    PATRON MVC - Controller: Sugerencias del último cálculo de reposición
+    Con solo_reponer=true (por defecto) solo los productos en o bajo su punto
+    de pedido, los de menos días de cobertura primero
+    """
+    try:
+        return ReporteReposicion(
+            calculo=repositorio.ultimo_calculo(),
+            sugerencias=repositorio.listar(solo_reponer, max(1, min(limit, LIMITE_SUGERENCIAS_MAX)))
+        )
+    except Exception as e:
+        logger.error(f"Error generando reporte de reposición: {e}")
+        raise HTTPException(status_code=500, detail="Error generando reporte")
+
+@app.post("/api/v1/reportes/reposicion/calcular", response_model=CalculoReposicion)
+async def calcular_reposicion():
+    """PATRON MVC - Controller: Recalcula ahora las sugerencias de todo el catálogo"""
+    try:
+        return await motor_reposicion.calcular()
+    except Exception as e:
+        logger.error(f"Error calculando reposición: {e}")
+        raise HTTPException(status_code=500, detail="Error calculando reposición")
+
+@app.get("/api/v1/reportes/reposicion/{producto_id}", response_model=SugerenciaReposicion)
+async def obtener_sugerencia_reposicion(
+    producto_id: str,
+    repositorio: ReposicionRepository = Depends(get_reposicion_repository)
+):
+    """PATRON MVC - Controller: Sugerencia de reposición de un producto"""
+    sugerencia = repositorio.obtener(producto_id)
+    if not sugerencia:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sin sugerencia de reposición para el producto"
+        )
+    return sugerencia
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from comun.lanzador import ejecutar
+    ejecutar("main:app")
\ No newline at end of file
@@ -2,8 +2,8 @@
 Modelos de reportes - PATRON MVC Model Layer
 """
 
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from pydantic import AliasChoices, BaseModel, Field
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 class ReporteVentas(BaseModel):
@@ -23,4 +23,41 @@ class ReporteGeneral(BaseModel):
     """PATRON COMPOSITE: Reporte general que contiene otros reportes"""
     ventas: ReporteVentas
     inventario: ReporteInventario
-    fecha_generacion: datetime
\ No newline at end of file
+    fecha_generacion: datetime
+
+class SugerenciaReposicion(BaseModel):
+    """Punto de pedido y cantidad sugerida de un producto según su velocidad de venta"""
+    producto_id: str = Field(..., validation_alias=AliasChoices("producto_id", "_id"))
+    sku: Optional[str] = None
+    nombre: Optional[str] = None
+    disponible: int
+    stock_minimo: int = 0
+    velocidad: float
+    velocidad_reciente: float
+    desviacion: float
+    dias_con_venta: int
+    stock_seguridad: int
+    punto_pedido: int
+    cantidad_sugerida: int
+    dias_cobertura: Optional[float] = None
+    reponer: bool
+    fecha_calculo: datetime
+
+class CalculoReposicion(BaseModel):
+    """Resumen de una ejecución del cálculo de reposición"""
+    fecha: datetime
+    desde: datetime
+    hasta: datetime
+    dias: int
+    productos: int
+    filas_venta: int
+    a_reponer: int
+    unidades_sugeridas: int
+    segundos_lectura: float
+    segundos_calculo: float
+    segundos_total: Optional[float] = None
+
+class ReporteReposicion(BaseModel):
+    """PATRON COMPOSITE: Último cálculo y sus sugerencias"""
+    calculo: Optional[CalculoReposicion] = None
+    sugerencias: List[SugerenciaReposicion]
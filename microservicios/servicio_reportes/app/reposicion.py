@@ -0,0 +1,251 @@
+"""
+Sugerencias de reposición - PATRON STRATEGY
+Calcula para todo el catálogo, en una sola pasada vectorizada con NumPy,
+la demanda diaria media, su variabilidad, el stock de seguridad, el punto
+de pedido y la cantidad a pedir a partir de las ventas de los últimos días.
+Mongo agrega las ventas por producto y día; el resto son operaciones sobre
+arrays del tamaño del catálogo, sin bucles por producto ni matriz densa
+producto x día
+"""
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+MS_POR_DIA = 86_400_000
+PROYECCION_PRODUCTO = {"sku": 1, "nombre": 1, "stock": 1, "reservado": 1, "stock_minimo": 1}
+
+class CalculadoraReposicion:
+    """Política de punto de pedido con revisión periódica (nivel objetivo = demanda en plazo + revisión + seguridad)"""
+
+    def __init__(self, dias: int, plazo: float, revision: float, nivel_servicio: float, dias_recientes: int):
+        self.dias = dias
+        self.plazo = plazo
+        self.revision = revision
+        self.z = NormalDist().inv_cdf(nivel_servicio)
+        self.dias_recientes = min(dias_recientes, dias)
+
+    def calcular(
+        self,
+        indices: np.ndarray,
+        dias: np.ndarray,
+        cantidades: np.ndarray,
+        disponibles: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """
+        indices/dias/cantidades: ventas agregadas por (producto, día) en forma
+        dispersa; los días sin ventas cuentan como demanda cero.
+        disponibles: stock disponible por producto, en el orden de los índices
+        """
+        n = len(disponibles)
+        # Un mismo (producto, día) puede venir repetido si la agregación no es exacta
+        codigos, inversos = np.unique(indices * self.dias + dias, return_inverse=True)
+        diarias = np.bincount(inversos, weights=cantidades)
+        indices = codigos // self.dias
+        dias = codigos % self.dias
+
+        suma = np.bincount(indices, weights=diarias, minlength=n)
+        suma_cuadrados = np.bincount(indices, weights=diarias * diarias, minlength=n)
+        recientes = dias >= self.dias - self.dias_recientes
+        suma_reciente = np.bincount(indices[recientes], weights=diarias[recientes], minlength=n)
+        dias_con_venta = np.bincount(indices, minlength=n)
+
+        media = suma / self.dias
+        varianza = np.maximum(suma_cuadrados - self.dias * media * media, 0) / max(self.dias - 1, 1)
+        desviacion = np.sqrt(varianza)
+
+        seguridad = self.z * desviacion * math.sqrt(self.plazo)
+        punto_pedido = media * self.plazo + seguridad
+        nivel_objetivo = media * (self.plazo + self.revision) + seguridad
+        con_demanda = media > 0
+        reponer = con_demanda & (disponibles <= punto_pedido)
+        cantidad = np.where(reponer, np.ceil(np.maximum(nivel_objetivo - disponibles, 0)), 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cobertura = np.where(con_demanda, np.maximum(disponibles, 0) / media, np.nan)
+        return {
+            "velocidad": media,
+            "velocidad_reciente": suma_reciente / self.dias_recientes,
+            "desviacion": desviacion,
+            "dias_con_venta": dias_con_venta,
+            "stock_seguridad": np.ceil(seguridad),
+            "punto_pedido": np.ceil(punto_pedido),
+            "cantidad_sugerida": cantidad,
+            "dias_cobertura": cobertura,
+            "reponer": reponer,
+        }
+
+class ReposicionRepository:
+    """PATRON REPOSITORY: Lee ventas y catálogo y guarda las sugerencias de cada cálculo"""
+
+    def __init__(self, ventas, productos, sugerencias, calculos, tamano_lote: int = 1000):
+        self.ventas = ventas
+        self.productos = productos
+        self.sugerencias = sugerencias
+        self.calculos = calculos
+        self.tamano_lote = tamano_lote
+
+    def leer_productos(self) -> Tuple[List[dict], np.ndarray]:
+        productos = list(self.productos.find({"activo": True}, PROYECCION_PRODUCTO).batch_size(self.tamano_lote))
+        disponibles = np.fromiter(
+            (p.get("stock", 0) - p.get("reservado", 0) for p in productos), dtype=np.float64, count=len(productos)
+        )
+        return productos, disponibles
+
+    def leer_ventas(self, inicio: datetime, fin: datetime, posiciones: Dict[str, int]) -> Tuple[np.ndarray, ...]:
+        """Unidades vendidas por (producto, día) agregadas en el servidor"""
+        cursor = self.ventas.aggregate([
+            {"$match": {"estado": "completada", "fecha_creacion": {"$gte": inicio, "$lt": fin}}},
+            {"$project": {
+                "items.producto_id": 1,
+                "items.cantidad": 1,
+                "dia": {"$floor": {"$divide": [{"$subtract": ["$fecha_creacion", inicio]}, MS_POR_DIA]}},
+            }},
+            {"$unwind": "$items"},
+            {"$group": {"_id": {"p": "$items.producto_id", "d": "$dia"}, "cantidad": {"$sum": "$items.cantidad"}}},
+        ], allowDiskUse=True, batchSize=self.tamano_lote)
+        indices, dias, cantidades = [], [], []
+        for fila in cursor:
+            # Ventas de productos ya inactivos o borrados no generan sugerencia
+            posicion = posiciones.get(fila["_id"]["p"])
+            if posicion is not None:
+                indices.append(posicion)
+                dias.append(fila["_id"]["d"])
+                cantidades.append(fila["cantidad"])
+        return (
+            np.array(indices, dtype=np.int64),
+            np.array(dias, dtype=np.int64),
+            np.array(cantidades, dtype=np.float64),
+        )
+
+    def guardar(self, calculo: dict, documentos: List[dict]):
+        """Sustituye las sugerencias del cálculo anterior por las nuevas"""
+        for inicio in range(0, len(documentos), self.tamano_lote):
+            self.sugerencias.bulk_write([
+                ReplaceOne({"_id": documento["_id"]}, documento, upsert=True)
+                for documento in documentos[inicio:inicio + self.tamano_lote]
+            ], ordered=False)
+        # Productos que ya no están en el catálogo (por fecha: otro worker puede haber calculado después)
+        self.sugerencias.delete_many({"fecha_calculo": {"$lt": calculo["fecha"]}})
+        self.calculos.insert_one(calculo)
+
+    def ultimo_calculo(self) -> Optional[dict]:
+        return self.calculos.find_one(sort=[("fecha", DESCENDING)])
+
+    def listar(self, solo_reponer: bool, limit: int) -> List[dict]:
+        if solo_reponer:
+            cursor = self.sugerencias.find({"reponer": True}).sort([("dias_cobertura", ASCENDING), ("_id", ASCENDING)])
+        else:
+            cursor = self.sugerencias.find().sort("sku", ASCENDING)
+        return list(cursor.limit(limit))
+
+    def obtener(self, producto_id: str) -> Optional[dict]:
+        return self.sugerencias.find_one({"_id": producto_id})
+
+    async def crear_indices(self):
+        self.sugerencias.create_index([("reponer", ASCENDING), ("dias_cobertura", ASCENDING), ("_id", ASCENDING)])
+        self.sugerencias.create_index("sku")
+        self.calculos.create_index([("fecha", DESCENDING)])
+
+class MotorReposicion:
+    """Ejecuta el cálculo completo y lo repite en segundo plano cada cierto intervalo"""
+
+    def __init__(self, repositorio: ReposicionRepository, calculadora: CalculadoraReposicion, intervalo: float):
+        self.repositorio = repositorio
+        self.calculadora = calculadora
+        self.intervalo = intervalo
+        self._tarea: Optional[asyncio.Task] = None
+        self._bloqueo = asyncio.Lock()
+
+    def _calcular(self) -> dict:
+        inicio_reloj = time.perf_counter()
+        # Solo días completos: la ventana termina a medianoche
+        fin = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        inicio = fin - timedelta(days=self.calculadora.dias)
+
+        productos, disponibles = self.repositorio.leer_productos()
+        posiciones = {str(producto["_id"]): posicion for posicion, producto in enumerate(productos)}
+        indices, dias, cantidades = self.repositorio.leer_ventas(inicio, fin, posiciones)
+        lectura = time.perf_counter() - inicio_reloj
+
+        resultado = self.calculadora.calcular(indices, dias, cantidades, disponibles)
+        calculo_reloj = time.perf_counter() - inicio_reloj - lectura
+
+        calculo_id = ObjectId()
+        ahora = datetime.now()
+        # tolist() convierte a tipos de Python de una vez, no elemento a elemento
+        columnas = {clave: valores.tolist() for clave, valores in resultado.items()}
+        documentos = []
+        for posicion, producto in enumerate(productos):
+            cobertura = columnas["dias_cobertura"][posicion]
+            documentos.append({
+                "_id": str(producto["_id"]),
+                "sku": producto.get("sku"),
+                "nombre": producto.get("nombre"),
+                "disponible": int(disponibles[posicion]),
+                "stock_minimo": producto.get("stock_minimo", 0),
+                "velocidad": round(columnas["velocidad"][posicion], 3),
+                "velocidad_reciente": round(columnas["velocidad_reciente"][posicion], 3),
+                "desviacion": round(columnas["desviacion"][posicion], 3),
+                "dias_con_venta": columnas["dias_con_venta"][posicion],
+                "stock_seguridad": int(columnas["stock_seguridad"][posicion]),
+                "punto_pedido": int(columnas["punto_pedido"][posicion]),
+                "cantidad_sugerida": int(columnas["cantidad_sugerida"][posicion]),
+                "dias_cobertura": None if math.isnan(cobertura) else round(cobertura, 1),
+                "reponer": columnas["reponer"][posicion],
+                "calculo_id": calculo_id,
+                "fecha_calculo": ahora,
+            })
+        calculo = {
+            "_id": calculo_id,
+            "fecha": ahora,
+            "desde": inicio,
+            "hasta": fin,
+            "dias": self.calculadora.dias,
+            "productos": len(productos),
+            "filas_venta": len(indices),
+            "a_reponer": int(resultado["reponer"].sum()),
+            "unidades_sugeridas": int(resultado["cantidad_sugerida"].sum()),
+            "segundos_lectura": round(lectura, 3),
+            "segundos_calculo": round(calculo_reloj, 3),
+        }
+        self.repositorio.guardar(calculo, documentos)
+        calculo["segundos_total"] = round(time.perf_counter() - inicio_reloj, 3)
+        logger.info(
+            "Reposición calculada: %s productos, %s a reponer en %.2fs (cálculo %.3fs)",
+            calculo["productos"], calculo["a_reponer"], calculo["segundos_total"], calculo_reloj
+        )
+        return calculo
+
+    async def calcular(self) -> dict:
+        """Un cálculo a la vez por worker; se ejecuta en un hilo para no bloquear el event loop"""
+        async with self._bloqueo:
+            return await asyncio.to_thread(self._calcular)
+
+    async def _bucle(self):
+        while True:
+            try:
+                # Con varios workers, el primero que calcula ahorra el trabajo a los demás
+                ultimo = await asyncio.to_thread(self.repositorio.ultimo_calculo)
+                if ultimo is None or datetime.now() - ultimo["fecha"] >= timedelta(seconds=self.intervalo):
+                    await self.calcular()
+            except Exception as e:
+                logger.error("Error calculando sugerencias de reposición: %s", e)
+            await asyncio.sleep(self.intervalo)
+
+    async def iniciar(self):
+        if self.intervalo > 0 and self._tarea is None:
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
@@ -2,17 +2,35 @@
 Servicio de reportes - PATRON STRATEGY para diferentes tipos de reportes
 """
 
-from pymongo import MongoClient
 from datetime import datetime, timedelta
 from configuracion import configuration
+from comun.mongo import obtener_cliente
 from modelos import ReporteVentas, ReporteInventario
 
+# Proyecciones de lectura: solo se decodifican los campos que usa cada reporte
+PROYECCION_VENTAS = {
+    "total": 1,
+    "fecha_creacion": 1,
+    "items.producto_id": 1,
+    "items.nombre": 1,
+    "items.cantidad": 1,
+    "items.subtotal": 1,
+}
+PROYECCION_INVENTARIO = {
+    "nombre": 1,
+    "sku": 1,
+    "precio": 1,
+    "stock": 1,
+    "stock_minimo": 1,
+}
+
 class ReporteService:
     """PATRON STRATEGY: Diferentes estrategias para generar reportes"""
     
     def __init__(self):
-        self.client = MongoClient(configuration.MONGODB_URL)
+        self.client = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
         self.db = self.client[configuration.BASE_DATOS]
+        self.proyectar = configuration.MONGODB_LECTURA_PROYECTADA
     
     async def generar_reporte_ventas(self, fecha_inicio: datetime, fecha_fin: datetime) -> ReporteVentas:
         """STRATEGY: Genera reporte de ventas"""
@@ -25,32 +43,27 @@ class ReporteService:
                 "$lte": fecha_fin
             },
             "estado": "completada"
-        }))
+        }, PROYECCION_VENTAS if self.proyectar else None))
         
         total_ventas = sum(venta["total"] for venta in ventas)
         cantidad_ventas = len(ventas)
         
         # Ventas por día - PATRON ITERATOR
+        # Se agrupan las ventas ya leídas en vez de volver a consultar cada día
         ventas_por_dia = []
         current_date = fecha_inicio
         while current_date <= fecha_fin:
-            next_date = current_date + timedelta(days=1)
-            ventas_dia = list(ventas_collection.find({
-                "fecha_creacion": {
-                    "$gte": current_date,
-                    "$lt": next_date
-                },
-                "estado": "completada"
-            }))
-            
-            total_dia = sum(venta["total"] for venta in ventas_dia)
             ventas_por_dia.append({
                 "fecha": current_date.strftime("%Y-%m-%d"),
-                "total": total_dia,
-                "cantidad": len(ventas_dia)
+                "total": 0,
+                "cantidad": 0
             })
-            
-            current_date = next_date
+            current_date += timedelta(days=1)
+        
+        for venta in ventas:
+            dia = ventas_por_dia[(venta["fecha_creacion"] - fecha_inicio) // timedelta(days=1)]
+            dia["total"] += venta["total"]
+            dia["cantidad"] += 1
         
         # Productos más vendidos - PATRON AGGREGATE
         productos_vendidos = {}
@@ -83,7 +96,10 @@ class ReporteService:
         """STRATEGY: Genera reporte de inventario"""
         productos_collection = self.db["productos"]
         
-        productos = list(productos_collection.find({"activo": True}))
+        productos = list(productos_collection.find(
+            {"activo": True},
+            PROYECCION_INVENTARIO if self.proyectar else None
+        ))
         total_productos = len(productos)
         
         productos_stock_bajo = []
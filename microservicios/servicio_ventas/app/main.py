@@ -3,17 +3,24 @@ Servicio de Ventas - PATRON MVC + GOF
 """
 
 from fastapi import FastAPI, HTTPException, Depends, status, Header
-from pymongo import MongoClient
 from bson import ObjectId
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 import logging
 from configuracion import configuration
+from comun.arranque import CalentadorArranque
+from comun.campos import seleccion_campos
+from comun.mongo import obtener_cliente, precalentar_pool, proyeccion_modelo
+from comun.paginacion import codificar_cursor, decodificar_cursor, id_de_cursor
+from comun.perfilador import registrar_perfilador
+from comun.registro import configurar_logging, registrar_metricas_logging
+from comun.serializacion import AdaptadorRespuesta
+from comun.sondas import ProbadorSalud, registrar_sondas, verificacion_mongo
 from modelos import VentaCrear, Venta, VentaResponse, EstadoVenta
 from servicios import ProductoService, InventarioService
 from repositorio import VentaRepository
 
-logging.basicConfig(level=logging.INFO)
+configurar_logging("ventas")
 logger = logging.getLogger(__name__)
 
 # PATRON MVC - Controller principal
@@ -22,15 +29,41 @@ app = FastAPI(
     description="Microservicio para gestión de ventas",
     version="1.0.0"
 )
+registrar_metricas_logging(app)
+registrar_perfilador(app)
+
+# PATRON ADAPTER: Serializadores precompilados para las respuestas
+adaptador_venta = AdaptadorRespuesta(Venta)
+adaptador_lista_ventas = AdaptadorRespuesta(List[Venta])
+adaptador_venta_response = AdaptadorRespuesta(VentaResponse)
 
 # PATRON DEPENDENCY INJECTION
 def get_database():
-    client = MongoClient(configuration.MONGODB_URL)
+    client = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
     return client[configuration.BASE_DATOS]
 
+# Proyección de lectura: solo se decodifican los campos del modelo Venta
+PROYECCION_VENTA = proyeccion_modelo(Venta) if configuration.MONGODB_LECTURA_PROYECTADA else None
+
+# Sondas de salud: verificación en segundo plano sobre el cliente compartido
+cliente_mongo = obtener_cliente(configuration.MONGODB_URL, configuration.MONGODB_COMPRESORES)
+probador_salud = ProbadorSalud("Ventas", configuration.SONDA_INTERVALO)
+probador_salud.agregar_verificacion("mongodb", verificacion_mongo(cliente_mongo))
+
+# Calentamiento de arranque: la readiness no pasa a listo hasta completarlo
+calentador = CalentadorArranque("Ventas")
+calentador.agregar_fase(
+    "mongodb_pool",
+    lambda: precalentar_pool(cliente_mongo, configuration.MONGODB_CONEXIONES_INICIALES)
+)
+calentador.agregar_fase("openapi", app.openapi)
+registrar_sondas(app, probador_salud, calentador)
+
 def get_venta_repository():
     db = get_database()
-    return VentaRepository(db)
+    return VentaRepository(db, PROYECCION_VENTA)
+
+calentador.agregar_fase("indices", get_venta_repository().crear_indices)
 
 def obtener_token_autorizacion(authorization: str = Header(None)):
     """PATRON STRATEGY: Extrae token de autorización"""
@@ -63,7 +96,7 @@ async def crear_venta(
     """PATRON MVC - Controller: Endpoint para crear venta"""
     token = obtener_token_autorizacion(authorization)
     
-    # Validar productos y stock - PATRON FACADE: interfaz simple para validación compleja
+    # Validar productos - PATRON FACADE: interfaz simple para validación compleja
     for item in venta.items:
         producto = await ProductoService.obtener_producto(item.producto_id, token)
         if not producto:
@@ -71,58 +104,91 @@ async def crear_venta(
                 status_code=400,
                 detail=f"Producto {item.producto_id} no encontrado"
             )
-        
-        if producto["stock"] < item.cantidad:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Stock insuficiente para {producto['nombre']}"
-            )
     
-    # PATRON FACTORY: Crear venta
+    # PATRON ADAPTER: el stock de todas las líneas se retiene en una sola
+    # reserva (todo o nada) en lugar de una operación por línea
+    reserva_id = await InventarioService.reservar(
+        [{"producto_id": item.producto_id, "cantidad": item.cantidad} for item in venta.items],
+        token
+    )
+    if reserva_id is None:
+        raise HTTPException(status_code=503, detail="Servicio de inventario no disponible")
+    
+    # PATRON FACTORY: Crear venta; queda pendiente hasta confirmar el descuento de stock
     venta_data = venta.dict()
     venta_data["fecha_creacion"] = datetime.now()
     venta_data["vendedor"] = "Sistema"  # En producción, obtener del token
-    venta_data["estado"] = EstadoVenta.COMPLETADA
+    venta_data["estado"] = EstadoVenta.PENDIENTE
+    venta_data["reserva_id"] = reserva_id
     
-    venta_id = await repo.crear(venta_data)
-    venta_creada = await repo.obtener_por_id(venta_id)
+    try:
+        venta_id = await repo.crear(venta_data)
+    except Exception:
+        await InventarioService.liberar_reserva(reserva_id, token)
+        raise
     
-    # Actualizar inventario - PATRON ADAPTER: comunicación con otros servicios
-    for item in venta.items:
-        success = await InventarioService.actualizar_stock(
-            item.producto_id, 
-            item.cantidad, 
-            token
-        )
-        if not success:
-            logger.warning(f"No se pudo actualizar stock para producto {item.producto_id}")
+    # PATRON STATE: la venta solo se completa si el stock se descontó
+    confirmada = await InventarioService.confirmar_reserva(reserva_id, token)
+    if not confirmada and not await InventarioService.liberar_reserva(reserva_id, token):
+        # Sin liberación, la confirmación pudo aplicarse sin que llegara la respuesta
+        confirmada = await InventarioService.estado_reserva(reserva_id, token) in ("confirmada", "confirmando")
+    if not confirmada:
+        await repo.cambiar_estado(venta_id, EstadoVenta.CANCELADA)
+        logger.error("Venta %s cancelada: no se pudo confirmar la reserva %s", venta_id, reserva_id)
+        raise HTTPException(status_code=503, detail="No se pudo confirmar el stock de la venta")
+    venta_creada = await repo.cambiar_estado(venta_id, EstadoVenta.COMPLETADA)
     
-    return VentaResponse(
-        venta=Venta(**venta_creada),
-        mensaje="Venta procesada exitosamente"
+    return adaptador_venta_response.respuesta(
+        {"venta": venta_creada, "mensaje": "Venta procesada exitosamente"},
+        status.HTTP_201_CREATED
     )
 
 @app.get("/api/v1/ventas", response_model=List[Venta])
 async def listar_ventas(
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     repo: VentaRepository = Depends(get_venta_repository)
 ):
-    """PATRON MVC - Controller: Endpoint para listar ventas"""
-    ventas = await repo.listar_todas(skip, limit)
-    return [Venta(**venta) for venta in ventas]
+    """
+    PATRON MVC - Controller: Endpoint para listar ventas
+    Paginación por cursor: la cabecera X-Siguiente-Cursor trae el valor de
+    `cursor` para la página siguiente; `skip` se mantiene por compatibilidad
+    fields=id,total,fecha_creacion limita los campos leídos de Mongo y devueltos
+    """
+    # fecha_creacion hace falta para construir el cursor de la página siguiente
+    seleccion = seleccion_campos(Venta, fields, ("fecha_creacion",))
+    antes_de = None
+    if cursor:
+        try:
+            valores = decodificar_cursor(cursor)
+            antes_de = (datetime.fromisoformat(valores["f"]), id_de_cursor(valores))
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    
+    ventas = await repo.listar_todas(skip, limit, antes_de, seleccion.proyeccion if seleccion else None)
+    headers = {}
+    if ventas and len(ventas) == limit:
+        ultima = ventas[-1]
+        headers["X-Siguiente-Cursor"] = codificar_cursor({"f": ultima["fecha_creacion"], "id": ultima["_id"]})
+    adaptador = seleccion.adaptador_lista if seleccion else adaptador_lista_ventas
+    return adaptador.respuesta(ventas, headers=headers)
 
 @app.get("/api/v1/ventas/{venta_id}", response_model=Venta)
 async def obtener_venta(
     venta_id: str,
+    fields: Optional[str] = None,
     repo: VentaRepository = Depends(get_venta_repository)
 ):
     """PATRON MVC - Controller: Endpoint para obtener venta específica"""
-    venta = await repo.obtener_por_id(venta_id)
+    seleccion = seleccion_campos(Venta, fields)
+    venta = await repo.obtener_por_id(venta_id, seleccion.proyeccion if seleccion else None)
     if not venta:
         raise HTTPException(status_code=404, detail="Venta no encontrada")
-    return Venta(**venta)
+    adaptador = seleccion.adaptador if seleccion else adaptador_venta
+    return adaptador.respuesta(venta)
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    from comun.lanzador import ejecutar
+    ejecutar("main:app")
\ No newline at end of file
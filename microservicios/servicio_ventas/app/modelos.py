@@ -2,10 +2,11 @@
 Modelos de ventas - PATRON MVC Model Layer
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, AliasChoices
 from typing import List
 from datetime import datetime
 from enum import Enum
+from comun.serializacion import IdMongo
 
 class EstadoVenta(str, Enum):
     """PATRON STRATEGY: Estados como estrategias de flujo"""
@@ -33,7 +34,7 @@ class VentaCrear(VentaBase):
 
 class Venta(VentaBase):
     """Modelo completo de venta - PATRON DOMAIN MODEL"""
-    id: str = Field(..., description="ID único de la venta")
+    id: IdMongo = Field(..., validation_alias=AliasChoices("id", "_id"), description="ID único de la venta")
     fecha_creacion: datetime = Field(..., description="Fecha de creación")
     vendedor: str = Field(..., description="Nombre del vendedor")
     estado: EstadoVenta = Field(..., description="Estado de la venta")
@@ -2,29 +2,60 @@
 Repositorio de ventas - PATRON REPOSITORY
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, DESCENDING, ReturnDocument
 from bson import ObjectId
+from typing import Optional
 from configuracion import configuration
 
 class VentaRepository:
     """Repository Pattern: Abstrae operaciones de ventas en MongoDB"""
     
-    def __init__(self, database):
+    def __init__(self, database, proyeccion: dict = None):
         self.collection = database[configuration.COLECCION_VENTAS]
+        self.proyeccion = proyeccion
     
     async def crear(self, venta_data: dict) -> str:
         result = self.collection.insert_one(venta_data)
         return str(result.inserted_id)
     
-    async def obtener_por_id(self, venta_id: str):
+    async def cambiar_estado(self, venta_id: str, estado: str) -> Optional[dict]:
+        """Cambia el estado y devuelve la venta ya actualizada en el mismo viaje"""
+        return self.collection.find_one_and_update(
+            {"_id": ObjectId(venta_id)},
+            {"$set": {"estado": estado}},
+            projection=self.proyeccion,
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def obtener_por_id(self, venta_id: str, proyeccion: dict = None):
         if not ObjectId.is_valid(venta_id):
             return None
-        return self.collection.find_one({"_id": ObjectId(venta_id)})
+        return self.collection.find_one({"_id": ObjectId(venta_id)}, proyeccion or self.proyeccion)
     
-    async def listar_todas(self, skip: int = 0, limit: int = 10):
-        cursor = self.collection.find().sort("fecha_creacion", -1).skip(skip).limit(limit)
+    async def listar_todas(self, skip: int = 0, limit: int = 10, antes_de: tuple = None, proyeccion: dict = None):
+        """
+        Lista de la más reciente a la más antigua; _id desempata ventas con la
+        misma fecha. Con antes_de (fecha, _id) pagina por keyset en vez de skip
+        """
+        filtro = {}
+        if antes_de is not None:
+            fecha, venta_id = antes_de
+            filtro = {"$or": [
+                {"fecha_creacion": {"$lt": fecha}},
+                {"fecha_creacion": fecha, "_id": {"$lt": venta_id}},
+            ]}
+        cursor = (
+            self.collection.find(filtro, proyeccion or self.proyeccion)
+            .sort([("fecha_creacion", DESCENDING), ("_id", DESCENDING)])
+            .skip(skip)
+            .limit(limit)
+        )
         return list(cursor)
     
+    async def crear_indices(self):
+        """Índice que sigue el orden del listado paginado"""
+        self.collection.create_index([("fecha_creacion", DESCENDING), ("_id", DESCENDING)])
+    
     async def obtener_por_fecha(self, fecha_inicio, fecha_fin):
         cursor = self.collection.find({
             "fecha_creacion": {
@@ -2,10 +2,15 @@
 Servicios externos - PATRON ADAPTER para comunicación entre microservicios
 """
 
+import asyncio
 import httpx
+import logging
+from typing import Any, Dict, List, Optional
 from fastapi import HTTPException
 from configuracion import configuration
 
+logger = logging.getLogger(__name__)
+
 class ProductoService:
     """PATRON ADAPTER: Adapta comunicación con servicio de productos"""
     
@@ -27,34 +32,96 @@ class ProductoService:
                 else:
                     return None
             except Exception as e:
-                print(f"Error obteniendo producto: {e}")
+                logger.error("Error obteniendo producto: %s", e)
                 return None
 
 class InventarioService:
     """PATRON ADAPTER: Adapta comunicación con servicio de inventario"""
     
     @staticmethod
-    async def actualizar_stock(producto_id: str, cantidad: int, token: str = None):
+    async def reservar(lineas: List[Dict[str, Any]], token: str = None) -> Optional[str]:
+        """
+        Retiene el stock de todas las líneas en una sola llamada
+        Devuelve el id de la reserva; 400 con las líneas sin stock; None si
+        el servicio de inventario no responde
+        """
         headers = {}
         if token:
             headers["Authorization"] = f"Bearer {token}"
         
         async with httpx.AsyncClient() as client:
             try:
-                # Obtener producto actual
-                producto = await ProductoService.obtener_producto(producto_id, token)
-                if not producto:
-                    return False
-                
-                nuevo_stock = producto["stock"] - cantidad
-                
-                response = await client.put(
-                    f"{configuration.INVENTORY_SERVICE_URL}/api/v1/productos/{producto_id}",
+                response = await client.post(
+                    f"{configuration.INVENTORY_SERVICE_URL}/api/v1/reservas",
                     headers=headers,
-                    json={"stock": nuevo_stock},
+                    json={"lineas": lineas},
                     timeout=30.0
                 )
-                return response.status_code == 200
             except Exception as e:
-                print(f"Error actualizando stock: {e}")
-                return False
\ No newline at end of file
+                logger.error("Error reservando stock: %s", e)
+                return None
+        if response.status_code == 201:
+            return response.json()["id"]
+        if response.status_code in (400, 409):
+            raise HTTPException(status_code=400, detail=response.json().get("detail"))
+        logger.error("Reserva de stock rechazada (%s): %s", response.status_code, response.text)
+        return None
+    
+    @staticmethod
+    async def _cerrar_reserva(reserva_id: str, accion: str, token: str = None) -> Optional[int]:
+        """Código de estado de la respuesta; None si el servicio de inventario no responde"""
+        headers = {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.post(
+                    f"{configuration.INVENTORY_SERVICE_URL}/api/v1/reservas/{reserva_id}/{accion}",
+                    headers=headers,
+                    timeout=30.0
+                )
+                return response.status_code
+            except Exception as e:
+                logger.error("Error al %s la reserva %s: %s", accion, reserva_id, e)
+                return None
+    
+    @staticmethod
+    async def confirmar_reserva(reserva_id: str, token: str = None) -> bool:
+        """
+        Descuenta el stock retenido. Confirmar es idempotente en inventario,
+        así que se reintenta si no hay respuesta o hay un error del servidor;
+        un 409 (reserva caducada o liberada) es definitivo
+        """
+        for intento in range(configuration.RESERVA_CONFIRMAR_INTENTOS):
+            if intento:
+                await asyncio.sleep(configuration.RESERVA_CONFIRMAR_ESPERA * intento)
+            codigo = await InventarioService._cerrar_reserva(reserva_id, "confirmar", token)
+            if codigo == 200:
+                return True
+            if codigo is not None and codigo < 500:
+                break
+        return False
+    
+    @staticmethod
+    async def liberar_reserva(reserva_id: str, token: str = None) -> bool:
+        """Devuelve el stock retenido al disponible; idempotente"""
+        return await InventarioService._cerrar_reserva(reserva_id, "liberar", token) == 200
+    
+    @staticmethod
+    async def estado_reserva(reserva_id: str, token: str = None) -> Optional[str]:
+        headers = {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.get(
+                    f"{configuration.INVENTORY_SERVICE_URL}/api/v1/reservas/{reserva_id}",
+                    headers=headers,
+                    timeout=30.0
+                )
+            except Exception as e:
+                logger.error("Error consultando la reserva %s: %s", reserva_id, e)
+                return None
+        return response.json()["estado"] if response.status_code == 200 else None
@@ -0,0 +1 @@
+# Paquete comun compartido por los microservicios
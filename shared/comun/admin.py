@@ -0,0 +1,42 @@
+"""
+Endpoints de administración - PATRON PROXY
+Las rutas /admin/* exponen el estado interno del worker (perfiles, coste
+del logging, arranque, colas, cachés). Solo se registran con su
+funcionalidad activa y un token privilegiado definido (PERFIL_TOKEN, el
+mismo del perfilado), y cada llamada debe traerlo en la cabecera
+X-Admin-Token. Los datos son del worker que atiende la petición: con
+varios workers, una llamada muestra solo uno (el campo `worker` dice cuál)
+"""
+
+import os
+import secrets
+from typing import Callable, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, status
+
+def token_admin() -> str:
+    return os.getenv("PERFIL_TOKEN", "")
+
+def admin_habilitado() -> bool:
+    return bool(token_admin())
+
+async def verificar_token_admin(x_admin_token: Optional[str] = Header(None)):
+    token = token_admin()
+    if not token or not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), token.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de administración no válido")
+
+def ruta_admin(app: FastAPI, ruta: str, activa: bool = True, **opciones) -> Callable:
+    """
+    Decorador: registra la función como GET protegido en `ruta`, o no
+    registra nada si la funcionalidad está apagada o no hay token
+    """
+    def decorador(funcion: Callable) -> Callable:
+        if activa and admin_habilitado():
+            app.get(
+                ruta, tags=["admin"], dependencies=[Depends(verificar_token_admin)], **opciones
+            )(funcion)
+        return funcion
+    return decorador
+
+def con_worker(datos: dict) -> dict:
+    """Identifica el worker que respondió: cada uno tiene sus propios datos"""
+    return {"worker": os.getpid(), **datos}
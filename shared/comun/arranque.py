@@ -0,0 +1,74 @@
+"""
+Calentamiento de arranque - PATRON TEMPLATE METHOD
+Ejecuta fases de calentamiento (pools, modelos, OpenAPI, cachés) antes de
+que el worker se declare listo y mide cuánto tarda cada una
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _edad_proceso() -> Optional[float]:
+    """Segundos desde que arrancó el proceso (solo Linux, vía /proc)"""
+    try:
+        with open(f"/proc/{os.getpid()}/stat") as archivo:
+            inicio_ticks = int(archivo.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as archivo:
+            uptime = float(archivo.read().split()[0])
+        return uptime - inicio_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class CalentadorArranque:
+    """Registra fases de calentamiento y genera el desglose de tiempos"""
+
+    def __init__(self, servicio: str):
+        self.servicio = servicio
+        self._fases: List[Tuple[str, Callable[[], Any]]] = []
+        self._informe: Dict[str, Any] = {}
+        self.completado = False
+
+    def agregar_fase(self, nombre: str, fase: Callable[[], Any]):
+        """Registra una fase; puede ser una corrutina o una función bloqueante"""
+        self._fases.append((nombre, fase))
+
+    async def _ejecutar_fase(self, fase: Callable[[], Any]):
+        if asyncio.iscoroutinefunction(fase):
+            await fase()
+        else:
+            await asyncio.to_thread(fase)
+
+    async def ejecutar(self):
+        """Ejecuta las fases en orden; un fallo se registra pero no impide arrancar"""
+        edad = _edad_proceso()
+        fases: Dict[str, Any] = {}
+        inicio_total = time.perf_counter()
+        for nombre, fase in self._fases:
+            inicio = time.perf_counter()
+            try:
+                await self._ejecutar_fase(fase)
+                fases[nombre] = {"ms": round((time.perf_counter() - inicio) * 1000, 2)}
+            except Exception as e:
+                logger.error("Fase de calentamiento %s falló: %s", nombre, e)
+                fases[nombre] = {"ms": round((time.perf_counter() - inicio) * 1000, 2), "error": str(e)}
+        total = time.perf_counter() - inicio_total
+
+        self._informe = {
+            "servicio": self.servicio,
+            "worker": os.getpid(),
+            "hasta_calentamiento_ms": round(edad * 1000, 2) if edad is not None else None,
+            "calentamiento_ms": round(total * 1000, 2),
+            "fases": fases,
+        }
+        self.completado = True
+        logger.info(
+            "Arranque de %s completado: calentamiento %.1f ms",
+            self.servicio, total * 1000, extra={"arranque": self._informe}
+        )
+
+    def informe(self) -> Dict[str, Any]:
+        return self._informe
@@ -0,0 +1,67 @@
+"""
+Caché LRU en proceso - PATRON PROXY
+Guarda las lecturas más frecuentes delante de MongoDB con capacidad
+acotada y caducidad opcional. El escritor invalida sus propias claves; lo
+que escriben otros workers o servicios solo se detecta si el valor guarda
+la versión de la colección con que se leyó (VersionColeccion) y se compara
+al leer: la caducidad sola deja servir datos viejos hasta que vence
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class CacheLRU:
+    """Diccionario ordenado por uso: un acierto mueve la clave al final, se expulsa la del principio"""
+
+    def __init__(self, capacidad: int, ttl: float = 0.0):
+        self.capacidad = capacidad
+        # Segundos de validez de cada entrada; 0 = solo se expulsa por capacidad
+        self.ttl = ttl
+        self._entradas: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self.fallos += 1
+            return None
+        caduca, valor = entrada
+        if caduca and caduca < time.monotonic():
+            del self._entradas[clave]
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return valor
+
+    def guardar(self, clave: Hashable, valor: Any):
+        if self.capacidad <= 0:
+            return
+        caduca = time.monotonic() + self.ttl if self.ttl > 0 else 0.0
+        self._entradas[clave] = (caduca, valor)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.capacidad:
+            self._entradas.popitem(last=False)
+            self.expulsiones += 1
+
+    def invalidar(self, *claves: Hashable):
+        for clave in claves:
+            self._entradas.pop(clave, None)
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._entradas),
+            "capacidad": self.capacidad,
+            "ttl_segundos": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "expulsiones": self.expulsiones,
+            "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else None,
+        }
@@ -0,0 +1,51 @@
+"""
+Campos parciales (sparse fieldsets) - PATRON PROTOTYPE
+Traduce el parámetro fields=a,b,c en una proyección de Mongo y en un modelo
+de respuesta parcial derivado del modelo completo, cacheados por combinación
+"""
+
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple, Type
+from fastapi import HTTPException, status
+from pydantic import BaseModel, create_model
+from comun.serializacion import AdaptadorRespuesta
+
+class SeleccionCampos:
+    """Proyección y adaptadores para un subconjunto de campos de un modelo"""
+
+    def __init__(self, modelo: Type[BaseModel], campos: Tuple[str, ...], obligatorios: Tuple[str, ...]):
+        self.campos = campos
+        parcial = create_model(
+            f"{modelo.__name__}Parcial",
+            **{nombre: (modelo.model_fields[nombre].annotation, modelo.model_fields[nombre]) for nombre in campos}
+        )
+        self.adaptador = AdaptadorRespuesta(parcial)
+        self.adaptador_lista = AdaptadorRespuesta(List[parcial])
+        # _id siempre viaja; los obligatorios los necesita la lógica de negocio
+        self.proyeccion = {"_id": 1, **{nombre: 1 for nombre in (*campos, *obligatorios) if nombre != "id"}}
+
+@lru_cache(maxsize=128)
+def _seleccion(modelo: Type[BaseModel], campos: Tuple[str, ...], obligatorios: Tuple[str, ...]) -> SeleccionCampos:
+    return SeleccionCampos(modelo, campos, obligatorios)
+
+def seleccion_campos(
+    modelo: Type[BaseModel],
+    fields: Optional[str],
+    obligatorios: Iterable[str] = ()
+) -> Optional[SeleccionCampos]:
+    """
+    Interpreta fields=a,b,c contra los campos del modelo
+    Devuelve None si no se pidieron campos; 400 si alguno no existe
+    """
+    if not fields:
+        return None
+    pedidos = {nombre.strip() for nombre in fields.split(",") if nombre.strip()}
+    desconocidos = sorted(pedidos - set(modelo.model_fields))
+    # Orden del modelo: la misma combinación reutiliza la misma entrada de caché
+    campos = tuple(nombre for nombre in modelo.model_fields if nombre in pedidos)
+    if desconocidos or not campos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos no válidos: {', '.join(desconocidos) or fields}"
+        )
+    return _seleccion(modelo, campos, tuple(obligatorios))
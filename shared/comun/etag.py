@@ -0,0 +1,83 @@
+"""
+ETags y peticiones condicionales - PATRON PROXY
+ETag fuerte por documento a partir de su contador `version` y por
+colección a partir de un contador global; If-None-Match responde 304 sin
+serializar e If-Match permite concurrencia optimista sin leer antes de
+escribir
+"""
+
+import re
+import zlib
+from typing import Iterable, List, Optional
+from fastapi import status
+from fastapi.responses import Response
+
+# Colección con un documento {_id: <colección>, version: n} por colección versionada
+COLECCION_VERSIONES = "versiones"
+
+_VERSION = re.compile(r'^"v(\d+)(?:-[0-9a-f]{8})?"$')
+
+def _sufijo(campos: Optional[Iterable[str]]) -> str:
+    """Una respuesta parcial (fields=) es otra representación: otra ETag"""
+    if not campos:
+        return ""
+    return f"-{zlib.crc32(','.join(campos).encode()):08x}"
+
+def etag_documento(version: Optional[int], campos: Optional[Iterable[str]] = None) -> str:
+    """Documentos anteriores al contador se tratan como versión 0"""
+    return f'"v{version or 0}{_sufijo(campos)}"'
+
+def etag_coleccion(version: int, campos: Optional[Iterable[str]] = None) -> str:
+    return f'"c{version}{_sufijo(campos)}"'
+
+def _etiquetas(cabecera: str) -> List[str]:
+    return [etiqueta.strip() for etiqueta in cabecera.split(",") if etiqueta.strip()]
+
+def coincide(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110): el prefijo W/ no cuenta"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(etiqueta.removeprefix("W/") == etag for etiqueta in _etiquetas(if_none_match))
+
+def condicion_if_match(if_match: Optional[str]) -> Optional[dict]:
+    """
+    Filtro de MongoDB equivalente a If-Match (comparación fuerte):
+    None sin cabecera, {} para "*" y {"version": {"$in": [...]}} si no.
+    Etiquetas débiles o ajenas no casan con nada, como exige la RFC
+    """
+    if if_match is None:
+        return None
+    if if_match.strip() == "*":
+        return {}
+    versiones: List[Optional[int]] = []
+    for etiqueta in _etiquetas(if_match):
+        coincidencia = _VERSION.match(etiqueta)
+        if coincidencia:
+            versiones.append(int(coincidencia.group(1)))
+    if 0 in versiones:
+        # La versión 0 es la de los documentos sin el campo
+        versiones.append(None)
+    return {"version": {"$in": versiones}}
+
+def no_modificado(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+class VersionColeccion:
+    """
+    Contador global de cambios de una colección, compartido por todos los
+    workers y servicios que escriben en ella. Se incrementa después de cada
+    escritura: quien lea la versión nueva ya puede ver el cambio
+    """
+
+    def __init__(self, coleccion):
+        self.nombre = coleccion.name
+        self.versiones = coleccion.database[COLECCION_VERSIONES]
+
+    def incrementar(self):
+        self.versiones.update_one({"_id": self.nombre}, {"$inc": {"version": 1}}, upsert=True)
+
+    def actual(self) -> int:
+        documento = self.versiones.find_one({"_id": self.nombre})
+        return documento["version"] if documento else 0
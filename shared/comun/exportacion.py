@@ -0,0 +1,86 @@
+"""
+Exportación en streaming - PATRON ITERATOR
+Recorre un cursor de MongoDB por lotes y emite NDJSON o CSV trozo a trozo:
+la memoria usada depende del tamaño de lote, no del total exportado
+"""
+
+import csv
+import io
+import json
+from typing import Any, Iterator, List, Sequence
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from comun.serializacion import AdaptadorRespuesta
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+def validar_formato(formato: str):
+    if formato not in FORMATOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato no soportado: {formato} (use {' o '.join(FORMATOS)})"
+        )
+
+def _por_lotes(cursor, tamano: int) -> Iterator[List[dict]]:
+    """Agrupa el cursor en lotes; el cursor se cierra aunque el cliente corte"""
+    lote: List[dict] = []
+    try:
+        for documento in cursor:
+            lote.append(documento)
+            if len(lote) >= tamano:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+    finally:
+        cursor.close()
+
+def _ndjson(cursor, adaptador: AdaptadorRespuesta, tamano: int) -> Iterator[bytes]:
+    for lote in _por_lotes(cursor, tamano):
+        yield b"".join(adaptador.serializar(documento) + b"\n" for documento in lote)
+
+def _celda(valor: Any) -> Any:
+    """Las listas y objetos anidados van como JSON dentro de la celda"""
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False)
+    return valor
+
+def _csv(cursor, adaptador: AdaptadorRespuesta, columnas: Sequence[str], tamano: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(columnas)
+    yield buffer.getvalue().encode()
+    for lote in _por_lotes(cursor, tamano):
+        buffer.seek(0)
+        buffer.truncate()
+        for documento in lote:
+            datos = adaptador.a_python(documento)
+            escritor.writerow([_celda(datos.get(columna)) for columna in columnas])
+        yield buffer.getvalue().encode()
+
+def respuesta_exportacion(
+    cursor,
+    adaptador: AdaptadorRespuesta,
+    columnas: Sequence[str],
+    formato: str,
+    tamano: int,
+    nombre: str
+) -> StreamingResponse:
+    """
+    Respuesta en streaming a partir de un cursor de MongoDB
+    El generador es síncrono: Starlette lo itera en el threadpool, así que
+    las lecturas bloqueantes del cursor no ocupan el event loop
+    """
+    validar_formato(formato)
+    if formato == "csv":
+        contenido = _csv(cursor, adaptador, columnas, tamano)
+    else:
+        contenido = _ndjson(cursor, adaptador, tamano)
+    return StreamingResponse(
+        contenido,
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'}
+    )
@@ -0,0 +1,192 @@
+"""
+Facetas del catálogo - PATRON OBSERVER
+Contadores por categoría (productos activos, suma, mínimo y máximo de
+precio) que se mantienen con cada escritura de productos, de modo que la
+pantalla de navegación los lee sin recorrer la colección. Cada escritura
+aporta la diferencia entre el documento anterior y el nuevo; un recálculo
+completo periódico corrige lo que se escape (escrituras concurrentes con
+el recálculo, cambios hechos fuera de los servicios)
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Colección con un documento {_id: <categoría>, total, suma_precio, precio_min, precio_max}
+COLECCION_FACETAS = "facetas_productos"
+# Lo que hace falta leer de un producto para saber su aporte a las facetas
+CAMPOS_FACETA = {"categoria": 1, "precio": 1, "activo": 1}
+
+def _aporte(producto: Optional[dict]) -> Optional[Tuple[str, float]]:
+    """(categoría, precio) con que cuenta un producto; None si no cuenta"""
+    if not producto or not producto.get("activo") or producto.get("categoria") is None:
+        return None
+    categoria = producto["categoria"]
+    # Los Enum de categoría no tienen el mismo hash que su valor
+    return getattr(categoria, "value", categoria), producto.get("precio", 0)
+
+class FacetasProductos:
+    """Contadores por categoría de una colección de productos"""
+
+    def __init__(self, productos):
+        self.productos = productos
+        self.facetas = productos.database[COLECCION_FACETAS]
+
+    def registrar(self, antes: Optional[dict], despues: Optional[dict]):
+        self.registrar_varios([(antes, despues)])
+
+    def registrar_varios(self, cambios: Iterable[Tuple[Optional[dict], Optional[dict]]]):
+        """Aplica los cambios (documento anterior, documento nuevo); None = no existía / ya no cuenta"""
+        deltas: Dict[str, Dict[str, Any]] = {}
+        for antes, despues in cambios:
+            anterior, nuevo = _aporte(antes), _aporte(despues)
+            if anterior == nuevo:
+                continue
+            if anterior is not None:
+                delta = deltas.setdefault(anterior[0], {"total": 0, "suma": 0.0, "altas": [], "bajas": []})
+                delta["total"] -= 1
+                delta["suma"] -= anterior[1]
+                delta["bajas"].append(anterior[1])
+            if nuevo is not None:
+                delta = deltas.setdefault(nuevo[0], {"total": 0, "suma": 0.0, "altas": [], "bajas": []})
+                delta["total"] += 1
+                delta["suma"] += nuevo[1]
+                delta["altas"].append(nuevo[1])
+
+        for categoria, delta in deltas.items():
+            actualizacion: Dict[str, Any] = {"$inc": {"total": delta["total"], "suma_precio": delta["suma"]}}
+            if delta["altas"]:
+                actualizacion["$min"] = {"precio_min": min(delta["altas"])}
+                actualizacion["$max"] = {"precio_max": max(delta["altas"])}
+            faceta = self.facetas.find_one_and_update(
+                {"_id": categoria}, actualizacion, upsert=True, return_document=ReturnDocument.AFTER
+            )
+            # Un mínimo o un máximo que se va no se puede deshacer con $inc: se relee
+            # por el índice (activo, categoria, precio), dos lecturas de un documento
+            if delta["bajas"] and (
+                faceta["total"] <= 0
+                or min(delta["bajas"]) <= faceta.get("precio_min", 0)
+                or max(delta["bajas"]) >= faceta.get("precio_max", 0)
+            ):
+                self._releer_limites(categoria)
+
+    def _releer_limites(self, categoria: str):
+        filtro = {"activo": True, "categoria": categoria}
+        minimo = self.productos.find_one(filtro, {"precio": 1}, sort=[("precio", ASCENDING)])
+        maximo = self.productos.find_one(filtro, {"precio": 1}, sort=[("precio", DESCENDING)])
+        if minimo is None:
+            self.facetas.update_one({"_id": categoria}, {"$unset": {"precio_min": "", "precio_max": ""}})
+        else:
+            self.facetas.update_one(
+                {"_id": categoria},
+                {"$set": {"precio_min": minimo["precio"], "precio_max": maximo["precio"]}}
+            )
+
+    def antes_por_sku(self, skus: List[str]) -> Dict[str, dict]:
+        """Estado previo de los productos de una carga masiva, en una lectura"""
+        return {
+            producto["sku"]: producto
+            for producto in self.productos.find({"sku": {"$in": skus}}, {**CAMPOS_FACETA, "sku": 1})
+        }
+
+    def registrar_carga(
+        self,
+        productos: List[Tuple[int, dict]],
+        antes: Dict[str, dict],
+        resultados: Dict[int, Dict[str, Any]]
+    ):
+        """Cambios de un upsert por SKU: solo cuentan las filas que se escribieron"""
+        cambios = []
+        for fila, datos in productos:
+            if resultados.get(fila, {}).get("estado") not in ("creado", "actualizado"):
+                continue
+            anterior = antes.get(datos["sku"])
+            # La carga no reactiva productos eliminados: activo solo se fija al crear
+            nuevo = {**datos, "activo": anterior.get("activo", True) if anterior else True}
+            cambios.append((anterior, nuevo))
+            # Un SKU repetido en la carga parte del estado que dejó su fila anterior
+            antes[datos["sku"]] = nuevo
+        self.registrar_varios(cambios)
+
+    def listar(self) -> List[dict]:
+        """Una lectura de tantos documentos como categorías, sin tocar los productos"""
+        return list(self.facetas.find())
+
+    def recalcular(self) -> int:
+        """Recuenta las facetas desde los productos; devuelve cuántas categorías estaban desfasadas"""
+        ahora = datetime.now()
+        recontadas = {
+            grupo["_id"]: grupo
+            for grupo in self.productos.aggregate([
+                {"$match": {"activo": True}},
+                {"$group": {
+                    "_id": "$categoria",
+                    "total": {"$sum": 1},
+                    "suma_precio": {"$sum": "$precio"},
+                    "precio_min": {"$min": "$precio"},
+                    "precio_max": {"$max": "$precio"},
+                }},
+            ])
+            if grupo["_id"] is not None
+        }
+        actuales = {faceta["_id"]: faceta for faceta in self.facetas.find()}
+        desfasadas = 0
+        operaciones = []
+        for categoria in set(recontadas) | set(actuales):
+            grupo = recontadas.get(categoria, {"total": 0, "suma_precio": 0.0})
+            faceta = actuales.get(categoria, {})
+            if faceta.get("total", 0) != grupo["total"] or abs(faceta.get("suma_precio", 0) - grupo["suma_precio"]) > 0.01:
+                desfasadas += 1
+            cambios: Dict[str, Any] = {
+                "$set": {"total": grupo["total"], "suma_precio": grupo["suma_precio"], "fecha_recalculo": ahora}
+            }
+            if "precio_min" in grupo:
+                cambios["$set"].update({"precio_min": grupo["precio_min"], "precio_max": grupo["precio_max"]})
+            else:
+                cambios["$unset"] = {"precio_min": "", "precio_max": ""}
+            operaciones.append(UpdateOne({"_id": categoria}, cambios, upsert=True))
+        if operaciones:
+            self.facetas.bulk_write(operaciones, ordered=False)
+        return desfasadas
+
+    def ultimo_recalculo(self) -> Optional[datetime]:
+        faceta = self.facetas.find_one({}, {"fecha_recalculo": 1}, sort=[("fecha_recalculo", DESCENDING)])
+        return faceta.get("fecha_recalculo") if faceta else None
+
+    async def crear_indices(self):
+        """Relectura de mínimo y máximo de una categoría sin recorrerla"""
+        self.productos.create_index([("activo", ASCENDING), ("categoria", ASCENDING), ("precio", ASCENDING)])
+
+class RecalculadorFacetas:
+    """Tarea periódica: recálculo completo para corregir la deriva de los contadores"""
+
+    def __init__(self, facetas: FacetasProductos, intervalo: float):
+        self.facetas = facetas
+        self.intervalo = intervalo
+        self._tarea: Optional[asyncio.Task] = None
+
+    async def _bucle(self):
+        while True:
+            try:
+                # Con varios workers recalcula el primero al que le toca; sin facetas, al arrancar
+                ultimo = await asyncio.to_thread(self.facetas.ultimo_recalculo)
+                if ultimo is None or datetime.now() - ultimo >= timedelta(seconds=self.intervalo):
+                    desfasadas = await asyncio.to_thread(self.facetas.recalcular)
+                    if desfasadas:
+                        logger.warning("Facetas: %s categorías desfasadas corregidas", desfasadas)
+            except Exception as e:
+                logger.error("Error recalculando facetas: %s", e)
+            await asyncio.sleep(self.intervalo)
+
+    async def iniciar(self):
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
@@ -0,0 +1,94 @@
+"""
+Lanzador común de los microservicios - PATRON FACADE
+Arranca uvicorn en un proceso o gunicorn con N workers pre-forked
+según variables de entorno
+"""
+
+import importlib.util
+import logging
+import os
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+LOOP = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+HTTP = "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+def configuracion_servidor() -> Dict[str, Any]:
+    """Lee la configuración del servidor desde el entorno"""
+    workers = int(os.getenv("SERVIDOR_WORKERS", "1"))
+    return {
+        "host": os.getenv("SERVIDOR_HOST", "0.0.0.0"),
+        "puerto": int(os.getenv("SERVIDOR_PUERTO", "8000")),
+        # 0 = un worker por CPU
+        "workers": workers if workers > 0 else (os.cpu_count() or 1),
+        # Reciclado de workers: 0 desactiva el reciclado
+        "max_peticiones": int(os.getenv("SERVIDOR_MAX_PETICIONES", "0")),
+        "jitter_peticiones": int(os.getenv("SERVIDOR_JITTER_PETICIONES", "0")),
+        "timeout_graceful": int(os.getenv("SERVIDOR_TIMEOUT_GRACEFUL", "30")),
+    }
+
+if importlib.util.find_spec("gunicorn"):
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+
+    class TrabajadorUvicorn(UvicornWorker):
+        """Worker de gunicorn con el loop y el parser HTTP más rápidos disponibles"""
+        CONFIG_KWARGS = {"loop": LOOP, "http": HTTP}
+
+    class AplicacionGunicorn(BaseApplication):
+        """PATRON ADAPTER: Expone la aplicación ASGI al maestro de gunicorn"""
+
+        def __init__(self, aplicacion: str, opciones: Dict[str, Any]):
+            self.aplicacion = aplicacion
+            self.opciones = opciones
+            super().__init__()
+
+        def load_config(self):
+            for clave, valor in self.opciones.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            from gunicorn.util import import_app
+            return import_app(self.aplicacion)
+
+def ejecutar(aplicacion: str = "main:app"):
+    """
+    Arranca el servicio indicado como "modulo:atributo"
+    Con un solo worker usa uvicorn directamente; con varios, gunicorn
+    importa la aplicación en cada worker después del fork
+    """
+    import uvicorn
+
+    config = configuracion_servidor()
+    if config["workers"] > 1 and importlib.util.find_spec("gunicorn") is None:
+        logger.warning("gunicorn no está instalado; se arranca un único worker")
+        config["workers"] = 1
+
+    logger.info(
+        "Arrancando %s con %s worker(s), loop=%s, http=%s",
+        aplicacion, config["workers"], LOOP, HTTP
+    )
+
+    if config["workers"] == 1:
+        uvicorn.run(
+            aplicacion,
+            host=config["host"],
+            port=config["puerto"],
+            loop=LOOP,
+            http=HTTP,
+            # El logging lo configura comun.registro en la propia aplicación
+            log_config=None,
+            timeout_graceful_shutdown=config["timeout_graceful"],
+        )
+        return
+
+    AplicacionGunicorn(aplicacion, {
+        "bind": f"{config['host']}:{config['puerto']}",
+        "workers": config["workers"],
+        "worker_class": "comun.lanzador.TrabajadorUvicorn",
+        "max_requests": config["max_peticiones"],
+        "max_requests_jitter": config["jitter_peticiones"],
+        "graceful_timeout": config["timeout_graceful"],
+        "preload_app": False,
+    }).run()
@@ -0,0 +1,168 @@
+"""
+Operaciones masivas - PATRON COMMAND
+Lee las filas de una carga (NDJSON, array JSON o CSV en streaming) y
+ejecuta las operaciones con bulk_write por trozos, devolviendo el
+resultado de cada fila
+"""
+
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+TIPOS_NDJSON = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+async def leer_filas(request: Request) -> List[Any]:
+    """Lee el cuerpo como NDJSON (según Content-Type) o como array JSON"""
+    cuerpo = await request.body()
+    tipo = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if tipo in TIPOS_NDJSON:
+        filas = []
+        for numero, linea in enumerate(cuerpo.splitlines(), start=1):
+            if not linea.strip():
+                continue
+            try:
+                filas.append(json.loads(linea))
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Línea {numero} no es JSON válido: {e}"
+                )
+        return filas
+
+    try:
+        filas = json.loads(cuerpo)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"JSON no válido: {e}")
+    if not isinstance(filas, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Se esperaba un array JSON o NDJSON"
+        )
+    return filas
+
+async def _lineas(request: Request) -> AsyncIterator[str]:
+    """Líneas del cuerpo según van llegando, sin cargarlo entero"""
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    resto = ""
+    try:
+        async for trozo in request.stream():
+            lineas = (resto + decodificador.decode(trozo)).split("\n")
+            resto = lineas.pop()
+            for linea in lineas:
+                yield linea.rstrip("\r")
+        resto += decodificador.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"El CSV no es UTF-8: {e}")
+    if resto:
+        yield resto.rstrip("\r")
+
+def _delimitador(cabecera: str) -> str:
+    try:
+        return csv.Sniffer().sniff(cabecera, delimiters=",;\t").delimiter
+    except csv.Error:
+        return ","
+
+async def filas_csv(
+    request: Request,
+    tamano: int,
+    requeridas: Sequence[str] = ()
+) -> AsyncIterator[List[Tuple[int, Dict[str, str]]]]:
+    """
+    Lee un CSV del cuerpo en streaming y lo entrega por lotes de (línea, fila)
+    La memoria depende del tamaño de lote, no del archivo. La cabecera da
+    los nombres de columna (en minúsculas); el separador puede ser coma,
+    punto y coma o tabulador. Un campo entre comillas no puede contener saltos de línea
+    Si a la cabecera le falta alguna columna requerida responde 400
+    """
+    columnas = None
+    delimitador = ","
+    lote: List[Tuple[int, Dict[str, str]]] = []
+    numero = 0
+    async for linea in _lineas(request):
+        numero += 1
+        if not linea.strip():
+            continue
+        if columnas is None:
+            delimitador = _delimitador(linea)
+            columnas = [columna.strip().lower() for columna in next(csv.reader([linea], delimiter=delimitador))]
+            faltan = [columna for columna in requeridas if columna not in columnas]
+            if faltan:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Faltan columnas en la cabecera del CSV: {', '.join(faltan)}"
+                )
+            continue
+        valores = next(csv.reader([linea], delimiter=delimitador))
+        lote.append((numero, dict(zip(columnas, (valor.strip() for valor in valores)))))
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def error_validacion(error: ValidationError) -> str:
+    """Resume los errores de pydantic de una fila en una sola línea"""
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in detalle['loc']) or 'fila'}: {detalle['msg']}"
+        for detalle in error.errors()
+    )
+
+def ejecutar_lote(
+    coleccion,
+    operaciones: List[Tuple[int, Any]],
+    ordenado: bool,
+    tamano: int
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Ejecuta las operaciones (fila, operación) en trozos de `tamano`
+    Devuelve el resultado por fila: creado (con id), actualizado, error o
+    no_procesado. En modo ordenado se detiene en el primer error
+    """
+    resultados: Dict[int, Dict[str, Any]] = {}
+    for inicio in range(0, len(operaciones), tamano):
+        trozo = operaciones[inicio:inicio + tamano]
+        try:
+            detalles = coleccion.bulk_write([operacion for _, operacion in trozo], ordered=ordenado).bulk_api_result
+        except BulkWriteError as e:
+            detalles = e.details
+
+        creados = {u["index"]: u["_id"] for u in detalles.get("upserted", [])}
+        errores = {e["index"]: e.get("errmsg", "Error de escritura") for e in detalles.get("writeErrors", [])}
+        primer_error = min(errores) if errores else None
+        for indice, (fila, _) in enumerate(trozo):
+            if indice in errores:
+                resultados[fila] = {"estado": "error", "error": errores[indice]}
+            elif ordenado and primer_error is not None and indice > primer_error:
+                resultados[fila] = {"estado": "no_procesado"}
+            elif indice in creados:
+                resultados[fila] = {"estado": "creado", "id": str(creados[indice])}
+            else:
+                resultados[fila] = {"estado": "actualizado"}
+
+        if ordenado and errores:
+            for fila, _ in operaciones[inicio + tamano:]:
+                resultados[fila] = {"estado": "no_procesado"}
+            break
+    return resultados
+
+def resumen_lote(resultados: Dict[int, Dict[str, Any]], claves: Dict[int, Any]) -> Dict[str, Any]:
+    """Totales por estado y detalle por fila (con su clave, ej. el SKU)"""
+    filas = [
+        {"fila": fila, "clave": claves.get(fila), **resultados[fila]}
+        for fila in sorted(resultados)
+    ]
+    totales = {"creado": 0, "actualizado": 0, "error": 0, "no_procesado": 0}
+    for resultado in resultados.values():
+        totales[resultado["estado"]] += 1
+    return {
+        "total": len(filas),
+        "creados": totales["creado"],
+        "actualizados": totales["actualizado"],
+        "errores": totales["error"],
+        "no_procesados": totales["no_procesado"],
+        "filas": filas,
+    }
@@ -0,0 +1,60 @@
+"""
+Conexión compartida a MongoDB - PATRON SINGLETON
+Un único MongoClient (y su pool de conexiones) por proceso y URL
+"""
+
+import importlib.util
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Type
+from pydantic import BaseModel
+from pymongo import MongoClient
+
+# Librería opcional que necesita cada compresor del protocolo de MongoDB
+MODULOS_COMPRESORES = {
+    "zstd": "zstandard",
+    "snappy": "snappy",
+    "zlib": "zlib",
+}
+
+_clientes: Dict[Tuple[str, Tuple[str, ...]], MongoClient] = {}
+_bloqueo = threading.Lock()
+
+# MongoClient no es seguro tras un fork: cada worker hijo crea sus propios clientes
+os.register_at_fork(after_in_child=_clientes.clear)
+
+def compresores_disponibles(compresores: str) -> List[str]:
+    """Filtra la lista configurada (ej. "zstd,snappy,zlib") a los compresores instalados"""
+    disponibles = []
+    for nombre in (c.strip().lower() for c in compresores.split(",")):
+        modulo = MODULOS_COMPRESORES.get(nombre)
+        if modulo and importlib.util.find_spec(modulo) is not None:
+            disponibles.append(nombre)
+    return disponibles
+
+def obtener_cliente(url: str, compresores: str = "") -> MongoClient:
+    """PATRON FACTORY METHOD: Devuelve el cliente compartido para la URL dada"""
+    lista_compresores = tuple(compresores_disponibles(compresores)) if compresores else ()
+    clave = (url, lista_compresores)
+    cliente = _clientes.get(clave)
+    if cliente is None:
+        with _bloqueo:
+            cliente = _clientes.get(clave)
+            if cliente is None:
+                opciones = {"compressors": list(lista_compresores)} if lista_compresores else {}
+                cliente = MongoClient(url, **opciones)
+                _clientes[clave] = cliente
+    return cliente
+
+def precalentar_pool(cliente: MongoClient, conexiones: int):
+    """Abre hasta `conexiones` sockets del pool con pings concurrentes"""
+    with ThreadPoolExecutor(max_workers=max(1, conexiones)) as ejecutor:
+        list(ejecutor.map(lambda _: cliente.admin.command("ping"), range(max(1, conexiones))))
+
+def proyeccion_modelo(modelo: Type[BaseModel]) -> dict:
+    """
+    Construye la proyección de MongoDB con los campos que usa un modelo
+    El campo id se lee de _id, que MongoDB devuelve siempre
+    """
+    return {nombre: 1 for nombre in modelo.model_fields if nombre != "id"}
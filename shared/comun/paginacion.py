@@ -0,0 +1,37 @@
+"""
+Paginación por cursor (keyset) - PATRON ITERATOR
+El cursor es opaco para el cliente: JSON con la clave de orden del último
+elemento devuelto, codificado en base64 url-safe
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict
+from bson import ObjectId
+
+def codificar_cursor(valores: Dict[str, Any]) -> str:
+    """Codifica la clave de orden (ObjectId y datetime incluidos) como cursor opaco"""
+    def _codificar(valor):
+        if isinstance(valor, ObjectId):
+            return str(valor)
+        if isinstance(valor, datetime):
+            return valor.isoformat()
+        raise TypeError(f"Tipo no soportado en cursor: {type(valor).__name__}")
+    contenido = json.dumps(valores, default=_codificar, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(contenido).rstrip(b"=").decode()
+
+def decodificar_cursor(cursor: str) -> Dict[str, Any]:
+    """Decodifica un cursor; lanza ValueError si no es válido"""
+    relleno = "=" * (-len(cursor) % 4)
+    valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    if not isinstance(valores, dict):
+        raise ValueError("Cursor inválido")
+    return valores
+
+def id_de_cursor(valores: Dict[str, Any]) -> ObjectId:
+    """Extrae el _id de un cursor decodificado"""
+    valor = valores.get("id")
+    if not isinstance(valor, str) or not ObjectId.is_valid(valor):
+        raise ValueError("Cursor inválido")
+    return ObjectId(valor)
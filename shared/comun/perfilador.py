@@ -0,0 +1,192 @@
+"""
+Perfilado por muestreo de peticiones - PATRON DECORATOR (middleware ASGI)
+Perfila una petición cuando trae la cabecera privilegiada o según una tasa
+de muestreo; captura pilas de tiempo real (wall) y de CPU en formato
+colapsado, listo para flamegraph, y agrega los resultados por ruta
+"""
+
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from comun.admin import con_worker, ruta_admin
+
+logger = logging.getLogger(__name__)
+
+CABECERA_PERFIL = b"x-perfilar"
+
+def _colapsar(frame) -> str:
+    """Convierte una pila en la forma colapsada raiz;...;hoja"""
+    partes = []
+    while frame is not None:
+        codigo = frame.f_code
+        partes.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(partes))
+
+class MuestreoPila(threading.Thread):
+    """
+    Hilo que muestrea la pila del hilo del event loop mientras dura la petición
+    Las muestras de wall pesan el tiempo real transcurrido; las de CPU, el
+    tiempo de CPU que consumió el hilo entre muestra y muestra (en µs)
+    """
+
+    def __init__(self, hilo_objetivo: int, intervalo: float):
+        super().__init__(daemon=True)
+        self.hilo_objetivo = hilo_objetivo
+        self.intervalo = intervalo
+        self.wall: Counter = Counter()
+        self.cpu: Counter = Counter()
+        self._parar = threading.Event()
+        try:
+            self._reloj_cpu = time.pthread_getcpuclockid(hilo_objetivo)
+        except (AttributeError, OSError):
+            self._reloj_cpu = None
+
+    def _tiempo_cpu(self) -> float:
+        return time.clock_gettime(self._reloj_cpu) if self._reloj_cpu is not None else 0.0
+
+    def run(self):
+        ultimo_wall = time.perf_counter()
+        ultimo_cpu = self._tiempo_cpu()
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_objetivo)
+            ahora_wall = time.perf_counter()
+            ahora_cpu = self._tiempo_cpu()
+            if frame is not None:
+                pila = _colapsar(frame)
+                self.wall[pila] += int((ahora_wall - ultimo_wall) * 1_000_000)
+                delta_cpu = int((ahora_cpu - ultimo_cpu) * 1_000_000)
+                if delta_cpu > 0:
+                    self.cpu[pila] += delta_cpu
+            ultimo_wall, ultimo_cpu = ahora_wall, ahora_cpu
+
+    def detener(self):
+        self._parar.set()
+        self.join()
+
+class Perfilador:
+    """Decide qué peticiones perfilar, escribe los resultados y los agrega por ruta"""
+
+    def __init__(self):
+        self.tasa = float(os.getenv("PERFIL_TASA", "0"))
+        self.token = os.getenv("PERFIL_TOKEN", "").encode()
+        self.directorio = os.getenv("PERFIL_DIRECTORIO", "/tmp/perfiles")
+        self.intervalo = float(os.getenv("PERFIL_INTERVALO_MS", "5")) / 1000
+        self._bloqueo = threading.Lock()
+        self._rutas: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def activo(self) -> bool:
+        return self.tasa > 0 or bool(self.token)
+
+    def debe_perfilar(self, scope: dict) -> bool:
+        if self.token:
+            for nombre, valor in scope["headers"]:
+                if nombre == CABECERA_PERFIL:
+                    return valor == self.token
+        return self.tasa > 0 and random.random() < self.tasa
+
+    def _ruta(self, scope: dict) -> str:
+        endpoint = scope.get("endpoint")
+        nombre = getattr(endpoint, "__name__", None) or scope["path"]
+        return f"{scope['method']} {nombre}"
+
+    def _escribir(self, ruta: str, muestreo: MuestreoPila):
+        os.makedirs(self.directorio, exist_ok=True)
+        base = re.sub(r"[^A-Za-z0-9_.-]+", "_", ruta)
+        marca = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        for tipo, pilas in (("wall", muestreo.wall), ("cpu", muestreo.cpu)):
+            ruta_archivo = os.path.join(self.directorio, f"{base}-{marca}-{os.getpid()}.{tipo}.folded")
+            with open(ruta_archivo, "w") as archivo:
+                archivo.writelines(f"{pila} {peso}\n" for pila, peso in pilas.items())
+
+    def registrar(self, scope: dict, muestreo: MuestreoPila, duracion: float):
+        ruta = self._ruta(scope)
+        with self._bloqueo:
+            agregado = self._rutas.setdefault(
+                ruta, {"peticiones": 0, "segundos": 0.0, "wall": Counter(), "cpu": Counter()}
+            )
+            agregado["peticiones"] += 1
+            agregado["segundos"] += duracion
+            agregado["wall"].update(muestreo.wall)
+            agregado["cpu"].update(muestreo.cpu)
+        try:
+            self._escribir(ruta, muestreo)
+        except OSError as e:
+            logger.error("No se pudo escribir el perfil de %s: %s", ruta, e)
+
+    def resumen(self, top: int = 5) -> Dict[str, Any]:
+        with self._bloqueo:
+            return {
+                ruta: {
+                    "peticiones_perfiladas": datos["peticiones"],
+                    "duracion_media_ms": round(datos["segundos"] / datos["peticiones"] * 1000, 3),
+                    "cpu_total_ms": round(sum(datos["cpu"].values()) / 1000, 3),
+                    "pilas_cpu": [
+                        {"pila": pila, "us": peso} for pila, peso in datos["cpu"].most_common(top)
+                    ],
+                }
+                for ruta, datos in self._rutas.items()
+            }
+
+    def colapsado(self, ruta: str, tipo: str) -> Optional[str]:
+        with self._bloqueo:
+            datos = self._rutas.get(ruta)
+            if datos is None:
+                return None
+            return "".join(f"{pila} {peso}\n" for pila, peso in datos[tipo].items())
+
+class MiddlewarePerfilado:
+    """Middleware ASGI puro: las peticiones no perfiladas pasan directamente"""
+
+    def __init__(self, app, perfilador: Perfilador):
+        self.app = app
+        self.perfilador = perfilador
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.perfilador.debe_perfilar(scope):
+            await self.app(scope, receive, send)
+            return
+
+        muestreo = MuestreoPila(threading.get_ident(), self.perfilador.intervalo)
+        inicio = time.perf_counter()
+        muestreo.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            muestreo.detener()
+            self.perfilador.registrar(scope, muestreo, time.perf_counter() - inicio)
+
+def registrar_perfilador(app: FastAPI):
+    """
+    Instala el middleware solo si el perfilado está habilitado
+    (PERFIL_TASA > 0 o PERFIL_TOKEN definido): sin coste cuando está apagado.
+    Los perfiles agregados son los de cada worker (ver comun.admin)
+    """
+    perfilador = Perfilador()
+    if perfilador.activo:
+        app.add_middleware(MiddlewarePerfilado, perfilador=perfilador)
+
+    @ruta_admin(app, "/admin/perfiles", activa=perfilador.activo)
+    async def resumen_perfiles():
+        return con_worker({"rutas": perfilador.resumen()})
+
+    @ruta_admin(app, "/admin/perfiles/colapsado", activa=perfilador.activo, response_class=PlainTextResponse)
+    async def perfil_colapsado(ruta: str, tipo: str = "cpu"):
+        if tipo not in ("wall", "cpu"):
+            raise HTTPException(status_code=400, detail="tipo debe ser 'wall' o 'cpu'")
+        contenido = perfilador.colapsado(ruta, tipo)
+        if contenido is None:
+            raise HTTPException(status_code=404, detail="Ruta sin perfiles")
+        return contenido
+
+    return perfilador
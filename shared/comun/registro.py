@@ -0,0 +1,204 @@
+"""
+Logging común de los microservicios - PATRON PRODUCER/CONSUMER
+Los hilos de las peticiones solo encolan el registro; un hilo escritor en
+segundo plano lo formatea como JSON y lo escribe. Los mensajes de alto
+volumen se muestrean por logger y el coste total del logging se mide
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from fastapi import FastAPI
+from comun.admin import con_worker, ruta_admin
+
+# Atributos estándar de LogRecord; el resto se considera contexto estructurado
+_ATRIBUTOS_ESTANDAR = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+class MetricasLogging:
+    """Contadores de coste del logging, compartidos entre hilos"""
+
+    def __init__(self):
+        self._bloqueo = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.encolados = 0
+        self.descartados = 0
+        self.muestreados_fuera = 0
+        self.segundos_encolado = 0.0
+        self.segundos_escritura = 0.0
+
+    def sumar(self, **valores):
+        with self._bloqueo:
+            for nombre, valor in valores.items():
+                setattr(self, nombre, getattr(self, nombre) + valor)
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            "registros_encolados": self.encolados,
+            "registros_descartados": self.descartados,
+            "registros_muestreados_fuera": self.muestreados_fuera,
+            "tiempo_encolado_ms": round(self.segundos_encolado * 1000, 3),
+            "tiempo_escritura_ms": round(self.segundos_escritura * 1000, 3),
+            "tiempo_total_ms": round((self.segundos_encolado + self.segundos_escritura) * 1000, 3),
+        }
+
+metricas = MetricasLogging()
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Deja pasar 1 de cada N registros INFO/DEBUG de los loggers configurados
+    WARNING y superiores nunca se muestrean
+    """
+
+    def __init__(self, tasas: Dict[str, float]):
+        super().__init__()
+        self._cada = {nombre: max(1, round(1 / tasa)) for nombre, tasa in tasas.items() if tasa > 0}
+        self._descartar = {nombre for nombre, tasa in tasas.items() if tasa <= 0}
+        self._contadores: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        nombre = record.name
+        if nombre in self._descartar:
+            metricas.sumar(muestreados_fuera=1)
+            return False
+        cada = self._cada.get(nombre)
+        if cada is None or cada == 1:
+            return True
+        contador = self._contadores.get(nombre, 0)
+        self._contadores[nombre] = contador + 1
+        if contador % cada == 0:
+            return True
+        metricas.sumar(muestreados_fuera=1)
+        return False
+
+class ManejadorCola(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo de la petición (formato diferido)
+    y descarta en vez de bloquear cuando la cola está llena
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            metricas.sumar(encolados=1)
+        except queue.Full:
+            metricas.sumar(descartados=1)
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        inicio = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            metricas.sumar(segundos_encolado=time.perf_counter() - inicio)
+
+class FormateadorJSON(logging.Formatter):
+    """Formatea cada registro como una línea JSON"""
+
+    def __init__(self, servicio: str):
+        super().__init__()
+        self.servicio = servicio
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(),
+            "nivel": record.levelname,
+            "servicio": self.servicio,
+            "logger": record.name,
+            "pid": record.process,
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in record.__dict__.items():
+            if clave not in _ATRIBUTOS_ESTANDAR:
+                datos[clave] = valor
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+class ManejadorEscritura(logging.StreamHandler):
+    """StreamHandler del hilo escritor que contabiliza el tiempo de escritura"""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        inicio = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            metricas.sumar(segundos_escritura=time.perf_counter() - inicio)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def _reiniciar_tras_fork():
+    """El hilo escritor no sobrevive a un fork: el hijo debe configurar el suyo"""
+    global _listener
+    _listener = None
+    metricas.reiniciar()
+
+os.register_at_fork(after_in_child=_reiniciar_tras_fork)
+
+def _leer_tasas(valor: str) -> Dict[str, float]:
+    """Interpreta LOG_MUESTREO con formato "logger=tasa,logger=tasa" """
+    tasas = {}
+    for par in valor.split(","):
+        if "=" in par:
+            nombre, tasa = par.split("=", 1)
+            tasas[nombre.strip()] = float(tasa)
+    return tasas
+
+def configurar_logging(servicio: str):
+    """
+    Instala el logging asíncrono en el logger raíz (idempotente por proceso)
+    Variables: LOG_NIVEL, LOG_MUESTREO (ej. "proxy=0.01,uvicorn.access=0.1"),
+    LOG_COLA_MAX
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    cola: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_COLA_MAX", "10000")))
+    manejador_cola = ManejadorCola(cola)
+    manejador_cola.addFilter(FiltroMuestreo(_leer_tasas(os.getenv("LOG_MUESTREO", ""))))
+
+    escritor = ManejadorEscritura(sys.stdout)
+    escritor.setFormatter(FormateadorJSON(servicio))
+
+    raiz = logging.getLogger()
+    for manejador in list(raiz.handlers):
+        raiz.removeHandler(manejador)
+    raiz.addHandler(manejador_cola)
+    raiz.setLevel(os.getenv("LOG_NIVEL", "INFO").upper())
+
+    # Los logs de uvicorn también pasan por la cola
+    for nombre in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logger_uvicorn = logging.getLogger(nombre)
+        logger_uvicorn.handlers.clear()
+        logger_uvicorn.propagate = True
+
+    _listener = logging.handlers.QueueListener(cola, escritor, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener_logging)
+
+def detener_logging():
+    """Vacía la cola y detiene el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def registrar_metricas_logging(app: FastAPI):
+    """Expone las métricas de coste del logging (del worker que responde)"""
+    @ruta_admin(app, "/admin/logging")
+    async def metricas_logging():
+        return con_worker(metricas.resumen())
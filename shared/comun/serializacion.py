@@ -0,0 +1,54 @@
+"""
+Serialización de respuestas - PATRON ADAPTER
+Valida los documentos de MongoDB una sola vez y los serializa a JSON
+con adaptadores precompilados, sin copias intermedias
+"""
+
+from typing import Any, Annotated, Dict, Optional
+from bson import ObjectId
+from fastapi import status
+from fastapi.responses import Response
+from pydantic import BeforeValidator, TypeAdapter
+
+def _id_a_texto(valor: Any) -> Any:
+    """Convierte ObjectId de MongoDB a su representación en texto"""
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    return valor
+
+# Tipo para campos id que llegan como ObjectId desde la BD
+IdMongo = Annotated[str, BeforeValidator(_id_a_texto)]
+
+def respuesta_json(
+    contenido: bytes,
+    status_code: int = status.HTTP_200_OK,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Respuesta HTTP con un JSON ya serializado"""
+    return Response(content=contenido, status_code=status_code, headers=headers, media_type="application/json")
+
+class AdaptadorRespuesta:
+    """
+    PATRON ADAPTER: Convierte documentos de BD en respuestas JSON
+    El esquema de validación y serialización se compila una sola vez
+    """
+
+    def __init__(self, tipo: Any):
+        self._adaptador = TypeAdapter(tipo)
+
+    def serializar(self, datos: Any) -> bytes:
+        """Valida los datos y los serializa a JSON en una sola pasada"""
+        return self._adaptador.dump_json(self._adaptador.validate_python(datos))
+
+    def a_python(self, datos: Any) -> Any:
+        """Valida los datos y los convierte a tipos JSON nativos (str, float, ...)"""
+        return self._adaptador.dump_python(self._adaptador.validate_python(datos), mode="json")
+
+    def respuesta(
+        self,
+        datos: Any,
+        status_code: int = status.HTTP_200_OK,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """Construye la respuesta HTTP evitando la revalidación de response_model"""
+        return respuesta_json(self.serializar(datos), status_code, headers)
@@ -0,0 +1,54 @@
+"""
+Unicidad del SKU - PATRON SINGLETON
+Una sola definición del índice de SKU de la colección de productos, que
+crean igual todos los servicios que escriben en ella: único, para que la
+base de datos (y no solo la comprobación previa al crear) impida SKU
+repetidos, y con nombre fijo para que dos servicios no declaren índices
+distintos sobre la misma clave
+"""
+
+import logging
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+NOMBRE_INDICE_SKU = "sku_1"
+CLAVE_SKU = [("sku", ASCENDING)]
+
+def _sku_repetido(productos):
+    """Un SKU con más de un documento, o None; se detiene en el primero"""
+    repetidos = list(productos.aggregate([
+        {"$group": {"_id": "$sku", "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$limit": 1},
+    ], allowDiskUse=True))
+    return repetidos[0]["_id"] if repetidos else None
+
+def crear_indice_sku(productos) -> bool:
+    """
+    Crea el índice único de SKU; devuelve si quedó único. Un sku_1 previo
+    sin unique (el que creaban versiones anteriores) se sustituye si no hay
+    SKU repetidos; si los hay, se deja y se registra el error para depurarlos
+    """
+    existente = productos.index_information().get(NOMBRE_INDICE_SKU)
+    if existente is not None and not existente.get("unique"):
+        repetido = _sku_repetido(productos)
+        if repetido is not None:
+            logger.error(
+                "SKU repetidos (ej. %r): se mantiene el índice %s sin unique hasta depurarlos",
+                repetido, NOMBRE_INDICE_SKU
+            )
+            return False
+        logger.warning("Sustituyendo el índice %s sin unique por el índice único", NOMBRE_INDICE_SKU)
+        try:
+            productos.drop_index(NOMBRE_INDICE_SKU)
+        except OperationFailure:
+            # Otro servicio o worker lo sustituyó a la vez
+            pass
+    try:
+        productos.create_index(CLAVE_SKU, unique=True, name=NOMBRE_INDICE_SKU)
+    except OperationFailure as e:
+        logger.error("No se pudo crear el índice único de SKU: %s", e)
+        return False
+    return True
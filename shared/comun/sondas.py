@@ -0,0 +1,148 @@
+"""
+Sondas de salud (liveness / readiness) - PATRON OBSERVER
+Un verificador en segundo plano consulta las dependencias con los clientes
+compartidos y cachea el resultado; los endpoints solo leen la caché
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
+from comun.admin import con_worker, ruta_admin
+from comun.arranque import CalentadorArranque
+
+logger = logging.getLogger(__name__)
+
+def verificacion_mongo(cliente) -> Callable[[], Any]:
+    """PATRON FACTORY: Verificación de MongoDB sobre el cliente compartido"""
+    return lambda: cliente.admin.command("ping")
+
+def verificacion_redis(cliente) -> Callable[[], Any]:
+    """PATRON FACTORY: Verificación de Redis sobre el cliente compartido"""
+    return lambda: cliente.ping()
+
+class ProbadorSalud:
+    """Ejecuta las verificaciones periódicamente y conserva el último resultado"""
+
+    def __init__(self, servicio: str, intervalo: float = 10.0, timeout: float = 3.0):
+        self.servicio = servicio
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self._verificaciones: Dict[str, Callable[[], Any]] = {}
+        self._resultados: Dict[str, Dict[str, Any]] = {}
+        self._ultima_verificacion: Optional[float] = None
+        self._fecha_verificacion: Optional[datetime] = None
+        self._inicio = time.monotonic()
+        self._tarea: Optional[asyncio.Task] = None
+        self.calentador: Optional[CalentadorArranque] = None
+
+    def agregar_verificacion(self, nombre: str, verificacion: Callable[[], Any]):
+        """Registra una verificación bloqueante; se ejecuta fuera del event loop"""
+        self._verificaciones[nombre] = verificacion
+
+    async def _ejecutar(self, nombre: str, verificacion: Callable[[], Any]) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(verificacion), self.timeout)
+            resultado = {"estado": "ok"}
+        except Exception as e:
+            logger.error("Verificación %s falló: %s", nombre, e)
+            resultado = {"estado": "error", "detalle": str(e) or type(e).__name__}
+        resultado["latencia_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        return resultado
+
+    async def verificar(self):
+        """Ejecuta todas las verificaciones en paralelo y actualiza la caché"""
+        nombres = list(self._verificaciones)
+        resultados = await asyncio.gather(
+            *(self._ejecutar(nombre, self._verificaciones[nombre]) for nombre in nombres)
+        )
+        self._resultados = dict(zip(nombres, resultados))
+        self._ultima_verificacion = time.monotonic()
+        self._fecha_verificacion = datetime.now()
+
+    async def _bucle(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            await self.verificar()
+
+    async def iniciar(self):
+        """Primera verificación antes de aceptar tráfico: abre los pools de conexión"""
+        if self._tarea is None:
+            await self.verificar()
+            logger.info("Worker %s de %s listo: %s", os.getpid(), self.servicio, self.listo)
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
+
+    def resultado(self, nombre: str) -> Optional[Dict[str, Any]]:
+        """Último resultado cacheado de una verificación"""
+        return self._resultados.get(nombre)
+
+    @property
+    def listo(self) -> bool:
+        if self.calentador is not None and not self.calentador.completado:
+            return False
+        return self._ultima_verificacion is not None and all(
+            r["estado"] == "ok" for r in self._resultados.values()
+        )
+
+    def _edad(self) -> Optional[float]:
+        if self._ultima_verificacion is None:
+            return None
+        return round(time.monotonic() - self._ultima_verificacion, 3)
+
+    def liveness(self) -> Dict[str, Any]:
+        return {
+            "estado": "vivo",
+            "servicio": self.servicio,
+            "worker": os.getpid(),
+            "uptime_segundos": round(time.monotonic() - self._inicio, 3),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def readiness(self) -> Dict[str, Any]:
+        return {
+            "estado": "listo" if self.listo else "no listo",
+            "servicio": self.servicio,
+            "worker": os.getpid(),
+            "dependencias": self._resultados,
+            "ultima_verificacion": self._fecha_verificacion.isoformat() if self._fecha_verificacion else None,
+            "edad_segundos": self._edad(),
+            "arranque": self.calentador.informe() if self.calentador is not None else None
+        }
+
+def registrar_sondas(app: FastAPI, probador: ProbadorSalud, calentador: Optional[CalentadorArranque] = None):
+    """
+    Registra los endpoints de sondas y el ciclo de vida del verificador
+    Con calentador, la readiness no pasa a listo hasta completar el calentamiento
+    """
+    probador.calentador = calentador
+
+    async def arrancar():
+        if calentador is not None:
+            await calentador.ejecutar()
+        await probador.iniciar()
+
+    app.add_event_handler("startup", arrancar)
+    app.add_event_handler("shutdown", probador.detener)
+
+    @app.get("/health/liveness", tags=["salud"])
+    async def liveness():
+        return probador.liveness()
+
+    @app.get("/health/readiness", tags=["salud"])
+    async def readiness():
+        codigo = status.HTTP_200_OK if probador.listo else status.HTTP_503_SERVICE_UNAVAILABLE
+        return JSONResponse(content=probador.readiness(), status_code=codigo)
+
+    @ruta_admin(app, "/admin/arranque", activa=calentador is not None)
+    async def informe_arranque():
+        return con_worker(calentador.informe())
@@ -0,0 +1,136 @@
+"""
+Conjunto materializado de productos con stock bajo - PATRON OBSERVER
+"stock < stock_minimo" compara dos campos del mismo documento y ningún
+índice lo resuelve. Cada escritura que toca stock, stock_minimo o activo
+recalcula en el servidor el campo `bajo_stock` en la misma operación
+atómica (actualización con pipeline), y un índice parcial sobre
+bajo_stock=true contiene solo esos productos
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from comun.etag import COLECCION_VERSIONES
+
+logger = logging.getLogger(__name__)
+
+CAMPO_BAJO_STOCK = "bajo_stock"
+# Sin stock_minimo se usa el mismo 5 por defecto que los modelos
+STOCK_MINIMO_DEFECTO = 5
+# Documento de `versiones` que registra la reconciliación de productos anteriores al campo
+MARCA_RECONCILIACION = "productos.bajo_stock"
+# Una reconciliación en curso sin terminar en este tiempo (su worker cayó) se retoma
+ABANDONO_RECONCILIACION = timedelta(hours=1)
+
+CONDICION_BAJO_STOCK = {"$and": [
+    {"$eq": ["$activo", True]},
+    {"$lt": [{"$ifNull": ["$stock", 0]}, {"$ifNull": ["$stock_minimo", STOCK_MINIMO_DEFECTO]}]},
+]}
+ETAPA_BAJO_STOCK = {"$set": {CAMPO_BAJO_STOCK: CONDICION_BAJO_STOCK}}
+
+def bajo_stock(producto: dict) -> bool:
+    """El mismo cálculo en Python, para los documentos que se insertan enteros"""
+    return bool(producto.get("activo")) and (
+        producto.get("stock", 0) < producto.get("stock_minimo", STOCK_MINIMO_DEFECTO)
+    )
+
+def con_bajo_stock(actualizacion: Dict[str, Dict[str, Any]]) -> List[dict]:
+    """
+    Convierte una actualización con $set, $inc, $pull (de un valor) y
+    $setOnInsert en un pipeline equivalente que además recalcula bajo_stock
+    con los valores ya escritos. Los valores de $set van en $literal: un
+    texto que empiece por "$" no es un campo
+    """
+    etapa: Dict[str, Any] = {}
+    for campo, valor in actualizacion.get("$setOnInsert", {}).items():
+        # Los campos que solo se ponen al crear no existen antes de la inserción
+        etapa[campo] = {"$ifNull": [f"${campo}", {"$literal": valor}]}
+    for campo, valor in actualizacion.get("$set", {}).items():
+        etapa[campo] = {"$literal": valor}
+    for campo, valor in actualizacion.get("$inc", {}).items():
+        etapa[campo] = {"$add": [{"$ifNull": [f"${campo}", 0]}, valor]}
+    for campo, valor in actualizacion.get("$pull", {}).items():
+        etapa[campo] = {"$filter": {
+            "input": {"$ifNull": [f"${campo}", []]},
+            "cond": {"$ne": ["$$this", {"$literal": valor}]},
+        }}
+    return [{"$set": etapa}, ETAPA_BAJO_STOCK]
+
+def reconciliar_bajo_stock(productos) -> int:
+    """
+    Marca los documentos cuyo bajo_stock falta o no coincide (anteriores al
+    campo o escritos fuera de los servicios); devuelve cuántos cambió
+    """
+    return productos.update_many(
+        {"$expr": {"$ne": [{"$ifNull": [f"${CAMPO_BAJO_STOCK}", None]}, CONDICION_BAJO_STOCK]}},
+        [ETAPA_BAJO_STOCK]
+    ).modified_count
+
+def reconciliar_una_vez(productos) -> Optional[int]:
+    """
+    Migración única de reconciliar_bajo_stock: la ejecuta quien inserta la
+    marca en `versiones`, un solo worker de un solo servicio, y nadie más
+    después. Devuelve cuántos cambió, o None si ya estaba hecha o en curso.
+    Borrar la marca la repite (p. ej. tras escribir productos fuera de los servicios)
+    """
+    marcas = productos.database[COLECCION_VERSIONES]
+    ahora = datetime.now()
+    try:
+        marcas.insert_one({"_id": MARCA_RECONCILIACION, "estado": "en_curso", "fecha": ahora})
+    except DuplicateKeyError:
+        abandonada = marcas.find_one_and_update(
+            {"_id": MARCA_RECONCILIACION, "estado": "en_curso", "fecha": {"$lt": ahora - ABANDONO_RECONCILIACION}},
+            {"$set": {"fecha": ahora}}
+        )
+        if abandonada is None:
+            return None
+    try:
+        corregidos = reconciliar_bajo_stock(productos)
+    except Exception:
+        # Sin marca, el siguiente arranque la vuelve a intentar
+        marcas.delete_one({"_id": MARCA_RECONCILIACION})
+        raise
+    marcas.update_one(
+        {"_id": MARCA_RECONCILIACION},
+        {"$set": {"estado": "completada", "fecha": datetime.now(), "corregidos": corregidos}}
+    )
+    return corregidos
+
+class MigracionBajoStock:
+    """
+    Lanza reconciliar_una_vez en segundo plano al arrancar: fuera del
+    calentamiento, la readiness no espera al recorrido de la colección
+    """
+
+    def __init__(self, productos):
+        self.productos = productos
+        self._tarea: Optional[asyncio.Task] = None
+
+    async def _ejecutar(self):
+        try:
+            corregidos = await asyncio.to_thread(reconciliar_una_vez, self.productos)
+        except Exception as e:
+            logger.error("Error reconciliando bajo_stock: %s", e)
+            return
+        if corregidos is not None:
+            logger.info("bajo_stock recalculado en %s productos", corregidos)
+
+    async def iniciar(self):
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._ejecutar())
+
+    async def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
+
+def crear_indice_bajo_stock(productos):
+    """Índice parcial: solo contiene los productos con stock bajo, en orden de _id"""
+    productos.create_index(
+        [(CAMPO_BAJO_STOCK, ASCENDING), ("_id", ASCENDING)],
+        partialFilterExpression={CAMPO_BAJO_STOCK: True},
+        name="bajo_stock_parcial"
+    )
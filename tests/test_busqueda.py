@@ -0,0 +1,89 @@
+"""
+Pruebas del índice de búsqueda de servicio_productos: plegado de acentos,
+prefijos, erratas y claves de SKU compartidas
+
+Uso: python -m pytest tests
+"""
+
+import os
+import sys
+
+from bson import ObjectId
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(RAIZ, "shared"), os.path.join(RAIZ, "microservicios", "servicio_productos", "app")]
+
+from busqueda import IndiceBusqueda, claves_sku, plegar, tokenizar
+
+def _producto(nombre, sku, descripcion="", categoria="alimentos"):
+    return {"_id": ObjectId(), "nombre": nombre, "sku": sku, "descripcion": descripcion, "categoria": categoria}
+
+def _indice(*productos):
+    indice = IndiceBusqueda()
+    for producto in productos:
+        indice.indexar(producto)
+    indice.preparar()
+    return indice
+
+def _ids(indice, consulta, **opciones):
+    return [producto_id for producto_id, _ in indice.buscar(consulta, **opciones)]
+
+def test_plegado_de_acentos_y_mayusculas():
+    assert plegar("Café Ñandú") == "cafe nandu"
+    assert tokenizar("Pingüino  AZÚCAR-moreno") == ["pinguino", "azucar", "moreno"]
+
+def test_consulta_sin_acentos_encuentra_nombre_con_acentos():
+    cafe = _producto("Café molido tostado", "CAF-0001")
+    indice = _indice(cafe, _producto("Leche entera", "LEC-0002"))
+    assert _ids(indice, "cafe") == [cafe["_id"]]
+    assert _ids(indice, "CAFÉ") == [cafe["_id"]]
+
+def test_prefijos_de_varios_tokens():
+    auriculares = _producto("Auriculares inalámbricos", "AUR-1000")
+    indice = _indice(auriculares, _producto("Auriculares con cable", "AUR-1001"))
+    assert _ids(indice, "auricu inalam") == [auriculares["_id"]]
+    assert len(_ids(indice, "auri")) == 2
+
+def test_errata_en_el_nombre():
+    chocolate = _producto("Chocolate negro", "CHO-0003")
+    indice = _indice(chocolate, _producto("Galletas integrales", "GAL-0004"))
+    assert _ids(indice, "chocolte") == [chocolate["_id"]]
+
+def test_sin_coincidencias():
+    indice = _indice(_producto("Arroz blanco", "ARR-0005"))
+    assert indice.buscar("televisor") == []
+
+def test_sku_exacto_por_encima_del_prefijo():
+    exacto = _producto("Tornillo", "SKU-000123")
+    prefijo = _producto("Tuerca", "SKU-0001234")
+    indice = _indice(prefijo, exacto)
+    resultados = indice.buscar("sku-000123")
+    assert resultados[0][0] == exacto["_id"]
+    assert {producto_id for producto_id, _ in resultados} == {exacto["_id"], prefijo["_id"]}
+
+def test_parte_numerica_compartida_entre_skus():
+    assert "000123" in claves_sku("SKU-000123") & claves_sku("ALT-000123")
+    primero = _producto("Tornillo", "SKU-000123")
+    segundo = _producto("Tuerca", "ALT-000123")
+    indice = _indice(primero, segundo)
+    assert set(_ids(indice, "000123")) == {primero["_id"], segundo["_id"]}
+
+    # Dar de baja a uno no deja al otro sin la clave común
+    indice.desindexar(primero["_id"])
+    assert _ids(indice, "000123") == [segundo["_id"]]
+    indice.desindexar(segundo["_id"])
+    assert _ids(indice, "000123") == []
+    assert indice.informe()["claves_sku"] == 0
+
+def test_reindexar_cambia_el_sku():
+    producto = _producto("Tornillo", "SKU-000123")
+    indice = _indice(producto)
+    indice.indexar({**producto, "sku": "SKU-000999"})
+    assert _ids(indice, "sku000123") == []
+    assert _ids(indice, "sku000999") == [producto["_id"]]
+
+def test_filtro_de_categoria():
+    comida = _producto("Pan integral", "PAN-0006", categoria="alimentos")
+    hogar = _producto("Panel decorativo", "PAN-0007", categoria="hogar")
+    indice = _indice(comida, hogar)
+    assert _ids(indice, "pan", categoria="hogar") == [hogar["_id"]]